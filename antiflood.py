@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Anti-flood do reply bot: um token bucket por chat, com custo por comando
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from aiogram import BaseMiddleware, types
+
+# Cada chat acumula até FLOOD_BURST fichas, repostas a FLOOD_RATE fichas por segundo
+FLOOD_RATE = float(os.getenv("FLOOD_RATE", "0.5"))
+FLOOD_BURST = float(os.getenv("FLOOD_BURST", "6"))
+# Chats acompanhados em memória (os menos recentes são descartados)
+FLOOD_MAX_CHATS = int(os.getenv("FLOOD_MAX_CHATS", "10000"))
+# Intervalo mínimo (s) entre dois avisos de "devagar" para o mesmo chat
+FLOOD_NOTICE_INTERVAL = float(os.getenv("FLOOD_NOTICE_INTERVAL", "30"))
+
+# Custo em fichas por comando (primeira palavra da mensagem); o resto custa DEFAULT_COST
+COMMAND_COSTS = {
+    "semanal": 3.0,
+    "forcar": 3.0,
+    "de": 3.0,  # de DD/MM até DD/MM
+    "hoje": 2.0,
+    "ontem": 2.0,
+    "status": 2.0,
+    "ultimo": 1.0,
+}
+DEFAULT_COST = 1.0
+CALLBACK_COST = 0.5  # botões de página respondem do cache
+
+THROTTLED_MESSAGE = "⏳ Muitas mensagens em pouco tempo. Aguarde alguns segundos e tente de novo."
+
+def command_cost(text: Optional[str]) -> float:
+    words = (text or "").strip().lower().split(maxsplit=1)
+    return COMMAND_COSTS.get(words[0], DEFAULT_COST) if words else DEFAULT_COST
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Middleware externo de mensagens e callbacks: descarta o update quando o chat
+    está sem fichas, avisando no máximo uma vez a cada FLOOD_NOTICE_INTERVAL.
+    O estado por chat é [fichas, último acesso, último aviso] num LRU limitado.
+    """
+    def __init__(self, rate: float = FLOOD_RATE, burst: float = FLOOD_BURST,
+                 max_chats: int = FLOOD_MAX_CHATS, notice_interval: float = FLOOD_NOTICE_INTERVAL):
+        self.rate = rate
+        self.burst = burst
+        self.max_chats = max_chats
+        self.notice_interval = notice_interval
+        self.buckets: "OrderedDict[int, list[float]]" = OrderedDict()
+        self.allowed = 0
+        self.throttled = 0
+        self.notices = 0
+        self.evicted = 0
+
+    def check(self, chat_id: int, cost: float, now: Optional[float] = None) -> bool:
+        """Consome `cost` fichas do chat; False se não há fichas suficientes"""
+        now = time.monotonic() if now is None else now
+        bucket = self.buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.buckets[chat_id] = [self.burst, now, float("-inf")]
+            if len(self.buckets) > self.max_chats:
+                self.buckets.popitem(last=False)
+                self.evicted += 1
+        else:
+            self.buckets.move_to_end(chat_id)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            self.allowed += 1
+            return True
+        self.throttled += 1
+        return False
+
+    def should_notify(self, chat_id: int, now: Optional[float] = None) -> bool:
+        """Se o chat (sem fichas) deve receber o aviso agora"""
+        now = time.monotonic() if now is None else now
+        bucket = self.buckets.get(chat_id)
+        if bucket is None or now - bucket[2] < self.notice_interval:
+            return False
+        bucket[2] = now
+        self.notices += 1
+        return True
+
+    async def __call__(self, handler, event, data):
+        if isinstance(event, types.CallbackQuery):
+            chat_id, cost = event.from_user.id, CALLBACK_COST
+        elif isinstance(event, types.Message):
+            chat_id, cost = event.chat.id, command_cost(event.text)
+        else:
+            return await handler(event, data)
+
+        if self.check(chat_id, cost):
+            return await handler(event, data)
+
+        if isinstance(event, types.CallbackQuery):
+            await event.answer(THROTTLED_MESSAGE)
+        elif self.should_notify(chat_id):
+            await event.answer(THROTTLED_MESSAGE)
+        return None
+
+    def metrics(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "throttled": self.throttled,
+            "notices": self.notices,
+            "tracked_chats": len(self.buckets),
+            "evicted": self.evicted,
+        }
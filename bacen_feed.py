@@ -2,9 +2,16 @@
 """
 Módulo para buscar normativos do BACEN por período
 """
-import feedparser
-from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Optional
+import os
+import time
+import bisect
+import hashlib
+import aiohttp
+import asyncio
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, timezone, timedelta
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Callable, List, Dict, Optional
 import re
 
 # Compatibilidade com Windows - usar pytz se disponível, senão usar UTC
@@ -19,10 +26,11 @@ except ImportError:
     print("⚠️ pytz não disponível, usando UTC como fallback")
 
 # Importa o analisador de normativos
-from normativo_analyzer import analisar_normativo
+from normativo_analyzer import analisar_normativo, extrair_identificador, extrair_referencias
+from http_client import open_with_retry, fetch_bytes_sync
 
 class BACENNormativo:
-    def __init__(self, title: str, link: str, published: datetime, summary: str = ""):
+    def __init__(self, title: str, link: str, published: datetime, summary: str = "", summary_completo: str = None):
         self.title = title
         self.link = link
         self.published = published
@@ -32,17 +40,49 @@ class BACENNormativo:
         analise = analisar_normativo(title, summary)
         self.tema = analise['tema']
         self.mini_resumo = analise['mini_resumo']
+        
+        # Tipo/número/ano (None se o título não segue o padrão do BACEN)
+        self.identificador = extrair_identificador(title, published.year)
+        
+        # Normativos que este altera/revoga ("Revoga a Circular..." costuma estar no
+        # fim do resumo, que o feed corta: por isso o texto completo, se houver)
+        self.referencias = extrair_referencias(summary_completo or summary, self.identificador)
 
 def get_bacen_feed_url(ano: int = None) -> str:
-    """Retorna a URL do feed RSS do BACEN para normativos"""
+    """Retorna a URL do feed RSS do BACEN para normativos (BACEN_FEED_URL sobrescreve, ex.: benchmarks)"""
+    feed_url = os.getenv("BACEN_FEED_URL")
+    if feed_url:
+        return feed_url
     if ano is None:
         ano = datetime.now().year
     return f"https://www.bcb.gov.br/api/feed/app/normativos/normativos?ano={ano}"
 
+def _build_normativo(title: str, link: str, published_dt: Optional[datetime], summary: str) -> BACENNormativo:
+    """Monta um BACENNormativo a partir dos campos brutos de uma entrada do feed"""
+    if published_dt is None:
+        published_dt = datetime.now(timezone.utc)
+    
+    # Converte para horário de SP se disponível
+    if HAS_TZ:
+        published_dt = published_dt.astimezone(BR_TZ)
+    
+    return BACENNormativo(
+        title=title or 'Normativo sem título',
+        link=link or '',
+        published=published_dt,
+        summary=summary[:200] + '...' if len(summary) > 200 else summary,
+        summary_completo=summary
+    )
+
 def parse_bacen_feed() -> List[BACENNormativo]:
     """Parseia o feed RSS do BACEN e retorna lista de normativos"""
+    import feedparser  # pesado; só o caminho síncrono e o fallback precisam dele
     feed_url = get_bacen_feed_url()
-    feed = feedparser.parse(feed_url)
+    try:
+        feed = feedparser.parse(fetch_bytes_sync(feed_url))
+    except Exception as e:
+        print(f"❌ Erro ao baixar feed do BACEN: {e}")
+        return []
     
     normativos = []
     for entry in feed.entries:
@@ -53,21 +93,12 @@ def parse_bacen_feed() -> List[BACENNormativo]:
                 published_dt = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
             elif hasattr(entry, 'updated_parsed') and entry.updated_parsed:
                 published_dt = datetime(*entry.updated_parsed[:6], tzinfo=timezone.utc)
-            else:
-                published_dt = datetime.now(timezone.utc)
             
-            # Converte para horário de SP se disponível
-            if HAS_TZ:
-                published_dt = published_dt.astimezone(BR_TZ)
-            else:
-                # Mantém UTC se pytz não estiver disponível
-                pass
-            
-            normativo = BACENNormativo(
-                title=entry.get('title', 'Normativo sem título'),
+            normativo = _build_normativo(
+                title=entry.get('title', ''),
                 link=entry.get('link', ''),
-                published=published_dt,
-                summary=entry.get('summary', '')[:200] + '...' if len(entry.get('summary', '')) > 200 else entry.get('summary', '')
+                published_dt=published_dt,
+                summary=entry.get('summary', '')
             )
             normativos.append(normativo)
         except Exception as e:
@@ -76,83 +107,274 @@ def parse_bacen_feed() -> List[BACENNormativo]:
     
     return normativos
 
-def get_ultimo_normativo() -> Optional[BACENNormativo]:
-    """Retorna o último normativo publicado"""
-    normativos = parse_bacen_feed()
-    if normativos:
-        # Ordena por data de publicação (mais recente primeiro)
-        normativos.sort(key=lambda x: x.published, reverse=True)
-        return normativos[0]
-    return None
+# ============ leitura incremental (streaming) ============
 
-def get_normativos_hoje() -> List[BACENNormativo]:
-    """Retorna todos os normativos publicados hoje"""
-    if HAS_TZ:
-        hoje = datetime.now(BR_TZ).date()
-    else:
-        hoje = datetime.now(timezone.utc).date()
+FEED_CHUNK_SIZE = 16 * 1024
+FEED_ITEM_TAGS = ('item', 'entry')  # RSS 2.0 e Atom
+FEED_DATE_TAGS = ('pubDate', 'published', 'updated', 'date')
+FEED_SUMMARY_TAGS = ('description', 'summary', 'encoded', 'content')
+
+def _local_name(tag: str) -> str:
+    """Remove o namespace de uma tag XML ('{ns}tag' -> 'tag')"""
+    return tag.rsplit('}', 1)[-1]
+
+def _parse_feed_date(value: str) -> Optional[datetime]:
+    """Converte datas RFC 822 (RSS) ou ISO 8601 (Atom) para UTC"""
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        try:
+            dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+def _normativo_from_element(elem: ET.Element) -> BACENNormativo:
+    """Extrai um normativo de um elemento <item>/<entry> já completo"""
+    campos = {}
+    for child in elem:
+        nome = _local_name(child.tag)
+        if nome == 'link' and not (child.text or '').strip():
+            # Atom: <link href="..." rel="alternate"/>
+            if child.get('rel', 'alternate') == 'alternate' and child.get('href'):
+                campos.setdefault('link', child.get('href'))
+            continue
+        texto = ''.join(child.itertext()).strip()
+        if texto:
+            campos.setdefault(nome, texto)
     
-    normativos = parse_bacen_feed()
+    published_dt = None
+    for tag in FEED_DATE_TAGS:
+        if tag in campos:
+            published_dt = _parse_feed_date(campos[tag])
+            if published_dt:
+                break
     
-    normativos_hoje = []
-    for normativo in normativos:
-        # Converte a data do normativo para o mesmo timezone para comparação
-        if HAS_TZ:
-            normativo_date = normativo.published.astimezone(BR_TZ).date()
-        else:
-            normativo_date = normativo.published.date()
-        
-        if normativo_date == hoje:
-            normativos_hoje.append(normativo)
+    summary = next((campos[tag] for tag in FEED_SUMMARY_TAGS if tag in campos), '')
     
-    return normativos_hoje
+    return _build_normativo(
+        title=campos.get('title', ''),
+        link=campos.get('link', ''),
+        published_dt=published_dt,
+        summary=summary
+    )
 
-def get_normativos_ontem() -> List[BACENNormativo]:
-    """Retorna todos os normativos publicados ontem"""
-    if HAS_TZ:
-        ontem = (datetime.now(BR_TZ) - timedelta(days=1)).date()
-    else:
-        ontem = (datetime.now(timezone.utc) - timedelta(days=1)).date()
+class FeedStreamParser:
+    """
+    Parser incremental do feed: recebe pedaços de bytes e devolve os normativos
+    assim que cada <item> termina de chegar. Os elementos já processados são
+    descartados da árvore, então a memória não cresce com o tamanho do feed.
+    """
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._stack: List[ET.Element] = []
     
-    normativos = parse_bacen_feed()
+    def feed(self, chunk: bytes) -> List[BACENNormativo]:
+        self._parser.feed(chunk)
+        return self._drain()
     
-    normativos_ontem = []
-    for normativo in normativos:
-        # Converte a data do normativo para o mesmo timezone para comparação
-        if HAS_TZ:
-            normativo_date = normativo.published.astimezone(BR_TZ).date()
-        else:
-            normativo_date = normativo.published.date()
-        
-        if normativo_date == ontem:
-            normativos_ontem.append(normativo)
+    def close(self) -> List[BACENNormativo]:
+        self._parser.close()
+        return self._drain()
     
-    return normativos_ontem
+    def _drain(self) -> List[BACENNormativo]:
+        normativos = []
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                self._stack.append(elem)
+                continue
+            
+            self._stack.pop()
+            if _local_name(elem.tag) not in FEED_ITEM_TAGS:
+                continue
+            
+            try:
+                normativos.append(_normativo_from_element(elem))
+            except Exception as e:
+                print(f"Erro ao processar entrada do feed: {e}")
+            
+            # Libera o item já processado
+            if self._stack:
+                self._stack[-1].remove(elem)
+        return normativos
 
-def get_normativos_semanal() -> List[BACENNormativo]:
-    """Retorna todos os normativos publicados esta semana"""
-    if HAS_TZ:
-        hoje = datetime.now(BR_TZ)
-    else:
-        hoje = datetime.now(timezone.utc)
-    
-    inicio_semana = hoje - timedelta(days=hoje.weekday())  # Segunda-feira
-    inicio_semana = inicio_semana.replace(hour=0, minute=0, second=0, microsecond=0)
+async def iter_bacen_feed(
+    feed_url: Optional[str] = None,
+    session: Optional[aiohttp.ClientSession] = None,
+    stop_when: Optional[Callable[[BACENNormativo], bool]] = None,
+) -> AsyncIterator[BACENNormativo]:
+    """
+    Lê o feed do BACEN em streaming, gerando cada normativo assim que é decodificado.
     
-    normativos = parse_bacen_feed()
+    Se `stop_when` for informado, a leitura é interrompida (e a conexão liberada)
+    no primeiro normativo para o qual ele retornar True — por exemplo, ao chegar
+    em um item mais antigo que o último já visto.
+    """
+    feed_url = feed_url or get_bacen_feed_url()
+    parser = FeedStreamParser()
     
-    normativos_semana = []
-    for normativo in normativos:
-        # Converte a data do normativo para o mesmo timezone para comparação
-        if HAS_TZ:
-            normativo_dt = normativo.published.astimezone(BR_TZ)
-        else:
-            normativo_dt = normativo.published
-        
-        if normativo_dt >= inicio_semana:
-            normativos_semana.append(normativo)
+    async with open_with_retry('GET', feed_url, session=session) as resp:
+        resp.raise_for_status()
+        async for chunk in resp.content.iter_chunked(FEED_CHUNK_SIZE):
+            for normativo in parser.feed(chunk):
+                if stop_when and stop_when(normativo):
+                    return
+                yield normativo
     
-    return normativos_semana
+    for normativo in parser.close():
+        if stop_when and stop_when(normativo):
+            return
+        yield normativo
+
+async def parse_bacen_feed_async(
+    stop_when: Optional[Callable[[BACENNormativo], bool]] = None,
+    session: Optional[aiohttp.ClientSession] = None,
+) -> List[BACENNormativo]:
+    """Versão assíncrona de parse_bacen_feed, sem bloquear o event loop"""
+    normativos = []
+    try:
+        async for normativo in iter_bacen_feed(session=session, stop_when=stop_when):
+            normativos.append(normativo)
+    except ET.ParseError as e:
+        # XML fora do padrão (ex.: entidades HTML): recorre ao feedparser, que é tolerante
+        print(f"⚠️ Feed com XML inválido ({e}), usando feedparser")
+        loop = asyncio.get_running_loop()
+        normativos = []
+        for normativo in await loop.run_in_executor(None, parse_bacen_feed):
+            if stop_when and stop_when(normativo):
+                break
+            normativos.append(normativo)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        # Mesmo comportamento do feedparser: falha de rede vira feed vazio
+        print(f"❌ Erro ao baixar feed do BACEN: {e}")
+    return normativos
+
+# ============ snapshot ordenado do feed ============
+
+# Por quanto tempo (s) o snapshot do feed é reaproveitado pelos comandos
+FEED_SNAPSHOT_TTL = float(os.getenv("FEED_SNAPSHOT_TTL", "300"))
+
+def today_sp() -> date:
+    """Data de hoje no horário de SP (UTC sem pytz)"""
+    return datetime.now(BR_TZ).date()
+
+class FeedSnapshot:
+    """
+    Normativos do feed ordenados por data de publicação, com a data local (SP) de
+    cada um pré-calculada: períodos saem por bisect e o mais recente em O(1).
+    `version` muda só quando o conteúdo do feed muda.
+    """
+    def __init__(self, normativos: List[BACENNormativo]):
+        # published já vem em horário de SP (_build_normativo), então .date() é a data local
+        self.normativos = sorted(normativos, key=lambda n: n.published)
+        self.dates = [n.published.date() for n in self.normativos]
+        self.version = hashlib.md5("\n".join(n.link or n.title for n in self.normativos).encode("utf-8")).hexdigest()[:12]
+        self.fetched_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.normativos)
+
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    def latest(self) -> Optional[BACENNormativo]:
+        return self.normativos[-1] if self.normativos else None
+
+    def between(self, inicio: date, fim: date) -> List[BACENNormativo]:
+        """Normativos publicados de `inicio` a `fim` (inclusive), mais recente primeiro"""
+        lo = bisect.bisect_left(self.dates, inicio)
+        hi = bisect.bisect_right(self.dates, fim)
+        return self.normativos[lo:hi][::-1]
+
+    def on(self, dia: date) -> List[BACENNormativo]:
+        return self.between(dia, dia)
+
+    def hoje(self) -> List[BACENNormativo]:
+        return self.on(today_sp())
+
+    def ontem(self) -> List[BACENNormativo]:
+        return self.on(today_sp() - timedelta(days=1))
+
+    def semanal(self) -> List[BACENNormativo]:
+        """Desde segunda-feira desta semana"""
+        hoje = today_sp()
+        return self.between(hoje - timedelta(days=hoje.weekday()), hoje)
+
+_snapshot: Optional[FeedSnapshot] = None
+_snapshot_refresh: Optional[asyncio.Task] = None
+
+def _store_snapshot(normativos: List[BACENNormativo]) -> FeedSnapshot:
+    """Troca o snapshot atual; um feed vazio (falha de download) não apaga um snapshot bom"""
+    global _snapshot
+    if not normativos and _snapshot is not None:
+        print("⚠️ Feed vazio ou indisponível, mantendo o snapshot anterior")
+        return _snapshot
+    _snapshot = FeedSnapshot(normativos)
+    return _snapshot
+
+def get_feed_snapshot(max_age: float = FEED_SNAPSHOT_TTL) -> FeedSnapshot:
+    """Snapshot do feed (síncrono), baixado de novo só quando tem mais de max_age segundos"""
+    if _snapshot is not None and _snapshot.age() < max_age:
+        return _snapshot
+    return _store_snapshot(parse_bacen_feed())
+
+async def get_feed_snapshot_async(max_age: float = FEED_SNAPSHOT_TTL) -> FeedSnapshot:
+    """
+    Snapshot do feed sem bloquear o event loop. Pedidos simultâneos com o snapshot
+    vencido aguardam um único download.
+    """
+    global _snapshot_refresh
+    if _snapshot is not None and _snapshot.age() < max_age:
+        return _snapshot
+    loop = asyncio.get_running_loop()
+    if _snapshot_refresh is None or _snapshot_refresh.done() or _snapshot_refresh.get_loop() is not loop:
+        async def refresh() -> FeedSnapshot:
+            return _store_snapshot(await parse_bacen_feed_async())
+        _snapshot_refresh = loop.create_task(refresh())
+    return await asyncio.shield(_snapshot_refresh)
+
+# Período livre: "de 01/09 até 15/09" (ano opcional: "de 01/09/2025 ate 15/09/2025")
+PERIODO_RE = re.compile(
+    r"^\s*de\s+(\d{1,2})/(\d{1,2})(?:/(\d{4}))?\s+(?:até|ate|a)\s+(\d{1,2})/(\d{1,2})(?:/(\d{4}))?\s*$",
+    re.IGNORECASE,
+)
+
+def parse_periodo(texto: str) -> Optional[tuple]:
+    """'de DD/MM até DD/MM' -> (inicio, fim); sem ano, usa o ano corrente. None se inválido"""
+    match = PERIODO_RE.match(texto or "")
+    if not match:
+        return None
+    ano_atual = today_sp().year
+    d1, m1, a1, d2, m2, a2 = match.groups()
+    try:
+        inicio = date(int(a1 or ano_atual), int(m1), int(d1))
+        fim = date(int(a2 or a1 or ano_atual), int(m2), int(d2))
+    except ValueError:
+        return None
+    if fim < inicio:
+        return None
+    return inicio, fim
+
+def get_ultimo_normativo() -> Optional[BACENNormativo]:
+    """Retorna o último normativo publicado"""
+    return get_feed_snapshot().latest()
+
+def get_normativos_hoje() -> List[BACENNormativo]:
+    """Retorna todos os normativos publicados hoje"""
+    return get_feed_snapshot().hoje()
+
+def get_normativos_ontem() -> List[BACENNormativo]:
+    """Retorna todos os normativos publicados ontem"""
+    return get_feed_snapshot().ontem()
+
+def get_normativos_semanal() -> List[BACENNormativo]:
+    """Retorna todos os normativos publicados esta semana"""
+    return get_feed_snapshot().semanal()
 
 def format_normativo_message(normativo: BACENNormativo) -> str:
     """Formata uma mensagem para um normativo"""
@@ -166,6 +388,17 @@ def format_normativo_message(normativo: BACENNormativo) -> str:
     
     return message
 
+def format_normativo_block(normativo: BACENNormativo) -> str:
+    """Bloco de um normativo dentro de uma lista (mesmo layout do 'último')"""
+    data_str = normativo.published.strftime("%d/%m/%Y %H:%M")
+    
+    block = f"📄 <b>{normativo.title}</b>\n"
+    block += f"🏷️ <b>Tema:</b> {normativo.tema}\n"
+    block += f"🕒 {data_str}\n\n"
+    block += f"📝 <b>Resumo:</b>\n{normativo.mini_resumo}\n\n"
+    block += f"🔗 {normativo.link}\n\n"
+    return block
+
 def format_multiple_normativos_message(normativos: List[BACENNormativo], periodo: str) -> str:
     """Formata uma mensagem para múltiplos normativos usando o mesmo layout do 'último'"""
     if not normativos:
@@ -175,13 +408,7 @@ def format_multiple_normativos_message(normativos: List[BACENNormativo], periodo
     message += f"📊 Total: {len(normativos)} normativo(s)\n\n"
     
     for i, normativo in enumerate(normativos[:5], 1):  # Limita a 5 para não sobrecarregar
-        data_str = normativo.published.strftime("%d/%m/%Y %H:%M")
-        
-        message += f"📄 <b>{normativo.title}</b>\n"
-        message += f"🏷️ <b>Tema:</b> {normativo.tema}\n"
-        message += f"🕒 {data_str}\n\n"
-        message += f"📝 <b>Resumo:</b>\n{normativo.mini_resumo}\n\n"
-        message += f"🔗 {normativo.link}\n\n"
+        message += format_normativo_block(normativo)
         
         # Separador entre normativos (exceto o último)
         if i < min(len(normativos), 5):
@@ -192,3 +419,52 @@ def format_multiple_normativos_message(normativos: List[BACENNormativo], periodo
         message += f"💡 Use o comando <b>'ultimo'</b> para ver o mais recente em detalhes"
     
     return message
+
+# Limite de uma mensagem do Telegram (em unidades UTF-16) e normativos por página
+TELEGRAM_MESSAGE_LIMIT = 4096
+NORMATIVOS_POR_PAGINA = 5
+
+def telegram_len(text: str) -> int:
+    """Tamanho como o Telegram conta (UTF-16; emojis valem 2)"""
+    return len(text.encode("utf-16-le")) // 2
+
+def _page_header(periodo: str, total: int, pagina: int, paginas: int) -> str:
+    header = f"📋 <b>Normativos do BACEN - {periodo}</b>\n"
+    header += f"📊 Total: {total} normativo(s)"
+    if paginas > 1:
+        header += f" — página {pagina}/{paginas}"
+    return header + "\n\n"
+
+def paginate_normativos_message(normativos: List[BACENNormativo], periodo: str,
+                                por_pagina: int = NORMATIVOS_POR_PAGINA,
+                                limite: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """
+    Divide a lista em páginas de até `por_pagina` normativos, cada uma dentro do
+    limite de tamanho de uma mensagem do Telegram. Retorna o texto de cada página.
+    """
+    if not normativos:
+        return [f"❌ Nenhum normativo encontrado para {periodo}."]
+    
+    separador = "─" * 30 + "\n\n"
+    # Reserva o cabeçalho mais longo possível ("página N/N" com o total como teto)
+    cabecalho = telegram_len(_page_header(periodo, len(normativos), len(normativos), len(normativos)))
+    
+    grupos, atual, tamanho = [], [], cabecalho
+    for normativo in normativos:
+        bloco = format_normativo_block(normativo)
+        if cabecalho + telegram_len(bloco) > limite:
+            # Resumo gigante: fica só o essencial
+            bloco = f"📄 <b>{normativo.title[:500]}</b>\n🔗 {normativo.link}\n\n"
+        extra = telegram_len(bloco) + (telegram_len(separador) if atual else 0)
+        if atual and (len(atual) >= por_pagina or tamanho + extra > limite):
+            grupos.append(atual)
+            atual, tamanho = [], cabecalho
+            extra = telegram_len(bloco)
+        atual.append(bloco)
+        tamanho += extra
+    grupos.append(atual)
+    
+    return [
+        _page_header(periodo, len(normativos), i, len(grupos)) + separador.join(grupo)
+        for i, grupo in enumerate(grupos, 1)
+    ]
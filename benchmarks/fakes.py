@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Dublês locais para rodar benchmarks e testes de carga sem rede nem Postgres:
+
+- build_feed: feed RSS de qualquer tamanho a partir do fixture gravado
+- FakeTelegramServer: Bot API falsa (aiohttp) com latência e 429 configuráveis,
+  que também serve o feed em /feed.xml
+- MemoryStore: substituto em memória do PGStore
+- make_update: monta Updates sintéticos do aiogram
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import threading
+import xml.etree.ElementTree as ET
+from copy import deepcopy
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from aiohttp import web
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_FEED = os.path.join(FIXTURES_DIR, "normativos_2025.xml")
+
+# ============ feed ============
+
+def load_fixture() -> bytes:
+    with open(FIXTURE_FEED, "rb") as f:
+        return f.read()
+
+def build_feed(size: int, newest: datetime | None = None) -> bytes:
+    """
+    Monta um feed com `size` itens reaproveitando os itens gravados no fixture,
+    com links únicos e datas decrescentes (2h entre itens) a partir de `newest`.
+    """
+    root = ET.fromstring(load_fixture())
+    channel = root.find("channel")
+    modelos = channel.findall("item")
+    for item in modelos:
+        channel.remove(item)
+
+    newest = newest or parsedate_to_datetime(modelos[0].findtext("pubDate"))
+    for k in range(size):
+        item = deepcopy(modelos[k % len(modelos)])
+        item.find("link").text += f"&seq={k}"
+        item.find("pubDate").text = format_datetime(newest - timedelta(hours=2 * k))
+        channel.append(item)
+
+    return ET.tostring(root, encoding="utf-8", xml_declaration=True)
+
+# ============ Telegram ============
+
+class FakeTelegramServer:
+    """
+    Bot API falsa rodando em uma thread própria (com seu event loop), para não
+    competir com o loop medido. `latency` em segundos por chamada e `rate_429` é a
+    fração de chamadas respondidas com Too Many Requests. Chats em `blocked`
+    recebem 403 (bot bloqueado pelo usuário).
+    """
+    def __init__(self, latency: float = 0.0, rate_429: float = 0.0, retry_after: int = 1, feed: bytes | None = None):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.feed = feed or load_fixture()
+        self.calls: dict[str, int] = {}
+        self.throttled = 0
+        self.blocked: set[int] = set()
+        self._message_id = 0
+        self._random = random.Random(42)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._runner: web.AppRunner | None = None
+        self._thread: threading.Thread | None = None
+        self.port: int | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def feed_url(self) -> str:
+        return f"{self.base_url}/feed.xml"
+
+    def reset_stats(self):
+        self.calls = {}
+        self.throttled = 0
+
+    async def _handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        data = await request.post()
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.rate_429 and self._random.random() < self.rate_429:
+            self.throttled += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+
+        if int(data.get("chat_id") or 0) in self.blocked:
+            return web.json_response({
+                "ok": False,
+                "error_code": 403,
+                "description": "Forbidden: bot was blocked by the user",
+            }, status=403)
+
+        return web.json_response({"ok": True, "result": self._result_for(method, data)})
+
+    def _result_for(self, method: str, data) -> object:
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "BACEN Bot", "username": "bacen_bot"}
+        if method in ("sendMessage", "editMessageText"):
+            self._message_id += 1
+            chat_id = int(data.get("chat_id", 0))
+            return {
+                "message_id": int(data.get("message_id") or self._message_id),
+                "date": int(datetime.now(timezone.utc).timestamp()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get("text", ""),
+            }
+        return True
+
+    async def _handle_feed(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.feed, content_type="application/rss+xml")
+
+    def start(self) -> "FakeTelegramServer":
+        ready = threading.Event()
+
+        async def serve():
+            app = web.Application()
+            app.router.add_post("/bot{token}/{method}", self._handle_method)
+            app.router.add_get("/feed.xml", self._handle_feed)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+            ready.set()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(serve())
+            self._loop.run_forever()
+            self._loop.run_until_complete(self._runner.cleanup())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="fake-telegram", daemon=True)
+        self._thread.start()
+        ready.wait(10)
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(10)
+            self._loop = None
+
+def make_fake_api(server: FakeTelegramServer):
+    """Servidor da Bot API falsa, para o BotManager (mesma sessão, agendador de saída e métricas de produção)"""
+    from aiogram.client.telegram import TelegramAPIServer
+
+    return TelegramAPIServer.from_base(server.base_url)
+
+def make_update(update_id: int, chat_id: int, text: str):
+    """Update sintético de mensagem de texto em chat privado"""
+    from aiogram.types import Update
+
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(datetime.now(timezone.utc).timestamp()),
+            "chat": {"id": chat_id, "type": "private", "first_name": "Bench"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Bench", "username": f"bench{chat_id}"},
+            "text": text,
+        },
+    })
+
+# ============ Postgres ============
+
+class MemoryStore:
+    """Substituto em memória do PGStore com a mesma interface pública"""
+    def __init__(self, subscribers: int = 0):
+        self.subscribers: dict[int, dict] = {}
+        self.seen: set[tuple[str, str]] = set()
+        self.force_requests: list[dict] = []
+        self.pending: list[tuple[int, int, str]] = []
+        self.normativos: dict[str, dict] = {}
+        self.outbound_lanes: dict[str, tuple[int | None, float]] = {}
+        for chat_id in range(1, subscribers + 1):
+            self.upsert_subscriber(chat_id, f"User {chat_id}", None)
+
+    def init(self):
+        pass
+
+    def close(self):
+        pass
+
+    def upsert_subscriber(self, chat_id: int, first_name: str | None, username: str | None):
+        info = self.subscribers.setdefault(chat_id, {"chat_id": chat_id, "joined_at": datetime.now(timezone.utc), "temas": None})
+        info.update(first_name=first_name, username=username)
+
+    def remove_subscriber(self, chat_id: int):
+        self.subscribers.pop(chat_id, None)
+
+    def remove_subscribers(self, chat_ids: list[int]) -> int:
+        return sum(self.subscribers.pop(chat_id, None) is not None for chat_id in chat_ids)
+
+    def get_subscriber_count(self) -> int:
+        return len(self.subscribers)
+
+    def get_subscriber_info(self, chat_id: int) -> dict | None:
+        return self.subscribers.get(chat_id)
+
+    def set_subscriber_temas(self, chat_id: int, temas: list[str] | None) -> bool:
+        if chat_id not in self.subscribers:
+            return False
+        self.subscribers[chat_id]["temas"] = temas
+        return True
+
+    def list_theme_subscribers(self) -> dict[int, list[str]]:
+        return {chat_id: info["temas"] for chat_id, info in self.subscribers.items() if info["temas"] is not None}
+
+    def ping(self) -> bool:
+        return True
+
+    def get_stats(self, max_age: float = 0) -> dict:
+        return {"subscribers": len(self.subscribers), "seen_items": len(self.seen)}
+
+    def recount_stats(self) -> dict:
+        return self.get_stats()
+
+    def health_check(self) -> dict:
+        return {
+            "status": "healthy",
+            "subscriber_count": len(self.subscribers),
+            "seen_items_count": len(self.seen),
+            "connection": "ok",
+        }
+
+    def list_subscribers(self) -> list[int]:
+        return list(self.subscribers)
+
+    def mark_new_and_return_is_new(self, source: str, item_id: str) -> bool:
+        if (source, item_id) in self.seen:
+            return False
+        self.seen.add((source, item_id))
+        return True
+
+    def mark_new_batch(self, source: str, item_ids: list[str]) -> list[str]:
+        return [item_id for item_id in dict.fromkeys(item_ids) if self.mark_new_and_return_is_new(source, item_id)]
+
+    def load_seen_keys(self, source: str) -> list[int]:
+        from storage import seen_item_key
+        return [seen_item_key(item_id) for s, item_id in self.seen if s == source]
+
+    def prune_seen_items(self, retention_days: int = 400, batch_size: int = 5000) -> int:
+        return 0
+
+    def save_normativos(self, normativos: list) -> int:
+        novos = 0
+        for n in normativos:
+            if n.link not in self.normativos:
+                ident = n.identificador
+                self.normativos[n.link] = {
+                    "tipo": ident and ident.tipo, "numero": ident and ident.numero, "ano": ident and ident.ano,
+                    "title": n.title, "link": n.link, "published": n.published, "tema": n.tema, "mini_resumo": n.mini_resumo,
+                    "summary": n.summary, "referencias": n.referencias,
+                }
+                novos += 1
+        return novos
+
+    def find_references_to(self, numero: int, tipos: list[str] | None = None, ano: int | None = None,
+                           limit: int = 20) -> list[dict]:
+        found = [
+            {"relacao": ref.relacao, **{k: n[k] for k in ("tipo", "numero", "ano", "title", "link", "published")}}
+            for n in self.normativos.values() for ref in n["referencias"]
+            if ref.alvo.numero == numero and (tipos is None or ref.alvo.tipo in tipos)
+            and (ano is None or ref.alvo.ano in (None, ano))
+        ]
+        return sorted(found, key=lambda r: r["published"], reverse=True)[:limit]
+
+    def find_references_from(self, numero: int, tipos: list[str] | None = None, ano: int | None = None,
+                             limit: int = 20) -> list[dict]:
+        found = []
+        for n in self.find_normativos(numero, tipos, ano, limit):
+            found.extend({"relacao": ref.relacao, "tipo": ref.alvo.tipo, "numero": ref.alvo.numero,
+                          "ano": ref.alvo.ano, "title": n["title"]} for ref in n["referencias"])
+        return found[:limit]
+
+    def find_normativos(self, numero: int, tipos: list[str] | None = None, ano: int | None = None,
+                        limit: int = 10) -> list[dict]:
+        found = [n for n in self.normativos.values()
+                 if n["numero"] == numero and (tipos is None or n["tipo"] in tipos) and (ano is None or n["ano"] == ano)]
+        return sorted(found, key=lambda n: n["published"], reverse=True)[:limit]
+
+    def save_pending_deliveries(self, deliveries: list[tuple[int, str]]) -> int:
+        start = self.pending[-1][0] + 1 if self.pending else 1
+        self.pending.extend((start + i, chat_id, message) for i, (chat_id, message) in enumerate(deliveries))
+        return len(deliveries)
+
+    def list_pending_deliveries(self) -> list[tuple[int, int, str]]:
+        return list(self.pending)
+
+    def remove_pending_deliveries(self, ids: list[int]):
+        ids = set(ids)
+        self.pending = [row for row in self.pending if row[0] not in ids]
+
+    def list_webhook_endpoints(self) -> list[dict]:
+        return []
+
+    def save_webhook_dead_letter(self, endpoint_id: int, payload: str, error: str, attempts: int):
+        pass
+
+    def enqueue_force_request(self, chat_id: int, cooldown_seconds: int) -> bool:
+        if any(r["chat_id"] == chat_id and r["processed_at"] is None for r in self.force_requests):
+            return False
+        self.force_requests.append({"chat_id": chat_id, "processed_at": None})
+        return True
+
+    def has_pending_force_requests(self) -> bool:
+        return any(r["processed_at"] is None for r in self.force_requests)
+
+    def claim_force_requests(self) -> list[int]:
+        chat_ids = set()
+        for r in self.force_requests:
+            if r["processed_at"] is None:
+                r["processed_at"] = datetime.now(timezone.utc)
+                chat_ids.add(r["chat_id"])
+        return sorted(chat_ids)
+
+    def sync_outbound_lane(self, process: str, priority: int | None, backlog: int,
+                           ttl_seconds: float) -> list[tuple[str, int | None]]:
+        now = time.monotonic()
+        self.outbound_lanes[process] = (priority, now)
+        return [(name, prio) for name, (prio, updated) in self.outbound_lanes.items() if now - updated < ttl_seconds]
+
+    def release_force_requests(self, chat_ids: list[int]):
+        for chat_id in chat_ids:
+            pedidos = [r for r in self.force_requests if r["chat_id"] == chat_id]
+            if pedidos:
+                pedidos[-1]["processed_at"] = None
+
+    def prune_force_requests(self, retention_days: int = 7) -> int:
+        limite = datetime.now(timezone.utc) - timedelta(days=retention_days)
+        antes = len(self.force_requests)
+        self.force_requests = [r for r in self.force_requests if r["processed_at"] is None or r["processed_at"] >= limite]
+        return antes - len(self.force_requests)
+
+def install_memory_store(store: MemoryStore):
+    """Faz storage.get_store() devolver o MemoryStore (usar antes do primeiro comando do reply_bot)"""
+    import storage
+    storage.get_store = lambda: store
+
+def dump_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Gerador de carga sintética para os handlers do reply bot
+
+Injeta Updates do aiogram diretamente no Dispatcher `dp` em malha aberta (taxa
+fixa, sem esperar as respostas), com chamadas de saída para a Bot API falsa e
+store em memória. Reporta vazão, percentis de latência por comando e o atraso
+(lag) do event loop.
+
+Uso:
+    python benchmarks/load_reply_bot.py --users 5000 --rate 500 --duration 20
+    python benchmarks/load_reply_bot.py --mix oi=1,status=3,hoje=4,semanal=2 --latency 0.05 --save pico
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import contextlib
+from datetime import datetime
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:LOAD")
+os.environ.setdefault("DATABASE_URL", "memory://load")
+
+from fakes import FakeTelegramServer, MemoryStore, build_feed, make_fake_api, make_update, install_memory_store, dump_json
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+LAG_INTERVAL = 0.01
+
+def parse_mix(mix: str) -> list[tuple[str, float]]:
+    """'oi=1,status=2' -> [('oi', 1.0), ('status', 2.0)]"""
+    pesos = []
+    for parte in mix.split(","):
+        comando, _, peso = parte.partition("=")
+        pesos.append((comando.strip(), float(peso or 1)))
+    return pesos
+
+def percentiles(samples: list[float]) -> dict:
+    """p50/p90/p99/max em ms"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(0.50) * 1000, 2),
+        "p90_ms": round(pick(0.90) * 1000, 2),
+        "p99_ms": round(pick(0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+async def measure_loop_lag(samples: list[float], stop: asyncio.Event):
+    """Mede quanto cada sleep curto atrasa além do pedido (lag do event loop)"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, loop.time() - start - LAG_INTERVAL))
+
+async def run_load(args) -> dict:
+    server = FakeTelegramServer(latency=args.latency, rate_429=args.rate_429).start()
+    server.feed = build_feed(args.feed_size, newest=datetime.now().astimezone())
+    os.environ["BACEN_FEED_URL"] = server.feed_url
+
+    install_memory_store(MemoryStore(subscribers=args.users // 2))
+    import reply_bot
+    from http_client import close_http_session
+
+    # Mesmo caminho de envio de produção: BotManager com o agendador de saída
+    manager = reply_bot.make_bot_manager(api=make_fake_api(server))
+    if args.global_rate:
+        manager.scheduler.total_rate = manager.scheduler.rate = args.global_rate
+    bot = manager.get_bot()
+    mix = parse_mix(args.mix)
+    comandos, pesos = [c for c, _ in mix], [p for _, p in mix]
+    rng = random.Random(args.seed)
+
+    latencies: dict[str, list[float]] = {c: [] for c in comandos}
+    errors: dict[str, int] = {c: 0 for c in comandos}
+    lag: list[float] = []
+    stop_lag = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(lag, stop_lag))
+
+    async def handle(update_id: int, comando: str):
+        chat_id = rng.randint(1, args.users)
+        start = time.perf_counter()
+        try:
+            await reply_bot.dp.feed_update(bot, make_update(update_id, chat_id, comando))
+        except Exception:
+            errors[comando] += 1
+        latencies[comando].append(time.perf_counter() - start)
+
+    total = int(args.rate * args.duration)
+    tasks = []
+    print(f"🚀 Enviando {total} updates a {args.rate}/s para {args.users} usuários ({args.mix})...")
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else open(os.devnull, "w")):
+        loop = asyncio.get_running_loop()
+        inicio = loop.time()
+        for i in range(total):
+            # Malha aberta: agenda no instante previsto, independente das respostas
+            atraso = inicio + i / args.rate - loop.time()
+            if atraso > 0:
+                await asyncio.sleep(atraso)
+            comando = rng.choices(comandos, weights=pesos)[0]
+            tasks.append(asyncio.create_task(handle(i + 1, comando)))
+        enviado_em = loop.time() - inicio
+        await asyncio.gather(*tasks)
+        duracao = loop.time() - inicio
+
+    stop_lag.set()
+    await lag_task
+    outbound = manager.scheduler.metrics()
+    await manager.close()
+    await close_http_session()
+    server.stop()
+
+    todas = [x for amostras in latencies.values() for x in amostras]
+    return {
+        "meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "args": vars(args)},
+        "updates": total,
+        "offered_rate": args.rate,
+        "send_duration_s": round(enviado_em, 2),
+        "total_duration_s": round(duracao, 2),
+        "throughput_per_s": round(total / duracao, 1) if duracao else 0.0,
+        "errors": sum(errors.values()),
+        "latency": percentiles(todas),
+        "latency_by_command": {c: percentiles(latencies[c]) for c in comandos},
+        "errors_by_command": errors,
+        "loop_lag": percentiles(lag),
+        "telegram_calls": dict(server.calls),
+        "telegram_429": server.throttled,
+        "antiflood": reply_bot.throttle.metrics(),
+        "outbound": outbound,
+    }
+
+def print_report(report: dict):
+    print(f"\n📊 {report['updates']} updates em {report['total_duration_s']}s "
+          f"→ {report['throughput_per_s']}/s (oferecido: {report['offered_rate']}/s)")
+    lat = report["latency"]
+    print(f"⏱️  Latência geral: p50 {lat.get('p50_ms')} ms | p90 {lat.get('p90_ms')} ms | "
+          f"p99 {lat.get('p99_ms')} ms | max {lat.get('max_ms')} ms")
+    for comando, stats in report["latency_by_command"].items():
+        print(f"   • {comando:<10} n={stats['count']:<6} p50 {stats.get('p50_ms')} ms | p99 {stats.get('p99_ms')} ms")
+    lag = report["loop_lag"]
+    print(f"🐢 Lag do event loop: p50 {lag.get('p50_ms')} ms | p99 {lag.get('p99_ms')} ms | max {lag.get('max_ms')} ms")
+    print(f"📡 Chamadas à Bot API: {sum(report['telegram_calls'].values())} (429: {report['telegram_429']})")
+    flood = report["antiflood"]
+    print(f"🚦 Anti-flood: {flood['allowed']} aceitos, {flood['throttled']} descartados "
+          f"({flood['tracked_chats']} chats acompanhados)")
+    out = report["outbound"]
+    print(f"📤 Saída: {out['rate']} msg/s, espera média na fila {out['avg_wait_ms']} ms ({out['queued']} enfileirados)")
+    if report["errors"]:
+        print(f"❌ Erros: {report['errors_by_command']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga dos handlers do reply bot")
+    parser.add_argument("--users", type=int, default=2000, help="chats distintos")
+    parser.add_argument("--rate", type=float, default=200.0, help="updates por segundo")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos de envio")
+    parser.add_argument("--mix", default="oi=1,status=2,hoje=3,semanal=1")
+    parser.add_argument("--feed-size", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="latência da Bot API falsa (s)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fração de chamadas com 429")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--global-rate", type=float, help="orçamento de envio (msg/s) do agendador de saída (padrão: TELEGRAM_GLOBAL_RATE)")
+    parser.add_argument("--verbose", action="store_true", help="mostra a saída do bot")
+    parser.add_argument("--save", metavar="NOME", help="salva em benchmarks/results/load-NOME.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(args))
+    print_report(report)
+
+    if args.save:
+        path = os.path.join(RESULTS_DIR, f"load-{args.save}.json")
+        dump_json(path, report)
+        print(f"\n💾 Relatório salvo em {path}")
+
+if __name__ == "__main__":
+    main()
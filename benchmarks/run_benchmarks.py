@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Benchmarks offline do BACEN Bot (feed gravado + Bot API falsa + store em memória)
+
+Uso:
+    python benchmarks/run_benchmarks.py --save baseline
+    python benchmarks/run_benchmarks.py --compare baseline
+    python benchmarks/run_benchmarks.py --only parse_feed --latency 0.05 --rate-429 0.02
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+import json
+import contextlib
+from datetime import datetime
+
+# Add project root to path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:BENCH")
+os.environ.setdefault("DATABASE_URL", "memory://bench")
+
+from fakes import FakeTelegramServer, MemoryStore, build_feed, make_fake_api, make_update, install_memory_store, dump_json
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+FEED_SIZES = (25, 250, 2500)
+
+# Os prints do bot durante as medições vão para cá (use --verbose para vê-los)
+_app_output = open(os.devnull, "w")
+
+def summarize(samples: list[float]) -> dict:
+    """Estatísticas de uma lista de tempos (em segundos) convertidas para ms"""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {
+        "runs": len(samples),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+# ============ benchmarks ============
+
+def bench_parse_feed(repeat: int) -> dict:
+    """Parse do feed: parser incremental vs feedparser, para vários tamanhos"""
+    import feedparser
+    from bacen_feed import FeedStreamParser, FEED_CHUNK_SIZE, _build_normativo
+
+    results = {}
+    for size in FEED_SIZES:
+        data = build_feed(size)
+
+        stream_times, first_item_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parser = FeedStreamParser()
+            first = None
+            for offset in range(0, len(data), FEED_CHUNK_SIZE):
+                if parser.feed(data[offset:offset + FEED_CHUNK_SIZE]) and first is None:
+                    first = time.perf_counter() - start
+            parser.close()
+            stream_times.append(time.perf_counter() - start)
+            first_item_times.append(first if first is not None else stream_times[-1])
+
+        tracemalloc.start()
+        parser = FeedStreamParser()
+        for offset in range(0, len(data), FEED_CHUNK_SIZE):
+            parser.feed(data[offset:offset + FEED_CHUNK_SIZE])
+        parser.close()
+        stream_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        feedparser_times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            feed = feedparser.parse(data)
+            for entry in feed.entries:
+                _build_normativo(entry.get("title", ""), entry.get("link", ""), None, entry.get("summary", ""))
+            feedparser_times.append(time.perf_counter() - start)
+
+        results[f"parse_feed[{size}]"] = {
+            "bytes": len(data),
+            "stream": summarize(stream_times),
+            "stream_first_item": summarize(first_item_times),
+            "stream_peak_kb": round(stream_peak / 1024, 1),
+            "feedparser": summarize(feedparser_times),
+        }
+    return results
+
+def bench_analisar_normativo(repeat: int) -> dict:
+    """Análise de tema + mini-resumo por item"""
+    import xml.etree.ElementTree as ET
+    from normativo_analyzer import analisar_normativo
+
+    root = ET.fromstring(build_feed(250))
+    itens = [(i.findtext("title"), i.findtext("description")) for i in root.iter("item")]
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for titulo, resumo in itens:
+            analisar_normativo(titulo, resumo)
+        samples.append(time.perf_counter() - start)
+
+    stats = summarize(samples)
+    stats["items"] = len(itens)
+    stats["items_per_second"] = round(len(itens) / (stats["median_ms"] / 1000), 1)
+    return {"analisar_normativo[250]": stats}
+
+def bench_classificar_temas(repeat: int) -> dict:
+    """Classificação de temas em lote (TF-IDF em NumPy) contra o modelo de palavras-chave item a item"""
+    import xml.etree.ElementTree as ET
+    from normativo_analyzer import NormativoAnalyzer
+    from tema_classifier import HAS_NUMPY, TemaClassifier
+
+    if not HAS_NUMPY:
+        print("⚠️ NumPy não disponível, pulando tema_classifier")
+        return {}
+
+    root = ET.fromstring(build_feed(2500))
+    itens = [(i.findtext("title"), i.findtext("description")) for i in root.iter("item")]
+    analyzer = NormativoAnalyzer()
+    classifier = TemaClassifier().fit_archive(itens)
+
+    results = {}
+    for name, run in (
+        ("tema_classifier[2500]", lambda: classifier.classify(itens)),
+        ("tema_keywords[2500]", lambda: [analyzer.extrair_tema_principal(t, r) for t, r in itens]),
+    ):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            samples.append(time.perf_counter() - start)
+        stats = summarize(samples)
+        stats["items_per_second"] = round(len(itens) / (stats["median_ms"] / 1000), 1)
+        results[name] = stats
+    return results
+
+async def bench_run_once(server: FakeTelegramServer, repeat: int, subscribers: int, novos: int,
+                         global_rate: float) -> dict:
+    """run_once de ponta a ponta: download do feed, dedupe e fan-out para os inscritos"""
+    import sender
+    from bot_session import BotManager
+    from outbound import OutboundScheduler, PRIORITY_BROADCAST
+    from http_client import close_http_session
+
+    sender.is_business_hours = lambda: True
+    sender.EXECUTION_LOG_FILE = os.path.join(tempfile.gettempdir(), "bacen_bench_executions.json")
+    server.feed = build_feed(50)
+    os.environ["BACEN_FEED_URL"] = server.feed_url
+    os.environ["MAX_ITEMS_PER_FEED"] = "50"
+
+    # Mesmo caminho de envio do cron: BotManager com o agendador de saída (prioridade de broadcast)
+    store = None  # trocado a cada rodada; o agendador sempre lê o atual
+    scheduler = OutboundScheduler("cron", PRIORITY_BROADCAST, get_store=lambda: store, total_rate=global_rate)
+    manager = BotManager(scheduler=scheduler, api=make_fake_api(server))
+    bot = manager.get_bot()
+    samples, sent = [], []
+    try:
+        for _ in range(repeat):
+            # Store novo a cada rodada, com só `novos` itens ainda não vistos
+            store = MemoryStore(subscribers=subscribers)
+            feed = await sender.parse_bacen_feed_async()
+            for normativo in feed[novos:]:
+                store.mark_new_and_return_is_new("bacen_feed", normativo.link or normativo.title)
+
+            server.reset_stats()
+            with contextlib.redirect_stdout(_app_output):
+                start = time.perf_counter()
+                await sender.run_once(bot=bot, store=store)
+                samples.append(time.perf_counter() - start)
+            sent.append(server.calls.get("sendMessage", 0))
+    finally:
+        await manager.close()
+        await close_http_session()
+
+    stats = summarize(samples)
+    stats.update(subscribers=subscribers, new_items=novos, messages=sent[-1], throttled=server.throttled,
+                 outbound=scheduler.metrics())
+    return {f"run_once[{subscribers}x{novos}]": stats}
+
+async def bench_reply_commands(server: FakeTelegramServer, repeat: int, global_rate: float) -> dict:
+    """Latência dos comandos do reply bot, do Update até a última resposta enviada"""
+    from http_client import close_http_session
+
+    server.feed = build_feed(50, newest=datetime.now().astimezone())
+    os.environ["BACEN_FEED_URL"] = server.feed_url
+    install_memory_store(MemoryStore(subscribers=100))
+    import reply_bot
+
+    manager = reply_bot.make_bot_manager(api=make_fake_api(server))
+    manager.scheduler.total_rate = manager.scheduler.rate = global_rate
+    bot = manager.get_bot()
+    results = {}
+    update_id = 0
+    try:
+        for comando in ("oi", "status", "ultimo", "hoje", "semanal"):
+            samples = []
+            for _ in range(repeat):
+                update_id += 1
+                update = make_update(update_id, chat_id=1000 + update_id, text=comando)
+                with contextlib.redirect_stdout(_app_output):
+                    start = time.perf_counter()
+                    await reply_bot.dp.feed_update(bot, update)
+                    samples.append(time.perf_counter() - start)
+            results[f"reply[{comando}]"] = summarize(samples)
+    finally:
+        await manager.close()
+        await close_http_session()
+    return results
+
+# ============ resultados ============
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def headline(entry: dict) -> float | None:
+    """Métrica principal de uma entrada (mediana em ms)"""
+    if "median_ms" in entry:
+        return entry["median_ms"]
+    if "stream" in entry:
+        return entry["stream"]["median_ms"]
+    return None
+
+def compare(current: dict, baseline: dict):
+    print(f"\n📊 Comparação com baseline ({baseline['meta']['git']} em {baseline['meta']['timestamp']}):")
+    for name, entry in current["results"].items():
+        before = baseline["results"].get(name)
+        now = headline(entry)
+        if before is None or now is None or not headline(before):
+            print(f"   {name:<32} {now} ms (sem referência)")
+            continue
+        delta = (now - headline(before)) / headline(before) * 100
+        marker = "🟢" if delta <= -5 else ("🔴" if delta >= 5 else "⚪")
+        print(f"   {marker} {name:<30} {headline(before):>10.3f} → {now:>10.3f} ms ({delta:+.1f}%)")
+
+async def run_all(args) -> dict:
+    results = {}
+    wanted = lambda name: not args.only or name in args.only
+
+    if wanted("parse_feed"):
+        results.update(bench_parse_feed(args.repeat))
+    if wanted("analisar_normativo"):
+        results.update(bench_analisar_normativo(args.repeat))
+    if wanted("tema_classifier"):
+        results.update(bench_classificar_temas(args.repeat))
+
+    if wanted("run_once") or wanted("reply"):
+        server = FakeTelegramServer(latency=args.latency, rate_429=args.rate_429).start()
+        try:
+            if wanted("run_once"):
+                results.update(await bench_run_once(server, max(1, args.repeat // 5), args.subscribers, args.new_items,
+                                                    args.global_rate))
+            if wanted("reply"):
+                results.update(await bench_reply_commands(server, args.repeat, args.global_rate))
+        finally:
+            server.stop()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline do BACEN Bot")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", nargs="*", choices=["parse_feed", "analisar_normativo", "tema_classifier", "run_once", "reply"])
+    parser.add_argument("--subscribers", type=int, default=200)
+    parser.add_argument("--new-items", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="latência da Bot API falsa (s)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fração de chamadas com 429")
+    parser.add_argument("--global-rate", type=float, default=float(os.getenv("TELEGRAM_GLOBAL_RATE", "25")),
+                        help="orçamento de envio (msg/s) do agendador de saída, como em produção")
+    parser.add_argument("--verbose", action="store_true", help="mostra a saída do bot durante as medições")
+    parser.add_argument("--save", metavar="NOME", help="salva em benchmarks/results/NOME.json")
+    parser.add_argument("--compare", metavar="NOME", help="compara com benchmarks/results/NOME.json")
+    args = parser.parse_args()
+
+    if args.verbose:
+        global _app_output
+        _app_output = sys.stdout
+
+    print("🏁 Rodando benchmarks offline...")
+    current = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "results": asyncio.run(run_all(args)),
+    }
+
+    for name, entry in current["results"].items():
+        print(f"   {name:<32} {headline(entry)} ms")
+
+    if args.compare:
+        with open(os.path.join(RESULTS_DIR, f"{args.compare}.json"), encoding="utf-8") as f:
+            compare(current, json.load(f))
+
+    if args.save:
+        path = os.path.join(RESULTS_DIR, f"{args.save}.json")
+        dump_json(path, current)
+        print(f"\n💾 Resultados salvos em {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Ciclo de vida do Bot do aiogram: um Bot (e sua sessão HTTP) por processo,
+reaproveitado entre execuções, com métricas e encerramento gracioso
+"""
+import os
+import asyncio
+import time
+from datetime import datetime
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.enums.parse_mode import ParseMode
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+from http_client import make_bot_session, RetryBudget
+from outbound import OutboundScheduler
+
+DRAIN_TIMEOUT = float(os.getenv("BOT_DRAIN_TIMEOUT", "10"))
+
+class SessionMetricsMiddleware(BaseRequestMiddleware):
+    """Conta requisições, erros e latência de cada chamada à API do Telegram"""
+    def __init__(self, manager: "BotManager"):
+        self.manager = manager
+
+    async def __call__(self, make_request, bot, method):
+        manager = self.manager
+        manager.in_flight += 1
+        manager._idle.clear()
+        start = time.monotonic()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            manager.errors += 1
+            raise
+        finally:
+            manager.requests += 1
+            manager.total_latency += time.monotonic() - start
+            manager.by_method[method.__api_method__] = manager.by_method.get(method.__api_method__, 0) + 1
+            manager.in_flight -= 1
+            if manager.in_flight == 0:
+                manager._idle.set()
+
+class BotManager:
+    """
+    Dono do Bot de um processo (cron ou reply bot). O Bot é criado na primeira
+    chamada de get_bot() e mantido até close(), preservando as conexões abertas.
+    Com `scheduler`, os envios passam pelo agendador de saída compartilhado (outbound.py).
+    """
+    def __init__(self, token: Optional[str] = None, budget: Optional[RetryBudget] = None,
+                 scheduler: Optional[OutboundScheduler] = None, api: Optional[TelegramAPIServer] = None):
+        self.token = token
+        self.budget = budget
+        self.scheduler = scheduler
+        self.api = api  # outro servidor da Bot API (ex.: a API falsa dos benchmarks)
+        self._bot: Optional[Bot] = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.created_at: Optional[datetime] = None
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_latency = 0.0
+        self.by_method: dict[str, int] = {}
+
+    def get_bot(self) -> Bot:
+        """Retorna o Bot do processo, criando-o sob demanda"""
+        if self._bot is None:
+            session = make_bot_session(self.budget, **({"api": self.api} if self.api else {}))
+            if self.scheduler is not None:
+                # Depois das retentativas (cada tentativa espera a vez) e antes das
+                # métricas (a latência medida não inclui a espera na fila)
+                session.middleware(self.scheduler)
+            session.middleware(SessionMetricsMiddleware(self))
+            self._bot = Bot(
+                token=self.token or os.environ["TELEGRAM_TOKEN"],
+                session=session,
+                default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+            )
+            self.created_at = datetime.now()
+        return self._bot
+
+    async def close(self, drain_timeout: float = DRAIN_TIMEOUT):
+        """Aguarda as requisições em andamento (até drain_timeout) e fecha a sessão"""
+        if self._bot is None:
+            return
+        if self.in_flight:
+            print(f"⏳ Aguardando {self.in_flight} requisição(ões) ao Telegram...")
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️ {self.in_flight} requisição(ões) ainda em andamento, fechando mesmo assim")
+        await self._bot.session.close()
+        self._bot = None
+
+    def metrics(self) -> dict:
+        """Métricas da sessão atual"""
+        return {
+            "active": self._bot is not None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "avg_latency_ms": round(self.total_latency / self.requests * 1000, 1) if self.requests else 0.0,
+            "by_method": dict(self.by_method),
+            "outbound": self.scheduler.metrics() if self.scheduler else None,
+        }
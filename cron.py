@@ -11,20 +11,48 @@ import pytz
 # Load environment variables
 load_dotenv()
 
+from bot_session import BotManager
+from outbound import OutboundScheduler, PRIORITY_BROADCAST, PRIORITY_INTERACTIVE, priority
+
 # Configuração do fuso horário brasileiro
 BR_TZ = pytz.timezone('America/Sao_Paulo')
 
+# Pedidos 'forcar': intervalo de consulta da fila e intervalo mínimo entre execuções
+FORCE_POLL_SECONDS = int(os.getenv("FORCE_POLL_SECONDS", "15"))
+FORCE_MIN_INTERVAL = int(os.getenv("FORCE_MIN_INTERVAL", "60"))
+
+# Encerramento: tempo máximo (s) para a execução em andamento terminar ou guardar o que falta enviar
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "20"))
+
 class CronWatchdog:
     def __init__(self):
         self.running = True
         self.last_execution = None
         self.max_idle_time = 15 * 60  # 15 minutos máximo sem execução
         self.execution_count = 0
+        self.store = None
+        self.feed_indexed = False  # a primeira verificação indexa o feed inteiro
+        # Broadcasts por padrão; cede a vez às respostas do reply bot (outbound.py)
+        self.bot_manager = BotManager(scheduler=OutboundScheduler("cron", PRIORITY_BROADCAST, get_store=self.get_store))
+        self.seen_filter = None
+        self.roster = None
+        self.webhooks = None
+        self.last_maintenance = None
+        self.stop_event = asyncio.Event()
         
-    def signal_handler(self, signum, frame):
+    def signal_handler(self, signum):
         """Handle shutdown signals gracefully"""
         print(f"\n🛑 Received signal {signum}, shutting down gracefully...")
         self.running = False
+        self.stop_event.set()
+    
+    async def sleep(self, seconds: float) -> bool:
+        """Dorme até `seconds` ou até o pedido de encerramento; retorna True se foi encerrado"""
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
         
     async def health_check(self):
         """Verifica se o cron está funcionando"""
@@ -38,14 +66,128 @@ class CronWatchdog:
         
         return True
     
+    def get_store(self):
+        """Conexão com o banco do processo (criada sob demanda e reaproveitada)"""
+        if self.store is None:
+            from storage import get_store
+            self.store = get_store()
+        return self.store
+    
+    def get_webhooks(self):
+        """Entregas de webhook do processo (usam a conexão atual do banco)"""
+        if self.webhooks is None:
+            from webhooks import WebhookDispatcher
+            self.webhooks = WebhookDispatcher(self.get_store())
+        self.webhooks.store = self.get_store()
+        return self.webhooks
+    
+    def get_seen_filter(self):
+        """Filtro em memória dos itens já vistos, carregado do banco na primeira execução"""
+        if self.seen_filter is None:
+            from storage import SeenItemsFilter
+            self.seen_filter = SeenItemsFilter("bacen_feed")
+        return self.seen_filter
+    
+    def get_roster(self):
+        """Inscritos em memória, atualizados por LISTEN/NOTIFY no event loop do cron"""
+        if self.roster is None:
+            from storage import SubscriberRoster
+            self.roster = SubscriberRoster(os.environ["DATABASE_URL"])
+            self.roster.attach(asyncio.get_running_loop())
+        return self.roster
+    
+    def reset_store(self):
+        """Descarta a conexão atual (ex.: após falha) para reconectar no próximo uso"""
+        if self.store is not None:
+            self.store.close()
+        self.store = None
+    
+    def claim_force_requests(self) -> list[int]:
+        """Atende todos os pedidos 'forcar' pendentes de uma vez"""
+        try:
+            return self.get_store().claim_force_requests()
+        except Exception as e:
+            print(f"⚠️ Erro ao consultar pedidos de verificação: {e}")
+            self.reset_store()
+            return []
+    
+    def release_force_requests(self, chat_ids: list[int]):
+        """Devolve à fila os pedidos 'forcar' de uma execução interrompida"""
+        try:
+            self.get_store().release_force_requests(chat_ids)
+            print(f"↩️ {len(chat_ids)} pedido(s) de verificação devolvido(s) à fila")
+        except Exception as e:
+            print(f"⚠️ Erro ao devolver pedidos de verificação: {e}")
+    
+    async def wait_for_next_run(self, interval: float):
+        """
+        Aguarda o próximo tick, antecipando-o se houver pedidos 'forcar' pendentes.
+        Vários pedidos no mesmo intervalo resultam em uma única execução.
+        """
+        deadline = time.monotonic() + interval
+        while self.running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if await self.sleep(min(FORCE_POLL_SECONDS, remaining)):
+                return
+            
+            if self.last_execution:
+                since_last = (datetime.now(BR_TZ) - self.last_execution).total_seconds()
+                if since_last < FORCE_MIN_INTERVAL:
+                    continue
+            try:
+                if self.get_store().has_pending_force_requests():
+                    print("⚡ Pedido de verificação forçada recebido — antecipando execução")
+                    return
+            except Exception as e:
+                print(f"⚠️ Erro ao consultar pedidos de verificação: {e}")
+                self.reset_store()
+    
+    def run_maintenance(self):
+        """Manutenção diária: retenção de seen_items e force_requests e reconciliação dos contadores"""
+        today = datetime.now(BR_TZ).date()
+        if self.last_maintenance == today:
+            return
+        
+        from sender import log_execution
+        try:
+            store = self.get_store()
+            removed = store.prune_seen_items()
+            force_removed = store.prune_force_requests()
+            stats = store.recount_stats()
+            if removed:
+                self.get_seen_filter().load(store)  # descarta as chaves removidas
+            self.last_maintenance = today
+            print(f"🧹 Manutenção: {removed} item(ns) antigo(s) removido(s) de seen_items ({stats['seen_items']} restantes)")
+            log_execution("maintenance", {
+                "seen_items_pruned": removed,
+                "force_requests_pruned": force_removed,
+                "seen_items_count": stats['seen_items'],
+                "subscriber_count": stats['subscribers']
+            })
+        except Exception as e:
+            print(f"⚠️ Erro na manutenção do banco: {e}")
+            self.reset_store()
+    
+    async def report_force_result(self, chat_ids: list[int], result: dict):
+        """Envia o resultado da execução para quem pediu 'forcar'"""
+        from sender import format_force_result
+        
+        bot = self.bot_manager.get_bot()
+        msg = format_force_result(result)
+        # Resposta a um comando: passa na frente do broadcast
+        with priority(PRIORITY_INTERACTIVE):
+            for chat_id in chat_ids:
+                try:
+                    await bot.send_message(chat_id, msg)
+                except Exception as ex:
+                    print(f"❌ Falha ao enviar resultado para {chat_id}: {ex}")
+    
     async def run_cron_with_watchdog(self):
         """Executa cron com watchdog"""
         print("🕒 Iniciando cron com watchdog (10 em 10 min, 08:00-19:25h SP)")
         
-        # Set up signal handlers
-        signal.signal(signal.SIGINT, self.signal_handler)
-        signal.signal(signal.SIGTERM, self.signal_handler)
-        
         consecutive_errors = 0
         max_consecutive_errors = 3
         
@@ -69,8 +211,44 @@ class CronWatchdog:
                 except:
                     pass
                 
-                # Executa verificação
-                await run_once()
+                # Pedidos 'forcar' pendentes são atendidos por esta execução
+                forced_by = self.claim_force_requests()
+                if forced_by:
+                    print(f"⚡ Execução forçada por {len(forced_by)} chat(s)")
+                
+                # Executa verificação reaproveitando o Bot e a conexão do processo
+                result = {"status": "error", "reason": "cancelled"}
+                cancelled = False
+                try:
+                    result = await run_once(
+                        bot=self.bot_manager.get_bot(),
+                        store=self.get_store(),
+                        seen_filter=self.get_seen_filter(),
+                        roster=self.get_roster(),
+                        stop_event=self.stop_event,
+                        webhooks=self.get_webhooks(),
+                        index_feed=not self.feed_indexed,
+                    )
+                except asyncio.CancelledError:
+                    cancelled = True
+                    raise
+                except Exception as e:
+                    result = {"status": "error", "reason": "execution_error", "error": str(e)}
+                    raise
+                finally:
+                    if forced_by and cancelled:
+                        # Encerramento no meio da execução: os pedidos voltam para a fila
+                        self.release_force_requests(forced_by)
+                    elif forced_by:
+                        await self.report_force_result(forced_by, result)
+                
+                if result.get("status") in ("success", "no_new_items"):
+                    self.feed_indexed = True
+                
+                if result.get("reason") == "database_unhealthy":
+                    self.reset_store()  # reconecta na próxima execução
+                elif self.running:
+                    self.run_maintenance()
                 
                 # Atualiza timestamp da última execução
                 self.last_execution = datetime.now(BR_TZ)
@@ -84,6 +262,10 @@ class CronWatchdog:
                     log_execution("cron_success", {
                         "timestamp": self.last_execution.isoformat(),
                         "execution_count": self.execution_count,
+                        "bot_session": self.bot_manager.metrics(),
+                        "seen_filter": {"keys": len(self.get_seen_filter()), "db_checks": self.get_seen_filter().db_checks},
+                        "roster": {"subscribers": len(self.get_roster()), "notifications": self.get_roster().notifications},
+                        "webhooks": self.get_webhooks().metrics(),
                         "watchdog": True
                     })
                 except:
@@ -108,13 +290,13 @@ class CronWatchdog:
                 # Se muitos erros consecutivos, reinicia completamente
                 if consecutive_errors >= max_consecutive_errors:
                     print(f"💥 Muitos erros consecutivos ({consecutive_errors}), reiniciando cron...")
-                    await asyncio.sleep(5 * 60)  # 5 minutos
+                    await self.sleep(5 * 60)  # 5 minutos
                     consecutive_errors = 0
                     continue
             
-            # Aguarda 10 minutos para próxima execução
+            # Aguarda 10 minutos para próxima execução (ou um pedido 'forcar')
             print("⏳ Aguardando 10 minutos...")
-            await asyncio.sleep(10 * 60)  # 10 minutos
+            await self.wait_for_next_run(10 * 60)  # 10 minutos
     
     async def start_watchdog(self):
         """Inicia o watchdog"""
@@ -126,15 +308,35 @@ class CronWatchdog:
         # Task do watchdog
         watchdog_task = asyncio.create_task(self.watchdog_loop())
         
+        # Set up signal handlers
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.signal_handler, sig)
+        
         # Aguarda qualquer uma das tasks terminar
         done, pending = await asyncio.wait(
             [cron_task, watchdog_task],
             return_when=asyncio.FIRST_COMPLETED
         )
         
-        # Cancela tasks pendentes
+        # Encerramento: a execução em andamento para de enviar e guarda o restante
+        self.running = False
+        self.stop_event.set()
+        if pending:
+            done, pending = await asyncio.wait(pending, timeout=SHUTDOWN_TIMEOUT)
+        
+        # Cancela tasks pendentes (o fan-out cancelado ainda guarda o que falta enviar)
         for task in pending:
+            print("⚠️ Prazo de encerramento esgotado, cancelando execução em andamento")
             task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        
+        await self.bot_manager.close()
+        if self.webhooks is not None:
+            await self.webhooks.close()
+        if self.roster is not None:
+            self.roster.close()
+        self.reset_store()
         
         print("🏁 Watchdog finalizado")
     
@@ -142,7 +344,8 @@ class CronWatchdog:
         """Loop do watchdog"""
         while self.running:
             try:
-                await asyncio.sleep(5 * 60)  # Verifica a cada 5 minutos
+                if await self.sleep(5 * 60):  # Verifica a cada 5 minutos
+                    break
                 
                 if not await self.health_check():
                     print("🔄 Watchdog detectou problema - reiniciando cron...")
@@ -166,7 +369,11 @@ async def main():
     print(f"📅 Started at: {datetime.now(BR_TZ)}")
     
     watchdog = CronWatchdog()
-    await watchdog.start_watchdog()
+    try:
+        await watchdog.start_watchdog()
+    finally:
+        from http_client import close_http_session
+        await close_http_session()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Feed próprio do bot (/feed.json e /feed.xml), servido a partir do snapshot do feed do BACEN
+
+Os sistemas internos consultam o servidor web do reply bot em vez do bcb.gov.br:
+o download é o mesmo que o bot já faz (FeedSnapshot), e cada resposta é montada
+uma vez por versão do snapshot e guardada (já comprimida) em memória.
+
+Paginação por cursor: ?since=<cursor> devolve os normativos publicados depois do
+cursor, do mais antigo para o mais recente, até `limit`; o próximo pedido usa o
+`next_since` da resposta. Sem since, vêm os `limit` mais recentes.
+"""
+import os
+import gzip
+import json
+import bisect
+import hashlib
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from email.utils import format_datetime
+from typing import Optional
+
+from aiohttp import web
+
+from bacen_feed import FeedSnapshot, BACENNormativo, get_feed_snapshot_async, get_bacen_feed_url
+
+FEED_PAGE_SIZE = int(os.getenv("FEED_PAGE_SIZE", "50"))
+FEED_PAGE_MAX = 200
+# Respostas montadas guardadas por (versão do snapshot, formato, since, limit)
+FEED_RESPONSE_CACHE_SIZE = 128
+# Os consumidores podem guardar a resposta por até isso (s); o ETag valida depois
+FEED_MAX_AGE = 60
+
+BACEN_NS = "https://www.bcb.gov.br/normativos"
+
+def item_cursor(normativo: BACENNormativo) -> str:
+    """Cursor estável de um normativo: data de publicação + hash do link (desempate)"""
+    key = hashlib.md5((normativo.link or normativo.title).encode("utf-8")).hexdigest()[:8]
+    return f"{int(normativo.published.timestamp())}-{key}"
+
+def _cursor_key(cursor: str) -> tuple:
+    """'1760000000-ab12cd34' -> (1760000000, 'ab12cd34'); ValueError se inválido"""
+    ts, _, key = cursor.partition("-")
+    return int(ts), key
+
+def normativo_dict(normativo: BACENNormativo, cursor: str) -> dict:
+    return {
+        "id": cursor,
+        "title": normativo.title,
+        "link": normativo.link,
+        "published": normativo.published.isoformat(),
+        "summary": normativo.summary,
+        "tema": normativo.tema,
+        "mini_resumo": normativo.mini_resumo,
+    }
+
+class FeedPage:
+    """Uma resposta pronta: corpo, versão comprimida e ETag"""
+    def __init__(self, body: bytes, content_type: str):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6)
+        self.content_type = content_type
+        self.etag = '"' + hashlib.md5(body).hexdigest()[:20] + '"'
+
+class FeedExport:
+    """
+    Índice do snapshot atual (cursores em ordem crescente) e cache das respostas.
+    Trocar de snapshot invalida tudo de uma vez (a versão faz parte da chave).
+    """
+    def __init__(self, cache_size: int = FEED_RESPONSE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._version: Optional[str] = None
+        self._items: list[BACENNormativo] = []
+        self._cursors: list[str] = []
+        self._keys: list[tuple] = []
+        self._pages: "OrderedDict[tuple, FeedPage]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def _index(self, snapshot: FeedSnapshot):
+        if snapshot.version == self._version:
+            return
+        pares = sorted(((item_cursor(n), n) for n in snapshot.normativos), key=lambda p: _cursor_key(p[0]))
+        self._cursors = [c for c, _ in pares]
+        self._items = [n for _, n in pares]
+        self._keys = [_cursor_key(c) for c in self._cursors]
+        self._version = snapshot.version
+        self._pages.clear()
+
+    def window(self, since: Optional[str], limit: int) -> tuple[int, int]:
+        """Fatia [lo, hi) dos itens (ordem crescente) para since/limit"""
+        if since is None:
+            hi = len(self._items)
+            return max(0, hi - limit), hi
+        lo = bisect.bisect_right(self._keys, _cursor_key(since))
+        return lo, min(len(self._items), lo + limit)
+
+    def page(self, snapshot: FeedSnapshot, fmt: str, since: Optional[str], limit: int) -> FeedPage:
+        """Resposta pronta para a consulta (montada na primeira vez para esta versão do snapshot)"""
+        self._index(snapshot)
+        key = (self._version, fmt, since, limit)
+        page = self._pages.get(key)
+        if page is not None:
+            self.hits += 1
+            self._pages.move_to_end(key)
+            return page
+        self.misses += 1
+        lo, hi = self.window(since, limit)
+        page = self._render_json(lo, hi, since) if fmt == "json" else self._render_xml(lo, hi)
+        self._pages[key] = page
+        if len(self._pages) > self.cache_size:
+            self._pages.popitem(last=False)
+        return page
+
+    def _render_json(self, lo: int, hi: int, since: Optional[str]) -> FeedPage:
+        items = [normativo_dict(self._items[i], self._cursors[i]) for i in range(lo, hi)]
+        body = {
+            "version": self._version,
+            "source": get_bacen_feed_url(),
+            "count": len(items),
+            "since": since,
+            # Sem itens novos, o mesmo cursor serve para o próximo pedido
+            "next_since": self._cursors[hi - 1] if hi > lo else since,
+            "has_more": hi < len(self._items) and since is not None,
+            "items": items,
+        }
+        return FeedPage(json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json")
+
+    def _render_xml(self, lo: int, hi: int) -> FeedPage:
+        ET.register_namespace("bacen", BACEN_NS)
+        rss = ET.Element("rss", version="2.0")
+        channel = ET.SubElement(rss, "channel")
+        ET.SubElement(channel, "title").text = "Normativos do BACEN"
+        ET.SubElement(channel, "link").text = get_bacen_feed_url()
+        ET.SubElement(channel, "description").text = "Normativos do Banco Central com tema e resumo (BACEN Bot)"
+        # RSS: mais recente primeiro
+        for i in range(hi - 1, lo - 1, -1):
+            normativo = self._items[i]
+            item = ET.SubElement(channel, "item")
+            ET.SubElement(item, "title").text = normativo.title
+            ET.SubElement(item, "link").text = normativo.link
+            ET.SubElement(item, "guid", isPermaLink="false").text = self._cursors[i]
+            ET.SubElement(item, "pubDate").text = format_datetime(normativo.published)
+            ET.SubElement(item, "description").text = normativo.mini_resumo or normativo.summary
+            ET.SubElement(item, f"{{{BACEN_NS}}}tema").text = normativo.tema
+            ET.SubElement(item, f"{{{BACEN_NS}}}cursor").text = self._cursors[i]
+        body = ET.tostring(rss, encoding="utf-8", xml_declaration=True)
+        return FeedPage(body, "application/rss+xml")
+
+    async def handle(self, request: web.Request, fmt: str) -> web.Response:
+        """Handler aiohttp de /feed.json e /feed.xml"""
+        since = request.query.get("since") or None
+        try:
+            if since is not None:
+                _cursor_key(since)
+            limit = min(max(int(request.query.get("limit", FEED_PAGE_SIZE)), 1), FEED_PAGE_MAX)
+        except ValueError:
+            return web.json_response({"error": "since ou limit inválido"}, status=400)
+
+        snapshot = await get_feed_snapshot_async()
+        page = self.page(snapshot, fmt, since, limit)
+
+        headers = {
+            "ETag": page.etag,
+            "Cache-Control": f"public, max-age={FEED_MAX_AGE}",
+            "Vary": "Accept-Encoding",
+        }
+        if page.etag in request.headers.get("If-None-Match", ""):
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+
+        body = page.body
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            body = page.gzipped
+            headers["Content-Encoding"] = "gzip"
+        return web.Response(body=body, headers=headers, content_type=page.content_type, charset="utf-8")
+
+    def metrics(self) -> dict:
+        return {
+            "version": self._version,
+            "items": len(self._items),
+            "cached_responses": len(self._pages),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Camada HTTP compartilhada para as chamadas de saída (feed do BACEN e API do Telegram)
+
+- Um único ClientSession por processo, com pool de conexões, keep-alive e cache de DNS
+- Timeouts explícitos de conexão e leitura
+- Retentativas com backoff exponencial + jitter, limitadas por um orçamento por tick
+"""
+import os
+import ssl
+import asyncio
+import random
+import time
+import urllib.request
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import aiohttp
+import certifi
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "600"))
+HTTP_MAX_ATTEMPTS = int(os.getenv("HTTP_MAX_ATTEMPTS", "3"))
+HTTP_RETRY_BUDGET = int(os.getenv("HTTP_RETRY_BUDGET", "20"))
+
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10.0
+RETRY_AFTER_MAX = 30.0  # 429 com espera maior que isso não é retentado
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+USER_AGENT = "bacen-bot/1.0 (+https://www.bcb.gov.br)"
+
+class RetryBudget:
+    """
+    Orçamento de retentativas. No cron é zerado a cada tick (reset); em processos
+    de longa duração pode ser renovado automaticamente a cada `window` segundos.
+    """
+    def __init__(self, max_retries: int, window: Optional[float] = None):
+        self.max_retries = max_retries
+        self.window = window
+        self.used = 0
+        self._window_start: Optional[float] = None
+
+    def _maybe_refill(self):
+        if self.window is None:
+            return
+        now = time.monotonic()
+        if self._window_start is None or now - self._window_start >= self.window:
+            self._window_start = now
+            self.used = 0
+
+    def try_consume(self) -> bool:
+        """Consome uma retentativa; retorna False se o orçamento acabou"""
+        self._maybe_refill()
+        if self.used >= self.max_retries:
+            return False
+        self.used += 1
+        return True
+
+    def reset(self):
+        self.used = 0
+        self._window_start = None
+
+    @property
+    def remaining(self) -> int:
+        self._maybe_refill()
+        return max(self.max_retries - self.used, 0)
+
+_retry_budget = RetryBudget(HTTP_RETRY_BUDGET)
+_session: Optional[aiohttp.ClientSession] = None
+
+def get_retry_budget() -> RetryBudget:
+    """Orçamento de retentativas padrão do processo"""
+    return _retry_budget
+
+def reset_retry_budget():
+    """Zera o orçamento de retentativas (chamado no início de cada tick do cron)"""
+    _retry_budget.reset()
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponencial com jitter completo"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def make_timeout() -> aiohttp.ClientTimeout:
+    return aiohttp.ClientTimeout(
+        total=None,
+        connect=HTTP_CONNECT_TIMEOUT,
+        sock_connect=HTTP_CONNECT_TIMEOUT,
+        sock_read=HTTP_READ_TIMEOUT,
+    )
+
+def make_connector(limit: int = HTTP_POOL_LIMIT, **kwargs) -> aiohttp.TCPConnector:
+    return aiohttp.TCPConnector(
+        limit=limit,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        **kwargs,
+    )
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Retorna o ClientSession compartilhado do processo (criado sob demanda)"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=make_connector(),
+            timeout=make_timeout(),
+            headers={"User-Agent": USER_AGENT},
+        )
+    return _session
+
+async def close_http_session():
+    """Fecha o ClientSession compartilhado"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+@asynccontextmanager
+async def open_with_retry(
+    method: str,
+    url: str,
+    session: Optional[aiohttp.ClientSession] = None,
+    budget: Optional[RetryBudget] = None,
+    **kwargs,
+) -> AsyncIterator[aiohttp.ClientResponse]:
+    """
+    Abre uma requisição com retentativas para falhas de conexão/timeout e respostas
+    429/5xx. Só a abertura é retentada; o corpo é lido pelo chamador (permite streaming).
+    """
+    session = session or await get_http_session()
+    budget = budget or _retry_budget
+
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            resp = await session.request(method, url, **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if attempt >= HTTP_MAX_ATTEMPTS or not budget.try_consume():
+                raise
+            print(f"⚠️ {method} {url} falhou ({type(e).__name__}), tentativa {attempt}")
+        else:
+            if resp.status not in RETRY_STATUSES or attempt >= HTTP_MAX_ATTEMPTS or not budget.try_consume():
+                try:
+                    yield resp
+                finally:
+                    resp.release()
+                return
+            print(f"⚠️ {method} {url} respondeu {resp.status}, tentativa {attempt}")
+            resp.release()
+
+        await asyncio.sleep(backoff_delay(attempt))
+
+def fetch_bytes_sync(url: str) -> bytes:
+    """Download síncrono com timeout (para os caminhos que ainda usam feedparser)"""
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=HTTP_CONNECT_TIMEOUT + HTTP_READ_TIMEOUT) as resp:
+        return resp.read()
+
+# ============ Telegram ============
+
+class RetryRequestMiddleware(BaseRequestMiddleware):
+    """
+    Middleware de requisição do aiogram: retenta 429 (respeitando retry_after) e,
+    apenas para métodos de leitura, falhas de rede/5xx — reenviar um sendMessage
+    cuja resposta se perdeu poderia duplicar a mensagem.
+    """
+    def __init__(self, budget: Optional[RetryBudget] = None, max_attempts: int = HTTP_MAX_ATTEMPTS):
+        self.budget = budget or _retry_budget
+        self.max_attempts = max_attempts
+
+    async def __call__(self, make_request, bot, method):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if e.retry_after > RETRY_AFTER_MAX or attempt >= self.max_attempts or not self.budget.try_consume():
+                    raise
+                delay = e.retry_after + random.uniform(0, 1)
+            except (TelegramNetworkError, TelegramServerError):
+                if not _is_idempotent(method) or attempt >= self.max_attempts or not self.budget.try_consume():
+                    raise
+                delay = backoff_delay(attempt)
+            await asyncio.sleep(delay)
+
+def _is_idempotent(method) -> bool:
+    return method.__api_method__.startswith("get")
+
+class PooledAiohttpSession(AiohttpSession):
+    """
+    AiohttpSession do aiogram com keep-alive e cache de DNS configurados. O
+    ClientSession é montado aqui (make_connector), sem depender dos atributos
+    internos do aiogram; só `limit` passa pelo construtor público.
+    """
+    def __init__(self, limit: int = HTTP_POOL_LIMIT, **kwargs):
+        kwargs.setdefault("timeout", HTTP_CONNECT_TIMEOUT + HTTP_READ_TIMEOUT)
+        super().__init__(limit=limit, **kwargs)
+        self.pool_limit = limit
+        self._pooled: Optional[aiohttp.ClientSession] = None
+
+    async def create_session(self) -> aiohttp.ClientSession:
+        if self._pooled is None or self._pooled.closed:
+            # Mesmos certificados que o aiogram usa para a API do Telegram
+            ssl_context = ssl.create_default_context(cafile=certifi.where())
+            self._pooled = aiohttp.ClientSession(
+                connector=make_connector(self.pool_limit, ssl=ssl_context),
+                headers={"User-Agent": USER_AGENT},
+            )
+        return self._pooled
+
+    async def close(self) -> None:
+        if self._pooled is not None and not self._pooled.closed:
+            await self._pooled.close()
+        await super().close()
+
+def make_bot_session(budget: Optional[RetryBudget] = None, **kwargs) -> AiohttpSession:
+    """Cria a sessão HTTP usada pelos Bots do aiogram, já com o middleware de retentativas"""
+    session = PooledAiohttpSession(**kwargs)
+    session.middleware(RetryRequestMiddleware(budget))
+    return session
@@ -4,9 +4,11 @@ Main entry point for the BACEN Bot reply service on Railway
 Runs only the reply bot for handling user messages
 """
 import asyncio
+import importlib
 import os
 import signal
 import sys
+import time
 from datetime import datetime
 from dotenv import load_dotenv
 from aiohttp import web
@@ -16,29 +18,124 @@ import pytz
 # Load environment variables
 load_dotenv()
 
-# Import bot modules
-from reply_bot import main as reply_bot_main
+# reply_bot (aiogram, feed, banco) só é importado depois que o servidor de health
+# check está no ar; a rota do webhook usa a mesma variável que reply_bot.WEBHOOK_PATH
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
 
 # Configuração do fuso horário brasileiro
 BR_TZ = pytz.timezone('America/Sao_Paulo')
 
+# Inicialização em etapas: espera máxima (s) entre tentativas de conectar ao banco/Telegram
+STARTUP_RETRY_MAX_DELAY = float(os.getenv("STARTUP_RETRY_MAX_DELAY", "30"))
+
+# Encerramento: tempo máximo (s) para os handlers em andamento terminarem
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "20"))
+
 class BACENReplyBot:
     def __init__(self):
         self.running = True
+        self.bot_manager = None  # criado em start(), após importar o reply_bot
+        self.webhook_handler = None  # criado quando o modo webhook é ativado
+        self.runner = None
+        self.reply_bot = None  # módulo reply_bot, depois de importado
+        self.feed_export = None  # feed_export.FeedExport, criado no primeiro pedido de /feed.*
+        self.import_lock = asyncio.Lock()
+        self.stop_event = asyncio.Event()
+        self.started_at = time.monotonic()
+        # Etapas da inicialização; o serviço está pronto quando todas estão prontas
+        self.stages = {
+            name: {"ready": False, "attempts": 0, "error": None}
+            for name in ("web", "store", "bot")
+        }
         
-    def signal_handler(self, signum, frame):
+    def signal_handler(self, signum):
         """Handle shutdown signals gracefully"""
         print(f"\n🛑 Received signal {signum}, shutting down gracefully...")
         self.running = False
+        self.stop_event.set()
         
+    def is_ready(self) -> bool:
+        return all(stage["ready"] for stage in self.stages.values())
+    
     async def health_check_handler(self, request):
-        """Health check endpoint for Railway"""
+        """Liveness (health check do Railway): responde 200 enquanto o processo está de pé"""
         return web.json_response({
             "status": "healthy",
+            "ready": self.is_ready(),
             "service": "bacen-reply-bot",
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+            "stages": self.stages,
             "timestamp": datetime.now(BR_TZ).isoformat()
         })
     
+    async def ready_handler(self, request):
+        """Readiness: 200 só depois que banco e bot foram inicializados"""
+        ready = self.is_ready()
+        return web.json_response({
+            "status": "ready" if ready else "starting",
+            "service": "bacen-reply-bot",
+            "stages": self.stages,
+            "timestamp": datetime.now(BR_TZ).isoformat()
+        }, status=200 if ready else 503)
+    
+    async def init_stage(self, name: str, init, fatal: tuple = ()) -> bool:
+        """
+        Executa uma etapa da inicialização, tentando de novo (backoff exponencial até
+        STARTUP_RETRY_MAX_DELAY) enquanto o serviço estiver rodando. Erros em `fatal`
+        não são retentados.
+        """
+        stage = self.stages[name]
+        while self.running:
+            stage["attempts"] += 1
+            try:
+                await init()
+            except fatal:
+                raise
+            except Exception as e:
+                stage["error"] = str(e)
+                delay = min(STARTUP_RETRY_MAX_DELAY, 2 ** (stage["attempts"] - 1))
+                print(f"⚠️ Falha ao inicializar {name} (tentativa {stage['attempts']}): {e} — nova tentativa em {delay:.0f}s")
+                try:
+                    await asyncio.wait_for(self.stop_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            stage.update(ready=True, error=None)
+            print(f"✅ {name} pronto em {time.monotonic() - self.started_at:.1f}s")
+            return True
+        return False
+    
+    async def telegram_webhook_handler(self, request):
+        """Recebe updates do Telegram (modo webhook)"""
+        if self.webhook_handler is None:
+            return web.Response(status=503, text="Webhook não configurado")
+        return await self.webhook_handler.handle(request)
+    
+    async def import_module(self, name: str):
+        """
+        Importa um módulo pesado fora do event loop. Um de cada vez: imports
+        simultâneos em threads diferentes dos mesmos pacotes (aiogram) dão deadlock.
+        """
+        async with self.import_lock:
+            return await asyncio.to_thread(importlib.import_module, name)
+    
+    async def feed_handler(self, request):
+        """/feed.json e /feed.xml: normativos com tema e resumo, servidos do snapshot em memória"""
+        if self.feed_export is None:
+            feed_export = await self.import_module("feed_export")
+            self.feed_export = self.feed_export or feed_export.FeedExport()
+        return await self.feed_export.handle(request, request.match_info["fmt"])
+    
+    async def metrics_handler(self, request):
+        """Métricas da sessão do Bot (requisições, erros, latência)"""
+        return web.json_response({
+            "service": "bacen-reply-bot",
+            "timestamp": datetime.now(BR_TZ).isoformat(),
+            "bot_session": self.bot_manager.metrics() if self.bot_manager else None,
+            "antiflood": self.reply_bot.throttle.metrics() if self.reply_bot else None,
+            "feed_export": self.feed_export.metrics() if self.feed_export else None
+        })
+    
     async def monitor_handler(self, request):
         """Página de monitoramento do bacen-cron"""
         try:
@@ -63,16 +160,21 @@ class BACENReplyBot:
         """Start a simple web server for health checks"""
         app = web.Application()
         app.router.add_get('/health', self.health_check_handler)
+        app.router.add_get('/ready', self.ready_handler)
         app.router.add_get('/', self.health_check_handler)
         app.router.add_get('/monitor', self.monitor_handler)
+        app.router.add_get('/metrics', self.metrics_handler)
+        app.router.add_get('/feed.{fmt:json|xml}', self.feed_handler)
+        app.router.add_post(WEBHOOK_PATH, self.telegram_webhook_handler)
         
-        runner = web.AppRunner(app)
+        self.runner = runner = web.AppRunner(app)
         await runner.setup()
         
         # Use PORT environment variable or default to 8000
         port = int(os.getenv('PORT', 8000))
         site = web.TCPSite(runner, '0.0.0.0', port)
         await site.start()
+        self.stages["web"].update(ready=True, attempts=1)
         print(f"🌐 Health check server running on port {port}")
         print(f"📊 Monitoramento disponível em: http://localhost:{port}/monitor")
         
@@ -82,24 +184,77 @@ class BACENReplyBot:
         print(f"📅 Started at: {datetime.now(BR_TZ)}")
         
         # Set up signal handlers
-        signal.signal(signal.SIGINT, self.signal_handler)
-        signal.signal(signal.SIGTERM, self.signal_handler)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.signal_handler, sig)
         
+        reply_bot = None
         try:
             # Start health check server
             await self.start_web_server()
             
             print("🤖 Starting reply bot...")
-            await reply_bot_main()
+            # Import pesado (aiogram) numa thread, para o /health seguir respondendo
+            self.reply_bot = reply_bot = await self.import_module("reply_bot")
+            from aiogram.exceptions import TelegramUnauthorizedError
+            
+            # Banco e Telegram inicializados com o servidor já no ar, com retentativas
+            if not await self.init_stage("store", lambda: asyncio.to_thread(reply_bot.get_bot_store)):
+                return True
+            self.bot_manager = reply_bot.make_bot_manager()
+            bot = self.bot_manager.get_bot()
+            if not await self.init_stage("bot", bot.get_me, fatal=(TelegramUnauthorizedError,)):
+                return True
+            
+            if reply_bot.webhook_enabled():
+                self.webhook_handler = reply_bot.make_webhook_handler(bot)
+                if await reply_bot.setup_webhook(bot):
+                    # Updates chegam pelo servidor web; só aguarda o encerramento
+                    await self.stop_event.wait()
+                    # Novos updates recebem 503 e o Telegram os reenvia (para a próxima instância)
+                    self.webhook_handler = None
+                    return True
+                self.webhook_handler = None
+            
+            polling = asyncio.create_task(reply_bot.main(bot))
+            stop = asyncio.create_task(self.stop_event.wait())
+            await asyncio.wait([polling, stop], return_when=asyncio.FIRST_COMPLETED)
+            stop.cancel()
+            if not polling.done():
+                # Para de buscar updates; os já recebidos seguem sendo processados
+                try:
+                    await reply_bot.dp.stop_polling()
+                except RuntimeError:
+                    polling.cancel()  # ainda não tinha começado o polling
+            try:
+                await polling
+            except asyncio.CancelledError:
+                pass
         except KeyboardInterrupt:
             print("\n🛑 Keyboard interrupt received")
         except Exception as e:
             print(f"❌ Unexpected error: {e}")
             return False
         finally:
+            await self.shutdown(reply_bot)
             print("🏁 BACEN Reply Bot shutdown complete")
             
         return True
+    
+    async def shutdown(self, reply_bot):
+        """Encerramento coordenado: aguarda os handlers em andamento e fecha Bot, banco e servidor"""
+        if reply_bot is not None and reply_bot.in_flight.count:
+            print(f"⏳ Aguardando {reply_bot.in_flight.count} update(s) em processamento...")
+            if not await reply_bot.in_flight.wait_idle(SHUTDOWN_TIMEOUT):
+                print(f"⚠️ {reply_bot.in_flight.count} update(s) ainda em processamento, encerrando mesmo assim")
+        if self.bot_manager is not None:
+            await self.bot_manager.close()
+        if reply_bot is not None:
+            reply_bot.close_bot_store()
+            from http_client import close_http_session
+            await close_http_session()
+        if self.runner is not None:
+            await self.runner.cleanup()
 
 async def main():
     """Main entry point"""
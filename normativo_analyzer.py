@@ -3,8 +3,146 @@
 Módulo para análise e extração de temas dos normativos do BACEN
 """
 import re
-from typing import List, Dict, Optional
-from bs4 import BeautifulSoup
+import unicodedata
+from typing import List, Dict, NamedTuple, Optional
+
+class Identificador(NamedTuple):
+    """Identificação de um normativo: tipo canônico, número e ano"""
+    tipo: str
+    numero: int
+    ano: Optional[int]
+
+    def __str__(self) -> str:
+        numero = f"{self.numero:,}".replace(",", ".")
+        return f"{self.tipo} nº {numero}" + (f"/{self.ano}" if self.ano else "")
+
+# Tipo no texto -> tipo canônico. "Resolução nº X" sem CMN/BCB é do CMN (padrão anterior a 2020)
+TIPOS_NORMATIVO = {
+    "resolução cmn": "Resolução CMN",
+    "resolução bcb": "Resolução BCB",
+    "resolução conjunta": "Resolução Conjunta",
+    "resolução": "Resolução CMN",
+    "instrução normativa bcb": "Instrução Normativa BCB",
+    "instrução normativa": "Instrução Normativa BCB",
+    "carta circular": "Carta Circular",
+    "circular": "Circular",
+    "comunicado": "Comunicado",
+}
+
+# "Resolução CMN nº 4.966, de 25 de novembro de 2021", "Circular n° 3.998 de 01/10/2025"...
+IDENTIFICADOR_RE = re.compile(
+    r"(?P<tipo>resolu[çc][ãa]o(?:\s+(?:cmn|bcb|conjunta))?|instru[çc][ãa]o\s+normativa(?:\s+bcb)?"
+    r"|carta[\s-]+circular|circular|comunicado)"
+    r"\s+(?:n[°º.o]*\s*)?(?P<numero>\d{1,3}(?:\.\d{3})+|\d+)"
+    r"(?:,?\s+de\s+(?:\d{1,2}/\d{1,2}/(?P<ano>\d{4})|\d{1,2}º?\s+de\s+[a-zç]+\s+de\s+(?P<ano_extenso>\d{4})))?",
+    re.IGNORECASE,
+)
+
+def _sem_acentos(texto: str) -> str:
+    """Minúsculas, sem acentos e com espaços simples ('Resoluçao' e 'Resolucão' viram 'resolucao')"""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"[\s-]+", " ", texto)
+
+# TIPOS_NORMATIVO indexado sem acentos: o regex aceita qualquer mistura de grafias
+_TIPOS_SEM_ACENTOS = {_sem_acentos(tipo): canonico for tipo, canonico in TIPOS_NORMATIVO.items()}
+
+def _tipo_canonico(tipo: str) -> Optional[str]:
+    return _TIPOS_SEM_ACENTOS.get(_sem_acentos(tipo))
+
+def _identificador(match: re.Match, ano_padrao: Optional[int]) -> Optional[Identificador]:
+    """Identificador do match (None se o tipo não é conhecido)"""
+    tipo = _tipo_canonico(match.group("tipo"))
+    if tipo is None:
+        return None
+    ano = match.group("ano") or match.group("ano_extenso")
+    return Identificador(
+        tipo=tipo,
+        numero=int(match.group("numero").replace(".", "")),
+        ano=int(ano) if ano else ano_padrao,
+    )
+
+def extrair_identificador(titulo: str, ano_padrao: Optional[int] = None) -> Optional[Identificador]:
+    """Tipo, número e ano do normativo a partir do título ('Resolução BCB n° 494 de 15/10/2025')"""
+    match = IDENTIFICADOR_RE.search(titulo or "")
+    return _identificador(match, ano_padrao) if match else None
+
+class Referencia(NamedTuple):
+    """Normativo citado no texto de outro, com a relação ('altera' ou 'revoga')"""
+    relacao: str
+    alvo: Identificador
+
+# Verbos que ligam o normativo aos que ele cita (só a voz ativa: "alterada pela
+# Resolução X" inverteria o sentido); ';' ou fim de frase encerram o verbo
+REFERENCIAS_RE = re.compile(
+    r"(?P<verbo>\b(?:alter|modific|revog)am?\b|\bficam?\s+revogad[ao]s?\b)"
+    r"|(?P<fim>;|\.\s)"
+    r"|" + IDENTIFICADOR_RE.pattern,
+    re.IGNORECASE,
+)
+
+def _relacao(verbo: str) -> str:
+    return "revoga" if "revog" in verbo.lower() else "altera"
+
+def extrair_referencias(texto: str, proprio: Optional[Identificador] = None) -> List[Referencia]:
+    """
+    Normativos que o texto altera ou revoga ('Altera a Resolução CMN nº 4.966, de 25
+    de novembro de 2021...'). Citações sem verbo antes, na mesma frase, são ignoradas.
+    """
+    referencias = []
+    relacao = None
+    for match in REFERENCIAS_RE.finditer(texto or ""):
+        if match.group("verbo"):
+            relacao = _relacao(match.group("verbo"))
+        elif match.group("fim"):
+            relacao = None
+        elif relacao:
+            alvo = _identificador(match, None)
+            if alvo is None:
+                continue  # uma citação estranha não derruba o normativo inteiro
+            if proprio and (alvo.tipo, alvo.numero) == (proprio.tipo, proprio.numero):
+                continue
+            referencia = Referencia(relacao, alvo)
+            if referencia not in referencias:
+                referencias.append(referencia)
+    return referencias
+
+# Consulta do reply bot: 'res 4966', 'res cmn 4.966/2021', 'circular 3978', 'in 677', 'comunicado 43812'
+CONSULTA_RE = re.compile(
+    r"^\s*(?P<tipo>res(?:olu[çc][ãa]o)?(?:\s+(?P<orgao>cmn|bcb|conjunta))?|in|instru[çc][ãa]o\s+normativa"
+    r"|carta[\s-]+circular|cc|circular|comunicado)"
+    r"\s+(?:n[°º.o]*\s*)?(?P<numero>\d{1,3}(?:\.\d{3})+|\d+)(?:/(?P<ano>\d{4}))?\s*$",
+    re.IGNORECASE,
+)
+
+# Apelidos sem órgão -> tipos em que o número pode estar
+TIPOS_CONSULTA = {
+    "res": ["Resolução CMN", "Resolução BCB"],
+    "in": ["Instrução Normativa BCB"],
+    "cc": ["Carta Circular"],
+    "circular": ["Circular"],
+    "comunicado": ["Comunicado"],
+}
+
+def parse_consulta(texto: str) -> Optional[tuple]:
+    """'res cmn 4966/2021' -> (['Resolução CMN'], 4966, 2021); None se não é uma consulta"""
+    match = CONSULTA_RE.match(texto or "")
+    if not match:
+        return None
+    tipo = re.sub(r"[\s-]+", " ", match.group("tipo").lower())
+    orgao = match.group("orgao")
+    if orgao:
+        tipos = [_tipo_canonico(f"resolução {orgao}")]
+    elif tipo.startswith("res"):
+        tipos = TIPOS_CONSULTA["res"]
+    elif tipo.startswith("instru"):
+        tipos = TIPOS_CONSULTA["in"]
+    elif tipo.startswith("carta"):
+        tipos = TIPOS_CONSULTA["cc"]
+    else:
+        tipos = TIPOS_CONSULTA[tipo]
+    ano = match.group("ano")
+    return tipos, int(match.group("numero").replace(".", "")), int(ano) if ano else None
 
 class NormativoAnalyzer:
     def __init__(self):
@@ -29,6 +167,15 @@ class NormativoAnalyzer:
     
     def extrair_tema_principal(self, titulo: str, resumo: str) -> str:
         """Extrai o tema principal baseado no título e resumo"""
+        tema_principal = self.tema_por_palavras_chave(titulo, resumo)
+        if tema_principal:
+            return tema_principal.title()
+        
+        # Fallback: extrai tema do título
+        return self._extrair_tema_do_titulo(titulo)
+    
+    def tema_por_palavras_chave(self, titulo: str, resumo: str) -> Optional[str]:
+        """Chave de temas_bacen com mais ocorrências no texto (None se nenhuma palavra-chave aparece)"""
         texto_completo = f"{titulo} {resumo}".lower()
         
         # Conta ocorrências de cada tema
@@ -42,11 +189,8 @@ class NormativoAnalyzer:
         
         # Retorna o tema com maior contagem
         if temas_encontrados:
-            tema_principal = max(temas_encontrados, key=temas_encontrados.get)
-            return tema_principal.title()
-        
-        # Fallback: extrai tema do título
-        return self._extrair_tema_do_titulo(titulo)
+            return max(temas_encontrados, key=temas_encontrados.get)
+        return None
     
     def _extrair_tema_do_titulo(self, titulo: str) -> str:
         """Extrai tema básico do título quando não há palavras-chave específicas"""
@@ -89,7 +233,8 @@ class NormativoAnalyzer:
         if not resumo:
             return ""
         
-        # Remove HTML
+        # Remove HTML (bs4 só é carregado quando há resumo para limpar)
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(resumo, 'html.parser')
         texto = soup.get_text()
         
@@ -143,6 +288,10 @@ class NormativoAnalyzer:
             return match.group(1)
         return ""
 
+def listar_temas() -> List[str]:
+    """Temas conhecidos (chaves usadas nos filtros dos inscritos)"""
+    return list(NormativoAnalyzer().temas_bacen)
+
 def analisar_normativo(titulo: str, resumo: str) -> Dict[str, str]:
     """Função principal para analisar um normativo"""
     analyzer = NormativoAnalyzer()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Agendador de saída para a API do Telegram, compartilhado pelos dois processos
+
+O reply bot e o cron usam o mesmo token, e portanto o mesmo limite global de
+mensagens por segundo do Telegram. Cada processo passa seus envios por um
+OutboundScheduler (middleware de requisição do aiogram) que:
+
+- libera os envios em ordem de prioridade: respostas a comandos, depois
+  broadcasts de normativos novos, depois digests
+- limita a vazão local à fatia do processo no orçamento global (TELEGRAM_GLOBAL_RATE)
+- combina essa fatia com os outros processos pela tabela outbound_lanes: quem tem
+  demanda de prioridade mais alta fica com a maior parte, e quem está ocioso não conta
+"""
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+# Classes de prioridade (menor = sai primeiro)
+PRIORITY_INTERACTIVE = 0  # respostas a comandos
+PRIORITY_BROADCAST = 1    # normativos novos para os inscritos
+PRIORITY_DIGEST = 2       # resumos e envios em massa sem urgência
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BROADCAST: "broadcast", PRIORITY_DIGEST: "digest"}
+
+# Orçamento global de mensagens por segundo do token (o Telegram aceita ~30/s)
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "25"))
+# Fração do orçamento que fica com processos de prioridade mais baixa enquanto
+# outro processo tem demanda mais prioritária (o broadcast não para de vez)
+OUTBOUND_LOW_SHARE = float(os.getenv("OUTBOUND_LOW_SHARE", "0.3"))
+# Intervalo (s) entre atualizações da fatia de cada processo no banco
+OUTBOUND_SYNC_SECONDS = float(os.getenv("OUTBOUND_SYNC_SECONDS", "1"))
+# Um processo sem atualização há mais que isso é considerado ocioso
+OUTBOUND_LANE_TTL = 5.0
+
+# Métodos da API que contam no limite de mensagens; os demais (getMe, getUpdates...) passam direto
+RATE_LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+
+# Prioridade dos envios feitos no contexto atual (sem valor: padrão do processo)
+outbound_priority: ContextVar[int] = ContextVar("outbound_priority")
+
+@contextmanager
+def priority(level: int):
+    """Envios feitos dentro do bloco (e nas tasks criadas nele) usam `level`"""
+    token = outbound_priority.set(level)
+    try:
+        yield
+    finally:
+        outbound_priority.reset(token)
+
+def lane_rate(lanes: list[tuple[str, Optional[int]]], me: str, total: float,
+              low_share: float = OUTBOUND_LOW_SHARE) -> float:
+    """
+    Fatia de `me` no orçamento `total`, dadas as filas ativas [(processo, prioridade)].
+    Filas na melhor prioridade dividem o que sobra de low_share; as demais dividem
+    low_share. Sem concorrência (ou ocioso), o processo pode usar o orçamento todo.
+    """
+    ativos = {name: prio for name, prio in lanes if prio is not None}
+    if me not in ativos or len(ativos) == 1:
+        return total
+    melhor = min(ativos.values())
+    altos = [name for name, prio in ativos.items() if prio == melhor]
+    baixos = len(ativos) - len(altos)
+    if not baixos:
+        return total / len(altos)
+    if ativos[me] == melhor:
+        return total * (1 - low_share) / len(altos)
+    return total * low_share / baixos
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """
+    Token bucket de saída com fila de prioridade. `name` identifica o processo em
+    outbound_lanes e `get_store` devolve o PGStore usado para combinar as fatias
+    (sem ele, o processo assume o orçamento todo).
+    """
+    def __init__(self, name: str, default_priority: int = PRIORITY_INTERACTIVE,
+                 get_store: Optional[Callable] = None, total_rate: float = TELEGRAM_GLOBAL_RATE):
+        self.name = name
+        self.default_priority = default_priority
+        self.get_store = get_store
+        self.total_rate = total_rate
+        self.rate = total_rate
+        self.tokens = 1.0
+        self._updated = time.monotonic()
+        self._waiters: list = []  # heap de (prioridade, seq, future)
+        self._seq = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+        self._demand: Optional[int] = None  # melhor prioridade pedida desde o último sync
+        self._last_sync = 0.0
+        self.sent = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.queued = 0
+        self.wait_total = 0.0
+        self.sync_errors = 0
+
+    async def __call__(self, make_request, bot, method):
+        if method.__api_method__.startswith(RATE_LIMITED_PREFIXES):
+            level = outbound_priority.get(self.default_priority)
+            start = time.monotonic()
+            await self.acquire(level)
+            self.wait_total += time.monotonic() - start
+            self.sent[PRIORITY_NAMES.get(level, "digest")] += 1
+        return await make_request(bot, method)
+
+    def _refill(self):
+        now = time.monotonic()
+        # Fôlego de até 1s de vazão, para não estourar o limite global depois de uma pausa
+        self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, level: int):
+        """Espera a vez de enviar uma mensagem com prioridade `level`"""
+        if self._demand is None or level < self._demand:
+            self._demand = level
+        self.maybe_sync()
+        self._refill()
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (level, next(self._seq), future))
+        self.queued += 1
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump())
+        await future
+
+    async def _run_pump(self):
+        """Libera os envios na fila, mais prioritários primeiro, no ritmo da fatia atual"""
+        while self._waiters:
+            self.maybe_sync()
+            self._refill()
+            while self._waiters and self.tokens >= 1:
+                _, _, future = heapq.heappop(self._waiters)
+                if future.done():  # quem esperava foi cancelado
+                    continue
+                self.tokens -= 1
+                future.set_result(None)
+            if self._waiters:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def maybe_sync(self):
+        """Publica a demanda deste processo e recalcula a fatia (no máximo a cada OUTBOUND_SYNC_SECONDS)"""
+        now = time.monotonic()
+        if self.get_store is None or now - self._last_sync < OUTBOUND_SYNC_SECONDS:
+            return
+        self._last_sync = now
+        demand = self._demand
+        if self._waiters:
+            head = self._waiters[0][0]
+            demand = head if demand is None else min(demand, head)
+        self._demand = None
+        try:
+            lanes = self.get_store().sync_outbound_lane(self.name, demand, len(self._waiters), OUTBOUND_LANE_TTL)
+        except Exception as ex:
+            # Sem o banco, segue com a última fatia conhecida
+            self.sync_errors += 1
+            print(f"⚠️ Erro ao sincronizar o orçamento de envio: {ex}")
+            return
+        self.rate = max(lane_rate(lanes, self.name, self.total_rate), 0.1)
+
+    def metrics(self) -> dict:
+        return {
+            "rate": round(self.rate, 2),
+            "waiting": len(self._waiters),
+            "queued": self.queued,
+            "sent": dict(self.sent),
+            "avg_wait_ms": round(self.wait_total / sum(self.sent.values()) * 1000, 1) if any(self.sent.values()) else 0.0,
+            "sync_errors": self.sync_errors,
+        }
@@ -1,20 +1,31 @@
 import asyncio
 import os
+import re
+import secrets
+from collections import OrderedDict
+from datetime import date, timedelta
 from dotenv import load_dotenv
-from aiogram import Bot, Dispatcher, F, types
-from aiogram.enums.parse_mode import ParseMode
+from aiogram import BaseMiddleware, Bot, Dispatcher, F, types
 from aiogram.filters import CommandStart, Command
-from aiogram.client.default import DefaultBotProperties
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
 from pydantic import BaseModel, Field
-from storage import get_store
+from http_client import RetryBudget, HTTP_RETRY_BUDGET
+from bot_session import BotManager
+from outbound import OutboundScheduler, PRIORITY_INTERACTIVE
+from antiflood import ThrottlingMiddleware
 from bacen_feed import (
-    get_ultimo_normativo, 
-    get_normativos_hoje, 
-    get_normativos_ontem, 
-    get_normativos_semanal,
+    FeedSnapshot,
+    get_feed_snapshot_async,
+    parse_periodo,
+    today_sp,
+    PERIODO_RE,
+    BR_TZ,
     format_normativo_message,
-    format_multiple_normativos_message
+    paginate_normativos_message
 )
+from normativo_analyzer import Identificador, listar_temas, parse_consulta, CONSULTA_RE
 
 # Load environment variables from .env file
 load_dotenv()
@@ -25,23 +36,133 @@ class Settings(BaseModel):
 def get_settings() -> Settings:
     return Settings(TELEGRAM_TOKEN=os.environ["TELEGRAM_TOKEN"])
 
-s = get_settings()
-bot = Bot(token=s.TELEGRAM_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+# Intervalo mínimo entre pedidos 'forcar' de um mesmo chat
+FORCE_COOLDOWN_SECONDS = int(os.getenv("FORCE_COOLDOWN_SECONDS", "300"))
+
+# Modo canal (ver sender.py): os normativos saem no canal; mensagem direta só para quem filtra temas
+TELEGRAM_CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID", "").strip()
+CHANNEL_MODE = os.getenv("DELIVERY_MODE", "dm").strip().lower() == "channel" and bool(TELEGRAM_CHANNEL_ID)
+
+# Modo webhook (opcional): ativo quando WEBHOOK_BASE_URL está definido
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+# Sem WEBHOOK_SECRET configurado, gera um segredo por processo (o webhook é registrado a cada start)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+
+class InFlightUpdates(BaseMiddleware):
+    """Conta os updates em processamento, para o encerramento aguardar os handlers em andamento"""
+    def __init__(self):
+        self.count = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def __call__(self, handler, event, data):
+        self.count += 1
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self.count -= 1
+            if self.count == 0:
+                self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Aguarda os handlers em andamento terminarem; False se o prazo esgotou"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
 dp = Dispatcher()
-store = get_store()
+in_flight = InFlightUpdates()
+dp.update.outer_middleware(in_flight)
+
+# Anti-flood por chat, antes dos filtros (update descartado não chega aos handlers)
+throttle = ThrottlingMiddleware()
+dp.message.outer_middleware(throttle)
+dp.callback_query.outer_middleware(throttle)
+
+# Conexão com o banco criada no primeiro uso (importar o módulo não conecta nem roda DDL)
+_store = None
+
+def get_bot_store():
+    """Store do reply bot, conectado sob demanda"""
+    global _store
+    if _store is None:
+        from storage import get_store
+        _store = get_store()
+    return _store
+
+def close_bot_store():
+    """Fecha a conexão do reply bot (encerramento)"""
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+# ============ consultas por período (paginadas) ============
+
+# Páginas já montadas por (consulta, versão do snapshot): os botões respondem da memória
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "256"))
+_pages: "OrderedDict[tuple[str, str], list[str]]" = OrderedDict()
+
+# Consulta = código + intervalo, ex.: "h2025091520250915" (cabe no callback_data de 64 bytes)
+PERIODO_LABELS = {"h": "Hoje", "o": "Ontem", "s": "Esta Semana"}
+
+def period_query(code: str, inicio: date, fim: date) -> str:
+    return f"{code}{inicio:%Y%m%d}{fim:%Y%m%d}"
+
+def parse_period_query(query: str) -> tuple[str, date, date]:
+    code, inicio, fim = query[0], query[1:9], query[9:17]
+    return code, date(int(inicio[:4]), int(inicio[4:6]), int(inicio[6:])), date(int(fim[:4]), int(fim[4:6]), int(fim[6:]))
+
+def get_pages(query: str, snapshot: FeedSnapshot) -> list[str]:
+    """Páginas de uma consulta, montadas uma vez por versão do snapshot (LRU)"""
+    key = (query, snapshot.version)
+    pages = _pages.get(key)
+    if pages is not None:
+        _pages.move_to_end(key)
+        return pages
+    code, inicio, fim = parse_period_query(query)
+    label = PERIODO_LABELS.get(code) or f"{inicio:%d/%m/%Y} a {fim:%d/%m/%Y}"
+    pages = paginate_normativos_message(snapshot.between(inicio, fim), label)
+    _pages[key] = pages
+    if len(_pages) > PAGE_CACHE_SIZE:
+        _pages.popitem(last=False)
+    return pages
+
+def page_keyboard(query: str, version: str, page: int, total: int):
+    """Botões anterior/próxima (nenhum se só há uma página)"""
+    if total <= 1:
+        return None
+    builder = InlineKeyboardBuilder()
+    if page > 0:
+        builder.button(text="⬅️ anterior", callback_data=f"pg|{query}|{version}|{page - 1}")
+    if page < total - 1:
+        builder.button(text="próxima ➡️", callback_data=f"pg|{query}|{version}|{page + 1}")
+    return builder.as_markup()
+
+async def answer_period(message: types.Message, code: str, inicio: date, fim: date):
+    """Responde com a primeira página da consulta"""
+    snapshot = await get_feed_snapshot_async()
+    query = period_query(code, inicio, fim)
+    pages = get_pages(query, snapshot)
+    await message.answer(pages[0], reply_markup=page_keyboard(query, snapshot.version, 0, len(pages)))
 
 @dp.message(CommandStart())
 async def on_start(message: types.Message):
-    await message.answer("Olá! 👋\n\n<b>Comandos disponíveis:</b>\n• <b>oi</b> - Autorizar avisos automáticos\n• <b>/stop</b> - Cancelar avisos\n• <b>status</b> - Status do sistema\n• <b>forcar</b> - Forçar verificação\n• <b>ultimo</b> - Último normativo\n• <b>hoje</b> - Normativos de hoje\n• <b>ontem</b> - Normativos de ontem\n• <b>semanal</b> - Normativos desta semana")
+    await message.answer("Olá! 👋\n\n<b>Comandos disponíveis:</b>\n• <b>oi</b> - Autorizar avisos automáticos\n• <b>/stop</b> - Cancelar avisos\n• <b>status</b> - Status do sistema\n• <b>forcar</b> - Forçar verificação\n• <b>ultimo</b> - Último normativo\n• <b>hoje</b> - Normativos de hoje\n• <b>ontem</b> - Normativos de ontem\n• <b>semanal</b> - Normativos desta semana\n• <b>de DD/MM até DD/MM</b> - Normativos de um período\n• <b>temas</b> - Filtrar avisos por tema\n• <b>res 4966</b>, <b>circular 3978</b>, <b>in 677</b> - Buscar normativo pelo número\n• <b>alteracoes res 4966</b> - O que alterou ou revogou um normativo")
 
 @dp.message(Command("stop"))
 async def on_stop(message: types.Message):
-    store.remove_subscriber(message.chat.id)
+    get_bot_store().remove_subscriber(message.chat.id)
     await message.answer("Você foi removido(a) da lista. ❌\nSe quiser voltar, mande <b>oi</b>.")
 
 @dp.message(F.text.lower() == "oi")
 async def on_oi(message: types.Message):
     user = message.from_user
+    store = get_bot_store()
     
     # Verifica se o usuário já está inscrito
     user_info = store.get_subscriber_info(message.chat.id)
@@ -58,14 +179,71 @@ async def on_oi(message: types.Message):
             first_name=user.first_name,
             username=user.username,
         )
-        await message.answer("✅ Pronto! Você autorizou receber resumos de normativos do BACEN.\nPara sair, envie /stop.")
+        await message.answer("✅ Pronto! Você autorizou receber resumos de normativos do BACEN.\nPara sair, envie /stop." + channel_hint())
+
+def channel_hint() -> str:
+    """Aviso do modo canal para quem se inscreve"""
+    if not CHANNEL_MODE:
+        return ""
+    canal = f" {TELEGRAM_CHANNEL_ID}" if TELEGRAM_CHANNEL_ID.startswith("@") else ""
+    return (f"\n\n📢 Os normativos são publicados no canal{canal}. "
+            "Para receber aqui só os temas que interessam, envie <b>temas</b>.")
+
+def format_temas(temas: list[str] | None) -> str:
+    return ", ".join(temas) if temas else "todos"
+
+@dp.message(F.text.regexp(r"(?i)^temas\b"))
+async def on_temas(message: types.Message):
+    """
+    Filtro de temas: 'temas' mostra as opções, 'temas pix, câmbio' (ou os números
+    da lista) filtra e 'temas todos' volta a receber tudo
+    """
+    store = get_bot_store()
+    user_info = store.get_subscriber_info(message.chat.id)
+    if not user_info:
+        await message.answer("❌ Você não está inscrito(a). Envie <b>oi</b> primeiro.")
+        return
+    
+    disponiveis = listar_temas()
+    pedido = message.text[len("temas"):].strip().lower()
+    if not pedido:
+        opcoes = "\n".join(f"{i}. {tema}" for i, tema in enumerate(disponiveis, 1))
+        await message.answer(
+            f"🏷️ <b>Seus temas:</b> {format_temas(user_info.get('temas'))}\n\n{opcoes}\n\n"
+            "Envie, por exemplo, <b>temas pix, câmbio</b> (ou <b>temas 10, 11</b>) para filtrar, "
+            "ou <b>temas todos</b> para receber tudo."
+        )
+        return
+    
+    if pedido == "todos":
+        temas = None
+    else:
+        temas, desconhecidos = [], []
+        for parte in filter(None, (p.strip() for p in pedido.split(","))):
+            if parte.isdigit() and 1 <= int(parte) <= len(disponiveis):
+                parte = disponiveis[int(parte) - 1]
+            if parte in disponiveis:
+                if parte not in temas:
+                    temas.append(parte)
+            else:
+                desconhecidos.append(parte)
+        if desconhecidos or not temas:
+            await message.answer(f"❌ Tema(s) desconhecido(s): {', '.join(desconhecidos) or pedido}\nEnvie <b>temas</b> para ver as opções.")
+            return
+    
+    store.set_subscriber_temas(message.chat.id, temas)
+    if temas and CHANNEL_MODE:
+        extra = "\nVocê receberá aqui os normativos desses temas; o canal continua com todos."
+    else:
+        extra = ""
+    await message.answer(f"✅ Temas atualizados: {format_temas(temas)}{extra}")
 
 @dp.message(F.text.lower() == "ultimo")
 async def on_ultimo(message: types.Message):
     """Retorna o último normativo publicado"""
     try:
         await message.answer("🔍 Buscando último normativo...")
-        normativo = get_ultimo_normativo()
+        normativo = (await get_feed_snapshot_async()).latest()
         
         if normativo:
             msg = format_normativo_message(normativo)
@@ -80,10 +258,8 @@ async def on_hoje(message: types.Message):
     """Retorna todos os normativos de hoje"""
     try:
         await message.answer("🔍 Buscando normativos de hoje...")
-        normativos = get_normativos_hoje()
-        
-        msg = format_multiple_normativos_message(normativos, "Hoje")
-        await message.answer(msg)
+        hoje = today_sp()
+        await answer_period(message, "h", hoje, hoje)
     except Exception as e:
         await message.answer(f"❌ Erro ao buscar normativos de hoje: {str(e)}")
 
@@ -92,10 +268,8 @@ async def on_ontem(message: types.Message):
     """Retorna todos os normativos de ontem"""
     try:
         await message.answer("🔍 Buscando normativos de ontem...")
-        normativos = get_normativos_ontem()
-        
-        msg = format_multiple_normativos_message(normativos, "Ontem")
-        await message.answer(msg)
+        ontem = today_sp() - timedelta(days=1)
+        await answer_period(message, "o", ontem, ontem)
     except Exception as e:
         await message.answer(f"❌ Erro ao buscar normativos de ontem: {str(e)}")
 
@@ -106,6 +280,7 @@ async def on_status(message: types.Message):
         await message.answer("🔍 Verificando status do sistema...")
         
         # Verifica saúde do banco
+        store = get_bot_store()
         health = store.health_check()
         
         if health['status'] == 'healthy':
@@ -124,7 +299,11 @@ async def on_status(message: types.Message):
                 joined_date = user_info['joined_at'].strftime("%d/%m/%Y %H:%M")
                 status_msg += f"✅ <b>Seu status:</b> Inscrito\n"
                 status_msg += f"📅 <b>Inscrito desde:</b> {joined_date}\n"
-                status_msg += f"🔔 <b>Notificações:</b> Ativas"
+                status_msg += f"🏷️ <b>Temas:</b> {format_temas(user_info.get('temas'))}\n"
+                if CHANNEL_MODE and not user_info.get('temas'):
+                    status_msg += "🔔 <b>Notificações:</b> Pelo canal"
+                else:
+                    status_msg += "🔔 <b>Notificações:</b> Ativas"
             else:
                 status_msg += f"❌ <b>Seu status:</b> Não inscrito\n"
                 status_msg += f"💡 <b>Para receber notificações:</b> Envie 'oi'"
@@ -141,37 +320,180 @@ async def on_semanal(message: types.Message):
     """Retorna todos os normativos desta semana"""
     try:
         await message.answer("🔍 Buscando normativos desta semana...")
-        normativos = get_normativos_semanal()
+        hoje = today_sp()
+        await answer_period(message, "s", hoje - timedelta(days=hoje.weekday()), hoje)
+    except Exception as e:
+        await message.answer(f"❌ Erro ao buscar normativos desta semana: {str(e)}")
+
+@dp.message(F.text.regexp(PERIODO_RE))
+async def on_periodo(message: types.Message):
+    """Normativos de um período livre: 'de DD/MM até DD/MM'"""
+    periodo = parse_periodo(message.text)
+    if periodo is None:
+        await message.answer("❌ Período inválido. Use, por exemplo: <b>de 01/09 até 15/09</b>")
+        return
+    inicio, fim = periodo
+    try:
+        await message.answer("🔍 Buscando normativos do período...")
+        await answer_period(message, "p", inicio, fim)
+    except Exception as e:
+        await message.answer(f"❌ Erro ao buscar normativos do período: {str(e)}")
+
+@dp.callback_query(F.data.startswith("pg|"))
+async def on_page(callback: types.CallbackQuery):
+    """Troca de página: responde do cache de páginas, sem baixar nem analisar o feed de novo"""
+    try:
+        _, query, version, page = callback.data.split("|")
+        page = int(page)
+        pages = _pages.get((query, version))
+        if pages is None:
+            # Saiu do cache (ou o processo reiniciou): remonta com o snapshot atual
+            snapshot = await get_feed_snapshot_async()
+            version = snapshot.version
+            pages = get_pages(query, snapshot)
+        page = max(0, min(page, len(pages) - 1))
+        
+        await callback.message.edit_text(pages[page], reply_markup=page_keyboard(query, version, page, len(pages)))
+        await callback.answer()
+    except TelegramBadRequest as e:
+        # Clique repetido na mesma página
+        await callback.answer()
+        if "message is not modified" not in e.message:
+            print(f"⚠️ Erro ao trocar de página: {e}")
+    except Exception as e:
+        await callback.answer(f"❌ Erro ao trocar de página: {e}", show_alert=True)
+
+def format_consulta(rows: list[dict]) -> str:
+    """Resultado da consulta por tipo/número (linhas de find_normativos)"""
+    blocos = []
+    for row in rows:
+        data_str = row["published"].astimezone(BR_TZ).strftime("%d/%m/%Y %H:%M")
+        bloco = f"📄 <b>{row['title']}</b>\n"
+        bloco += f"🏷️ <b>Tema:</b> {row['tema']}\n"
+        bloco += f"🕒 {data_str}\n"
+        bloco += f"🔗 {row['link']}"
+        blocos.append(bloco)
+    return "\n\n".join(blocos)
+
+@dp.message(F.text.regexp(CONSULTA_RE))
+async def on_consulta(message: types.Message):
+    """Normativo por tipo e número: 'res 4966', 'circular 3978', 'in 677/2025'"""
+    tipos, numero, ano = parse_consulta(message.text)
+    try:
+        rows = get_bot_store().find_normativos(numero, tipos, ano, limit=5)
+        if rows:
+            await message.answer(format_consulta(rows))
+        else:
+            await message.answer(f"❌ Nenhum normativo {' ou '.join(tipos)} nº {numero} encontrado entre os já processados.")
+    except Exception as e:
+        await message.answer(f"❌ Erro ao buscar normativo: {str(e)}")
+
+ALTERACOES_RE = r"(?i)^\s*altera[çc][õo]es\s+"
+
+def nome_consulta(tipos: list[str], numero: int, ano: int | None) -> str:
+    """'Resolução CMN nº 4.966' ou, se a consulta cobre mais de um tipo, 'Resolução nº 4.966'"""
+    tipo = tipos[0] if len(tipos) == 1 else tipos[0].split()[0]
+    return str(Identificador(tipo, numero, ano))
+
+@dp.message(F.text.regexp(ALTERACOES_RE))
+async def on_alteracoes(message: types.Message):
+    """Histórico de um normativo: quem o alterou/revogou e o que ele altera ('alteracoes res 4966')"""
+    consulta = parse_consulta(re.sub(ALTERACOES_RE, "", message.text))
+    if consulta is None:
+        await message.answer("❌ Use, por exemplo: <b>alteracoes res 4966</b> ou <b>alteracoes circular 3978</b>")
+        return
+    tipos, numero, ano = consulta
+    try:
+        store = get_bot_store()
+        recebidas = store.find_references_to(numero, tipos, ano, limit=10)
+        feitas = store.find_references_from(numero, tipos, ano, limit=10)
+        nome = nome_consulta(tipos, numero, ano)
+        if not recebidas and not feitas:
+            await message.answer(f"❌ Nenhuma alteração ou revogação registrada para {nome}.")
+            return
         
-        msg = format_multiple_normativos_message(normativos, "Esta Semana")
+        msg = f"🔁 <b>{nome}</b>\n"
+        if recebidas:
+            msg += "\n✏️ <b>Alterado(a) ou revogado(a) por:</b>\n"
+            for ref in recebidas:
+                data_str = ref["published"].astimezone(BR_TZ).strftime("%d/%m/%Y")
+                msg += f"• <b>{ref['relacao'].capitalize()}</b> — {ref['title']} ({data_str})\n  🔗 {ref['link']}\n"
+        if feitas:
+            msg += "\n📌 <b>Este normativo:</b>\n"
+            for ref in feitas:
+                alvo = Identificador(ref["tipo"], ref["numero"], ref["ano"])
+                msg += f"• {ref['relacao']} {alvo}\n"
         await message.answer(msg)
     except Exception as e:
-        await message.answer(f"❌ Erro ao buscar normativos desta semana: {str(e)}")
+        await message.answer(f"❌ Erro ao buscar alterações: {str(e)}")
 
 @dp.message(F.text.lower() == "forcar")
 async def on_forcar(message: types.Message):
-    """Força o envio de notificações pendentes (comando de emergência)"""
+    """Pede ao cron uma verificação imediata (pedidos simultâneos viram uma única execução)"""
     try:
-        await message.answer("🔄 Forçando verificação de normativos pendentes...")
-        
-        # Importa e executa o sistema de notificações
-        from sender import run_once
-        
-        # Executa uma verificação manual
-        await run_once()
-        
-        await message.answer("✅ Verificação forçada concluída!\nSe houver normativos novos, você receberá notificações.")
+        if get_bot_store().enqueue_force_request(message.chat.id, FORCE_COOLDOWN_SECONDS):
+            await message.answer("🔄 Pedido de verificação registrado!\nO serviço de monitoramento vai executar em instantes e você receberá o resultado aqui.")
+        else:
+            await message.answer("⏳ Você já tem uma verificação pendente ou pediu uma há pouco.\nAguarde o resultado antes de pedir novamente.")
         
     except Exception as e:
         await message.answer(f"❌ Erro ao forçar verificação: {str(e)}")
 
 @dp.message()
 async def fallback(message: types.Message):
-    await message.answer("Não entendi 🤖 — Comandos disponíveis:\n• <b>oi</b> - Autorizar avisos\n• <b>/stop</b> - Cancelar avisos\n• <b>status</b> - Status do sistema\n• <b>forcar</b> - Forçar verificação\n• <b>ultimo</b> - Último normativo\n• <b>hoje</b> - Normativos de hoje\n• <b>ontem</b> - Normativos de ontem\n• <b>semanal</b> - Normativos desta semana")
+    await message.answer("Não entendi 🤖 — Comandos disponíveis:\n• <b>oi</b> - Autorizar avisos\n• <b>/stop</b> - Cancelar avisos\n• <b>status</b> - Status do sistema\n• <b>forcar</b> - Forçar verificação\n• <b>ultimo</b> - Último normativo\n• <b>hoje</b> - Normativos de hoje\n• <b>ontem</b> - Normativos de ontem\n• <b>semanal</b> - Normativos desta semana\n• <b>de DD/MM até DD/MM</b> - Normativos de um período\n• <b>temas</b> - Filtrar avisos por tema\n• <b>res 4966</b>, <b>circular 3978</b>, <b>in 677</b> - Buscar normativo pelo número\n• <b>alteracoes res 4966</b> - O que alterou ou revogou um normativo")
+
+def make_bot_manager(api=None) -> BotManager:
+    """
+    BotManager do reply bot (processo de longa duração: orçamento de retentativas
+    renovado a cada minuto). As respostas têm prioridade sobre os broadcasts do cron.
+    `api` aponta para outro servidor da Bot API (benchmarks).
+    """
+    return BotManager(
+        token=get_settings().TELEGRAM_TOKEN,
+        budget=RetryBudget(HTTP_RETRY_BUDGET, window=60),
+        scheduler=OutboundScheduler("reply_bot", PRIORITY_INTERACTIVE, get_store=get_bot_store),
+        api=api,
+    )
 
-async def main():
+def webhook_enabled() -> bool:
+    return bool(WEBHOOK_BASE_URL)
+
+def make_webhook_handler(bot: Bot) -> SimpleRequestHandler:
+    """Handler aiohttp que valida o secret token e entrega os updates ao Dispatcher em background"""
+    return SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET, handle_in_background=True)
+
+async def setup_webhook(bot: Bot) -> bool:
+    """Registra o webhook no Telegram; retorna False se não for possível (o chamador cai para polling)"""
+    url = WEBHOOK_BASE_URL.rstrip("/") + WEBHOOK_PATH
+    try:
+        await bot.set_webhook(
+            url=url,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        print(f"reply_bot: recebendo mensagens via webhook em {url}")
+        return True
+    except Exception as e:
+        print(f"⚠️ Não foi possível registrar o webhook ({e}), usando polling")
+        return False
+
+async def main(bot: Bot | None = None):
     print("reply_bot: ouvindo mensagens...")
-    await dp.start_polling(bot)
+    if bot is not None:
+        # Remove um webhook registrado anteriormente, senão o getUpdates é recusado.
+        # Os sinais ficam com quem chamou, que coordena o encerramento (dp.stop_polling)
+        await bot.delete_webhook()
+        await dp.start_polling(bot, close_bot_session=False, handle_signals=False)
+        return
+    
+    # Execução avulsa (python reply_bot.py): o próprio módulo cuida do Bot
+    bot_manager = make_bot_manager()
+    try:
+        await bot_manager.get_bot().delete_webhook()
+        await dp.start_polling(bot_manager.get_bot(), close_bot_session=False)
+    finally:
+        await bot_manager.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,18 +1,21 @@
 import os
 import asyncio
-import feedparser
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 from aiogram import Bot
 from aiogram.enums.parse_mode import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
 from datetime import datetime, timezone, timedelta
-from bs4 import BeautifulSoup
+from typing import Optional
 import re
 import json
+from collections import deque
 
-from storage import get_store
-from bacen_feed import parse_bacen_feed, BACENNormativo, format_normativo_message
+from storage import get_store, PGStore, SeenItemsFilter, SubscriberRoster
+from outbound import priority, PRIORITY_BROADCAST
+from http_client import make_bot_session, reset_retry_budget, get_retry_budget, close_http_session
+from bacen_feed import parse_bacen_feed_async, BACENNormativo, format_normativo_message
 
 # Load environment variables from .env file
 load_dotenv()
@@ -38,8 +41,49 @@ def get_settings() -> Settings:
         MAX_ITEMS_PER_FEED=int(os.getenv("MAX_ITEMS_PER_FEED", "50")),
     )
 
-# Sistema de logs de execução
-EXECUTION_LOG_FILE = "cron_executions.json"
+# Modo de entrega: "dm" (uma mensagem por inscrito) ou "channel" (cada normativo é
+# publicado uma vez no canal TELEGRAM_CHANNEL_ID; só quem filtra temas recebe mensagem direta)
+DELIVERY_MODE = os.getenv("DELIVERY_MODE", "dm").strip().lower()
+TELEGRAM_CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID", "").strip()
+
+_channel_chat_id: Optional[int] = None
+
+def channel_mode_enabled() -> bool:
+    return DELIVERY_MODE == "channel" and bool(TELEGRAM_CHANNEL_ID)
+
+async def resolve_channel(bot: Bot) -> Optional[int]:
+    """chat_id numérico do canal (um @username é resolvido uma vez por processo); None se indisponível"""
+    global _channel_chat_id
+    if _channel_chat_id is None:
+        if TELEGRAM_CHANNEL_ID.lstrip("-").isdigit():
+            _channel_chat_id = int(TELEGRAM_CHANNEL_ID)
+        else:
+            try:
+                _channel_chat_id = (await bot.get_chat(TELEGRAM_CHANNEL_ID)).id
+            except Exception as ex:
+                print(f"⚠️ Canal {TELEGRAM_CHANNEL_ID} indisponível, enviando por mensagem direta: {ex}")
+                return None
+    return _channel_chat_id
+
+def reset_channel():
+    """Esquece o canal resolvido (ex.: o bot perdeu o acesso a ele)"""
+    global _channel_chat_id
+    _channel_chat_id = None
+
+def recipients_for(normativo: BACENNormativo, subscribers, theme_filters: dict[int, list[str]],
+                   channel_id: Optional[int] = None) -> list[int]:
+    """
+    Destinatários de um normativo. Inscritos com filtro só recebem os temas escolhidos;
+    os demais recebem tudo, por mensagem direta ou, com channel_id, pelo canal.
+    """
+    tema = (normativo.tema or "").lower()
+    filtrados = [chat_id for chat_id, temas in theme_filters.items() if tema in temas]
+    if channel_id is not None:
+        return [channel_id] + filtrados
+    return [chat_id for chat_id in subscribers if chat_id not in theme_filters] + filtrados
+
+# Sistema de logs de execução (rodando localmente, aponte para um arquivo temporário)
+EXECUTION_LOG_FILE = os.getenv("EXECUTION_LOG_FILE", "cron_executions.json")
 
 def log_execution(status: str, details: dict = None):
     """Registra uma execução do cron"""
@@ -105,11 +149,122 @@ def is_business_hours() -> bool:
     else:
         return False  # Após 19:25
 
-async def run_once():
-    """Executa uma vez o processamento do feed do BACEN"""
+def _finish(status: str, details: dict) -> dict:
+    """Registra o desfecho de run_once e o devolve para quem chamou"""
+    log_execution(status, details)
+    return {"status": status, **details}
+
+# Trechos das descrições de TelegramBadRequest que indicam um chat que não existe mais
+DEAD_CHAT_ERRORS = ("chat not found", "user is deactivated", "bot was kicked", "group chat was deleted", "peer_id_invalid")
+
+def is_permanent_delivery_error(ex: Exception) -> bool:
+    """Erros que não melhoram com nova tentativa: bot bloqueado/removido, chat inexistente ou conta desativada"""
+    if isinstance(ex, TelegramForbiddenError):
+        return True
+    if isinstance(ex, TelegramBadRequest):
+        return any(trecho in ex.message.lower() for trecho in DEAD_CHAT_ERRORS)
+    return False
+
+async def deliver(bot: Bot, fila: deque, dead_chats: set[int], stop_event: Optional[asyncio.Event] = None,
+                  undelivered: Optional[list] = None) -> int:
+    """
+    Envia as entregas (chat_id, mensagem) da fila em ordem, retirando cada uma só
+    depois de tentada. Para antes do fim se stop_event disparar (ou se a task for
+    cancelada): o que sobra na fila é o que ainda não saiu. Retorna quantas foram enviadas.
+    Em `undelivered` ficam as entregas descartadas por chat inacessível.
+    Os envios têm prioridade de broadcast no agendador de saída (outbound.py).
+    """
+    enviados = 0
+    with priority(PRIORITY_BROADCAST):
+        while fila:
+            if stop_event is not None and stop_event.is_set():
+                break
+            chat_id, mensagem = fila[0]
+            if chat_id not in dead_chats:
+                try:
+                    await bot.send_message(chat_id, mensagem, disable_web_page_preview=False)
+                    enviados += 1
+                    print(f"✅ Enviado para {chat_id}")
+                except Exception as ex:
+                    if is_permanent_delivery_error(ex):
+                        dead_chats.add(chat_id)
+                        print(f"🚫 Chat {chat_id} inacessível, será removido: {ex}")
+                    else:
+                        print(f"❌ Falha ao enviar para {chat_id}: {ex}")
+            if chat_id in dead_chats and undelivered is not None:
+                undelivered.append((chat_id, mensagem))
+            fila.popleft()
+    return enviados
+
+def defer_deliveries(store: PGStore, fila: deque, dead_chats: set[int]) -> int:
+    """Guarda no banco as entregas que ficaram na fila, para a próxima execução"""
+    restantes = [(chat_id, mensagem) for chat_id, mensagem in fila if chat_id not in dead_chats]
+    if not restantes:
+        return 0
+    store.save_pending_deliveries(restantes)
+    print(f"💾 {len(restantes)} envio(s) adiado(s) para a próxima execução")
+    return len(restantes)
+
+async def resume_pending_deliveries(bot: Bot, store: PGStore, subscribers, dead_chats: set[int],
+                                    stop_event: Optional[asyncio.Event] = None,
+                                    undelivered: Optional[list] = None) -> int:
+    """Retoma os envios adiados por um encerramento anterior; retorna quantos foram enviados"""
+    pendentes = store.list_pending_deliveries()
+    if not pendentes:
+        return 0
+    inscritos = set(subscribers)
+    # Quem saiu da lista nesse meio-tempo não recebe
+    descartados = [pid for pid, chat_id, _ in pendentes if chat_id not in inscritos]
+    pendentes = [p for p in pendentes if p[1] in inscritos]
+    print(f"📬 Retomando {len(pendentes)} envio(s) adiado(s)...")
+
+    fila = deque((chat_id, mensagem) for _, chat_id, mensagem in pendentes)
+    try:
+        return await deliver(bot, fila, dead_chats, stop_event, undelivered)
+    finally:
+        processados = len(pendentes) - len(fila)
+        store.remove_pending_deliveries(descartados + [pid for pid, _, _ in pendentes[:processados]])
+
+def format_force_result(result: dict) -> str:
+    """Mensagem enviada a quem pediu uma verificação com 'forcar'"""
+    status = result.get("status")
+    if status == "success":
+        return f"✅ Verificação forçada concluída!\n📄 {result.get('normativos_enviados', 0)} normativo(s) novo(s) enviado(s)."
+    if status == "no_new_items":
+        return "✅ Verificação forçada concluída!\nℹ️ Nenhum normativo novo desde a última verificação."
+    if status == "skipped" and result.get("reason") == "outside_business_hours":
+        return "⏰ Verificação não executada: fora do horário comercial (08:00-19:25h SP)."
+    if status == "skipped":
+        return "ℹ️ Verificação concluída: nenhum inscrito para notificar."
+    return f"❌ A verificação forçada falhou: {result.get('error') or result.get('reason', 'erro desconhecido')}"
+
+async def run_once(bot: Optional[Bot] = None, store: Optional[PGStore] = None,
+                   seen_filter: Optional[SeenItemsFilter] = None,
+                   roster: Optional[SubscriberRoster] = None,
+                   stop_event: Optional[asyncio.Event] = None,
+                   webhooks=None, index_feed: bool = False) -> dict:
+    """
+    Executa uma vez o processamento do feed do BACEN.
+    
+    Se `bot` for informado (Bot de longa duração do processo), ele é reutilizado e
+    não é fechado aqui; caso contrário um Bot temporário é criado e fechado ao final.
+    `store` permite reaproveitar a conexão do processo e `seen_filter` (filtro em
+    memória dos itens já vistos) evita consultar o banco quando não há novidades;
+    `roster` (inscritos em memória) substitui a leitura completa de subscribers.
+    Se `stop_event` disparar durante o envio (encerramento do processo), as
+    entregas restantes são guardadas em pending_deliveries e retomadas na próxima execução.
+    Com `webhooks` (webhooks.WebhookDispatcher), o lote de normativos novos também
+    é enviado aos endpoints internos, em background.
+    Só os normativos novos entram no índice (normativos); com `index_feed` o feed
+    inteiro é indexado — uma vez por processo, para cobrir o que saiu antes do índice.
+    Retorna o desfecho da execução (status + detalhes).
+    """
     start_time = datetime.now(BR_TZ)
     print(f"🕒 [{start_time.strftime('%H:%M:%S')}] Iniciando verificação de normativos...")
     
+    # Cada tick tem seu próprio orçamento de retentativas HTTP
+    reset_retry_budget()
+    
     # Log de início
     log_execution("started", {
         "timestamp": start_time.isoformat(),
@@ -118,55 +273,71 @@ async def run_once():
     
     if not is_business_hours():
         print("⏰ Fora do horário comercial (08:00-19:25h SP) — nada a processar.")
-        log_execution("skipped", {"reason": "outside_business_hours"})
-        return
+        return _finish("skipped", {"reason": "outside_business_hours"})
     
     s = get_settings()
-    store = get_store()
+    store = store or get_store()
     
     # Verificação de saúde do banco
     health = store.health_check()
     if health['status'] != 'healthy':
         print(f"❌ Problema no banco de dados: {health.get('error', 'Erro desconhecido')}")
-        log_execution("error", {"reason": "database_unhealthy", "error": health.get('error')})
-        return
+        return _finish("error", {"reason": "database_unhealthy", "error": health.get('error')})
     
     print(f"✅ Banco de dados saudável - {health['subscriber_count']} inscrito(s)")
     
-    subscribers = store.list_subscribers()
-    if not subscribers:
+    subscribers = roster.get(store) if roster is not None else store.list_subscribers()
+    if not subscribers and not channel_mode_enabled():
         print("ℹ️ Nenhum inscrito — nada a enviar.")
-        log_execution("skipped", {"reason": "no_subscribers"})
-        return
+        return _finish("skipped", {"reason": "no_subscribers"})
 
     print(f"🔍 Buscando normativos do BACEN...")
-    normativos = parse_bacen_feed()
+    normativos = await parse_bacen_feed_async()
     
     if not normativos:
         print("❌ Nenhum normativo encontrado no feed do BACEN")
-        log_execution("error", {"reason": "no_normativos_found"})
-        return
+        return _finish("error", {"reason": "no_normativos_found"})
     
     # Ordena por data de publicação (mais recente primeiro)
     normativos.sort(key=lambda x: x.published, reverse=True)
     print(f"📊 {len(normativos)} normativos encontrados no feed")
     
-    bot = Bot(token=s.TELEGRAM_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    own_bot = bot is None
+    if own_bot:
+        bot = Bot(token=s.TELEGRAM_TOKEN, session=make_bot_session(), default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 
     try:
         novos_normativos = 0
         normativos_enviados = []
+        dead_chats: set[int] = set()
         
-        for normativo in normativos[:s.MAX_ITEMS_PER_FEED]:
-            # Usa o link como ID único para o normativo
-            item_id = normativo.link or normativo.title
-            
-            if not item_id:
-                continue
-                
-            # Verifica se já foi enviado antes
-            if not store.mark_new_and_return_is_new("bacen_feed", item_id):
+        # Modo canal: uma publicação por normativo; sem canal acessível, volta às mensagens diretas
+        channel_id = await resolve_channel(bot) if channel_mode_enabled() else None
+        theme_filters = store.list_theme_subscribers()
+        destinos = subscribers if channel_id is None else [*subscribers, channel_id]
+        
+        # Primeiro o que ficou pendente de um encerramento anterior
+        nao_entregues = []
+        retomados = await resume_pending_deliveries(bot, store, destinos, dead_chats, stop_event, nao_entregues)
+        
+        # Usa o link como ID único para o normativo
+        candidatos = [(normativo.link or normativo.title, normativo) for normativo in normativos[:s.MAX_ITEMS_PER_FEED]]
+        candidatos = [(item_id, normativo) for item_id, normativo in candidatos if item_id]
+        item_ids = [item_id for item_id, _ in candidatos]
+
+        # Marca todos de uma vez; só os que ainda não tinham sido enviados voltam
+        if seen_filter is not None:
+            novos_ids = set(seen_filter.mark_new(store, item_ids))
+        else:
+            novos_ids = set(store.mark_new_batch("bacen_feed", item_ids))
+
+        # Entregas na ordem (normativo, inscrito)
+        fila = deque()
+        novos_lote = []
+        for item_id, normativo in candidatos:
+            if item_id not in novos_ids:
                 continue  # já enviado antes
+            novos_ids.discard(item_id)  # links repetidos no feed saem uma vez só
 
             print(f"🆕 Novo normativo detectado: {normativo.title}")
 
@@ -176,45 +347,98 @@ async def run_once():
             # Adiciona prefixo de notificação
             notification_msg = f"🆕 <b>NOVO NORMATIVO BACEN</b>\n\n{msg}"
 
-            # Envia para todos os inscritos
-            for chat_id in subscribers:
-                try:
-                    await bot.send_message(chat_id, notification_msg, disable_web_page_preview=False)
-                    print(f"✅ Enviado para {chat_id}: {normativo.title}")
-                except Exception as ex:
-                    print(f"❌ Falha ao enviar para {chat_id}: {ex}")
+            # Envia para o canal e/ou os inscritos, respeitando os filtros de temas
+            fila.extend((chat_id, notification_msg) for chat_id in recipients_for(normativo, subscribers, theme_filters, channel_id))
             
             novos_normativos += 1
+            novos_lote.append(normativo)
             normativos_enviados.append({
                 "title": normativo.title,
                 "published": normativo.published.isoformat(),
                 "link": normativo.link
             })
         
+        # Índice por tipo/número/ano (consultas do reply bot); falhar aqui não impede os envios
+        a_indexar = normativos if index_feed else novos_lote
+        if a_indexar:
+            try:
+                indexados = store.save_normativos(a_indexar)
+                if indexados:
+                    print(f"🗂️ {indexados} normativo(s) indexado(s)")
+            except Exception as ex:
+                print(f"⚠️ Erro ao indexar normativos: {ex}")
+        
+        # Webhooks em background: um endpoint lento não atrasa o Telegram
+        if webhooks is not None:
+            webhooks.dispatch(novos_lote)
+        
+        # Os itens já estão marcados como vistos: o que não sair agora fica salvo
+        try:
+            await deliver(bot, fila, dead_chats, stop_event, nao_entregues)
+        finally:
+            adiados = defer_deliveries(store, fila, dead_chats)
+        
+        if channel_id is not None and channel_id in dead_chats:
+            dead_chats.discard(channel_id)  # não é um inscrito
+            print(f"⚠️ Não foi possível publicar no canal {TELEGRAM_CHANNEL_ID}: verifique se o bot é administrador")
+            # Os itens já estão marcados como vistos: quem depende do canal recebe por mensagem direta
+            fila = deque(
+                (chat_id, mensagem)
+                for destino, mensagem in nao_entregues if destino == channel_id
+                for chat_id in subscribers if chat_id not in theme_filters
+            )
+            if fila:
+                print(f"↪️ {len(fila)} envio(s) do canal redirecionado(s) para mensagem direta")
+            try:
+                await deliver(bot, fila, dead_chats, stop_event)
+            finally:
+                adiados += defer_deliveries(store, fila, dead_chats)
+            reset_channel()  # a próxima execução resolve o canal de novo
+        
+        # Remove de uma vez os chats que bloquearam o bot ou deixaram de existir
+        pruned = 0
+        if dead_chats:
+            try:
+                pruned = store.remove_subscribers(sorted(dead_chats))
+                print(f"🧹 {pruned} inscrito(s) inacessível(is) removido(s)")
+            except Exception as ex:
+                print(f"⚠️ Erro ao remover inscritos inacessíveis: {ex}")
+        
         end_time = datetime.now(BR_TZ)
         duration = (end_time - start_time).total_seconds()
         
         if novos_normativos > 0:
             print(f"📊 Total de novos normativos enviados: {novos_normativos}")
-            log_execution("success", {
+            result = _finish("success", {
                 "normativos_enviados": novos_normativos,
                 "subscribers_count": len(subscribers),
+                "delivery_mode": "dm" if channel_id is None else "channel",
                 "duration_seconds": duration,
+                "http_retries": get_retry_budget().used,
+                "subscribers_pruned": pruned,
+                "deliveries_resumed": retomados,
+                "deliveries_deferred": adiados,
                 "normativos": normativos_enviados
             })
         else:
             print("ℹ️ Nenhum normativo novo encontrado")
-            log_execution("no_new_items", {
+            result = _finish("no_new_items", {
                 "subscribers_count": len(subscribers),
-                "duration_seconds": duration
+                "duration_seconds": duration,
+                "http_retries": get_retry_budget().used,
+                "subscribers_pruned": pruned,
+                "deliveries_resumed": retomados
             })
             
     except Exception as e:
         print(f"❌ Erro durante execução: {e}")
-        log_execution("error", {"reason": "execution_error", "error": str(e)})
+        result = _finish("error", {"reason": "execution_error", "error": str(e)})
     finally:
-        await bot.session.close()
+        if own_bot:
+            await bot.session.close()
         print(f"🏁 Verificação concluída às {datetime.now(BR_TZ).strftime('%H:%M:%S')}")
+    
+    return result
 
 async def run_cron():
     """Executa o cron de forma robusta (10 em 10 min, 08:00-19:25h SP)"""
@@ -232,6 +456,7 @@ async def run_cron():
     
     consecutive_errors = 0
     max_consecutive_errors = 5
+    feed_indexado = False  # a primeira execução indexa o feed inteiro
     
     while True:
         try:
@@ -244,7 +469,8 @@ async def run_cron():
             print(f"🔄 Tentativa {consecutive_errors + 1} - Erros consecutivos: {consecutive_errors}")
             
             # Executa verificação
-            await run_once()
+            result = await run_once(index_feed=not feed_indexado)
+            feed_indexado = feed_indexado or result.get("status") in ("success", "no_new_items")
             
             # Reset contador de erros em caso de sucesso
             consecutive_errors = 0
@@ -281,5 +507,14 @@ async def run_cron():
         print("⏳ Aguardando 10 minutos...")
         await asyncio.sleep(10 * 60)  # 10 minutos
 
+async def _run_once_standalone():
+    from webhooks import WebhookDispatcher
+    webhooks = WebhookDispatcher(get_store())
+    try:
+        await run_once(store=webhooks.store, webhooks=webhooks)
+    finally:
+        await webhooks.close()
+        await close_http_session()
+
 if __name__ == "__main__":
-    asyncio.run(run_once())
+    asyncio.run(_run_once_standalone())
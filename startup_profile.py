@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Perfil de inicialização dos serviços - tempo de import (python -X importtime)
+e, opcionalmente, tempo até o /health do reply bot responder
+
+Uso:
+    python startup_profile.py                 # imports de main.py e cron.py
+    python startup_profile.py --top 30 sender # imports de um módulo específico
+    python startup_profile.py --serve         # sobe main.py e mede até o /health responder
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Variáveis mínimas para os módulos importarem sem o ambiente do Railway
+# (nenhum deles conecta ao banco ou ao Telegram no import)
+PROFILE_ENV = {
+    "TELEGRAM_TOKEN": "123456:PROFILE",
+    "DATABASE_URL": "postgresql://profile@127.0.0.1:1/profile",
+}
+
+def profile_env() -> dict:
+    env = dict(os.environ)
+    for name, value in PROFILE_ENV.items():
+        env.setdefault(name, value)
+    return env
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """Linhas 'import time: self | cumulative | nome' -> (nome, self_us, cumulativo_us)"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            modules.append((name.rstrip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return modules
+
+def profile_import(module: str, top: int) -> dict:
+    """Importa `module` num processo limpo com -X importtime e resume o resultado"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=profile_env(), capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    modules = parse_importtime(proc.stderr)
+
+    # Pacotes de primeiro nível (sem indentação no nome) somam o tempo total
+    top_level = [(name.strip(), cumulative) for name, _, cumulative in modules if not name.startswith("  ")]
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+        "wall_s": wall,
+        "import_s": sum(cumulative for _, cumulative in top_level) / 1e6,
+        "count": len(modules),
+        "slowest": sorted(top_level, key=lambda m: m[1], reverse=True)[:top],
+        "slowest_self": sorted(((n.strip(), s) for n, s, _ in modules), key=lambda m: m[1], reverse=True)[:top],
+    }
+
+def print_profile(result: dict):
+    print(f"\n📦 import {result['module']}")
+    if not result["ok"]:
+        print(f"   ❌ Falhou: {result['error']}")
+        return
+    print(f"   ⏱️  {result['import_s']:.3f}s em imports ({result['count']} módulos), "
+          f"{result['wall_s']:.3f}s de processo")
+    print("   Mais lentos (cumulativo, primeiro nível):")
+    for name, us in result["slowest"]:
+        print(f"     {us / 1000:>9.1f} ms  {name}")
+    print("   Mais lentos (tempo próprio):")
+    for name, us in result["slowest_self"]:
+        print(f"     {us / 1000:>9.1f} ms  {name}")
+
+def measure_health(port: int, timeout: float) -> float | None:
+    """Sobe main.py e mede o tempo até GET /health responder 200"""
+    env = profile_env()
+    env["PORT"] = str(port)
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                return None
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.05)
+        return None
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de inicialização do BACEN Bot")
+    parser.add_argument("modules", nargs="*", default=["main", "cron"], help="módulos a importar")
+    parser.add_argument("--top", type=int, default=15, help="quantos módulos listar")
+    parser.add_argument("--serve", action="store_true", help="mede o tempo até o /health do main.py responder")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    print("🚀 PERFIL DE INICIALIZAÇÃO")
+    print("=" * 50)
+    for module in args.modules:
+        print_profile(profile_import(module, args.top))
+
+    if args.serve:
+        print(f"\n🌐 Subindo main.py na porta {args.port}...")
+        elapsed = measure_health(args.port, args.timeout)
+        if elapsed is None:
+            print("   ❌ /health não respondeu (o processo saiu ou estourou o timeout)")
+        else:
+            print(f"   ✅ /health respondeu em {elapsed:.3f}s")
+
+if __name__ == "__main__":
+    main()
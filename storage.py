@@ -1,35 +1,287 @@
 import os
+import time
+import bisect
+import hashlib
+import asyncio
+from array import array
 import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
 SCHEMA_SQL = """
+-- Itens já vistos: chave compacta de 64 bits (ver seen_item_key) em vez da URL completa
 CREATE TABLE IF NOT EXISTS seen_items (
     source TEXT NOT NULL,
-    item_id TEXT NOT NULL,
-    PRIMARY KEY (source, item_id)
+    item_key BIGINT NOT NULL,
+    seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (source, item_key)
 );
 CREATE TABLE IF NOT EXISTS subscribers (
     chat_id BIGINT PRIMARY KEY,
     first_name TEXT,
     username TEXT,
-    joined_at TIMESTAMPTZ DEFAULT NOW()
+    joined_at TIMESTAMPTZ DEFAULT NOW(),
+    -- Filtro de temas do inscrito (minúsculos); NULL recebe todos os normativos
+    temas TEXT[]
+);
+CREATE TABLE IF NOT EXISTS force_requests (
+    id BIGSERIAL PRIMARY KEY,
+    chat_id BIGINT NOT NULL,
+    requested_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    processed_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS force_requests_pending_idx
+    ON force_requests (chat_id) WHERE processed_at IS NULL;
+CREATE INDEX IF NOT EXISTS force_requests_chat_idx
+    ON force_requests (chat_id, requested_at);
+-- Envios adiados por um encerramento no meio do fan-out (retomados na próxima execução)
+CREATE TABLE IF NOT EXISTS pending_deliveries (
+    id BIGSERIAL PRIMARY KEY,
+    chat_id BIGINT NOT NULL,
+    message TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+-- Normativos já vistos no feed, com tipo/número/ano extraídos do título (consulta 'res 4966')
+CREATE TABLE IF NOT EXISTS normativos (
+    item_key BIGINT PRIMARY KEY,
+    tipo TEXT,
+    numero INTEGER,
+    ano SMALLINT,
+    title TEXT NOT NULL,
+    link TEXT NOT NULL,
+    published TIMESTAMPTZ NOT NULL,
+    tema TEXT,
+    mini_resumo TEXT,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS normativos_numero_idx ON normativos (numero, tipo, ano);
+-- Normativo (origem) que altera/revoga outro (alvo, que pode não estar no feed):
+-- a chave primária atende "o que X altera" e o índice do alvo, "o que alterou X"
+CREATE TABLE IF NOT EXISTS normativo_referencias (
+    origem_key BIGINT NOT NULL REFERENCES normativos(item_key) ON DELETE CASCADE,
+    alvo_tipo TEXT NOT NULL,
+    alvo_numero INTEGER NOT NULL,
+    relacao TEXT NOT NULL,
+    alvo_ano SMALLINT,
+    PRIMARY KEY (origem_key, alvo_tipo, alvo_numero, relacao)
+);
+CREATE INDEX IF NOT EXISTS normativo_referencias_alvo_idx ON normativo_referencias (alvo_numero, alvo_tipo, alvo_ano);
+-- Webhooks de saída (webhooks.py): endpoints internos avisados a cada lote de normativos novos
+CREATE TABLE IF NOT EXISTS webhook_endpoints (
+    id SERIAL PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    secret TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+-- Lotes que esgotaram as tentativas (reenviados com 'python webhooks.py replay')
+CREATE TABLE IF NOT EXISTS webhook_dead_letters (
+    id BIGSERIAL PRIMARY KEY,
+    endpoint_id INTEGER NOT NULL REFERENCES webhook_endpoints (id) ON DELETE CASCADE,
+    payload TEXT NOT NULL,
+    error TEXT,
+    attempts INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS webhook_dead_letters_endpoint_idx
+    ON webhook_dead_letters (endpoint_id, id);
+-- Demanda de envio de cada processo (ver outbound.py): combina a vazão do token entre eles
+CREATE TABLE IF NOT EXISTS outbound_lanes (
+    process TEXT PRIMARY KEY,
+    priority SMALLINT,
+    backlog INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 """
 
+# Formato antigo de seen_items (item_id TEXT com a URL) -> chave compacta.
+# Copia para uma tabela nova (compacta de fato) e troca os nomes; o MD5 em SQL
+# gera exatamente a mesma chave que seen_item_key().
+MIGRATE_SEEN_ITEMS_SQL = """
+CREATE TABLE seen_items_new (
+    source TEXT NOT NULL,
+    item_key BIGINT NOT NULL,
+    seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (source, item_key)
+);
+INSERT INTO seen_items_new (source, item_key)
+SELECT source, ('x' || substr(md5(item_id), 1, 16))::bit(64)::bigint FROM seen_items
+ON CONFLICT DO NOTHING;
+DROP TABLE seen_items;
+ALTER TABLE seen_items_new RENAME TO seen_items;
+ALTER TABLE seen_items RENAME CONSTRAINT seen_items_new_pkey TO seen_items_pkey;
+"""
+
+STATS_SQL = """
+-- Contadores mantidos por trigger: evita COUNT(*) (seq scan) a cada status/tick
+CREATE TABLE IF NOT EXISTS bacen_stats (
+    name TEXT PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+CREATE OR REPLACE FUNCTION bacen_stats_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE bacen_stats SET value = value + 1 WHERE name = TG_TABLE_NAME;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE bacen_stats SET value = value - 1 WHERE name = TG_TABLE_NAME;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'subscribers_stats') THEN
+        CREATE TRIGGER subscribers_stats AFTER INSERT OR DELETE ON subscribers
+            FOR EACH ROW EXECUTE FUNCTION bacen_stats_count();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'seen_items_stats') THEN
+        CREATE TRIGGER seen_items_stats AFTER INSERT OR DELETE ON seen_items
+            FOR EACH ROW EXECUTE FUNCTION bacen_stats_count();
+    END IF;
+END $$;
+"""
+
+# Canal LISTEN/NOTIFY com as mudanças de inscritos: payload '+<chat_id>' ou '-<chat_id>'
+ROSTER_CHANNEL = "bacen_subscribers"
+
+ROSTER_SQL = f"""
+-- Avisa quem mantém a lista de inscritos em memória (o NOTIFY só sai no COMMIT)
+CREATE OR REPLACE FUNCTION bacen_subscribers_notify() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('{ROSTER_CHANNEL}', '+' || NEW.chat_id);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('{ROSTER_CHANNEL}', '-' || OLD.chat_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'subscribers_notify') THEN
+        CREATE TRIGGER subscribers_notify AFTER INSERT OR DELETE ON subscribers
+            FOR EACH ROW EXECUTE FUNCTION bacen_subscribers_notify();
+    END IF;
+END $$;
+"""
+
+# Intervalo (s) entre releituras completas da lista de inscritos mantida em memória
+ROSTER_RECONCILE_SECONDS = float(os.getenv("ROSTER_RECONCILE_SECONDS", "3600"))
+
+# Chave arbitrária do advisory lock que serializa migrações entre os serviços
+MIGRATION_LOCK_ID = 7212025
+
+# Retenção de seen_items. O feed cobre um ano-calendário (?ano=), então um item
+# com mais de FEED_HORIZON_DAYS nunca reaparece; a retenção nunca fica abaixo disso.
+FEED_HORIZON_DAYS = 366
+SEEN_ITEMS_RETENTION_DAYS = int(os.getenv("SEEN_ITEMS_RETENTION_DAYS", "400"))
+# Pedidos 'forcar' atendidos só importam para o cooldown; depois disso podem sair
+FORCE_REQUESTS_RETENTION_DAYS = 7
+
+def seen_item_key(item_id: str) -> int:
+    """Chave compacta de um item: 8 primeiros bytes do MD5 do ID como BIGINT com sinal"""
+    return int.from_bytes(hashlib.md5(item_id.encode("utf-8")).digest()[:8], "big", signed=True)
+
+# Tabelas com contador em bacen_stats
+COUNTED_TABLES = ("subscribers", "seen_items")
+
+# Timeout (s) para abrir a conexão: um banco lento falha rápido e o chamador tenta de novo
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+
+# Por quanto tempo (s) os contadores lidos ficam em cache no processo
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))
+
 class PGStore:
     def __init__(self, url: str):
         self.url = url
         self.conn = None
+        self._stats_cache: dict | None = None
+        self._stats_cached_at = 0.0
 
     def init(self):
-        self.conn = psycopg2.connect(self.url)
+        self.conn = psycopg2.connect(self.url, connect_timeout=DB_CONNECT_TIMEOUT)
         with self.conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
             cur.execute(SCHEMA_SQL)
+            migrated = self._migrate_seen_items(cur)
+            self._migrate_subscriber_temas(cur)
+            self._migrate_normativos_summary(cur)
+            cur.execute(STATS_SQL)
+            cur.execute(ROSTER_SQL)
+            if migrated:
+                cur.execute("DELETE FROM bacen_stats WHERE name = 'seen_items'")
+            # Semeia os contadores uma única vez (o COUNT só roda se a linha não existe)
+            for table in COUNTED_TABLES:
+                cur.execute(
+                    f"""
+                    INSERT INTO bacen_stats (name, value)
+                    SELECT %s, COUNT(*) FROM {table}
+                    WHERE NOT EXISTS (SELECT 1 FROM bacen_stats WHERE name = %s)
+                    ON CONFLICT (name) DO NOTHING
+                    """,
+                    (table, table),
+                )
         self.conn.commit()
 
+    def _migrate_seen_items(self, cur) -> bool:
+        """Converte seen_items do formato antigo (URL em texto) para chave compacta, se preciso"""
+        cur.execute(
+            """
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = 'seen_items' AND column_name = 'item_id'
+            """
+        )
+        if cur.fetchone() is None:
+            return False
+        print("🔧 Migrando seen_items para chaves compactas...")
+        cur.execute(MIGRATE_SEEN_ITEMS_SQL)
+        return True
+
+    def _migrate_subscriber_temas(self, cur):
+        """
+        Coluna e índice do filtro de temas em bancos anteriores a eles. Consulta só o
+        catálogo: o ALTER/CREATE INDEX (que travam subscribers) rodam uma única vez.
+        """
+        cur.execute(
+            """
+            SELECT
+                EXISTS (SELECT 1 FROM information_schema.columns
+                        WHERE table_schema = current_schema() AND table_name = 'subscribers' AND column_name = 'temas'),
+                EXISTS (SELECT 1 FROM pg_indexes
+                        WHERE schemaname = current_schema() AND indexname = 'subscribers_temas_idx')
+            """
+        )
+        has_column, has_index = cur.fetchone()
+        if not has_column:
+            print("🔧 Adicionando o filtro de temas a subscribers...")
+            cur.execute("ALTER TABLE subscribers ADD COLUMN temas TEXT[]")
+        if not has_index:
+            cur.execute("CREATE INDEX subscribers_temas_idx ON subscribers (chat_id) WHERE temas IS NOT NULL")
+
+    def _migrate_normativos_summary(self, cur):
+        """Coluna do resumo do feed em normativos indexados antes dela (o ALTER roda uma única vez)"""
+        cur.execute(
+            """
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = 'normativos' AND column_name = 'summary'
+            """
+        )
+        if cur.fetchone() is None:
+            print("🔧 Adicionando o resumo do feed a normativos...")
+            cur.execute("ALTER TABLE normativos ADD COLUMN summary TEXT")
+
+    def close(self):
+        """Fecha a conexão (ignorando erros de uma conexão já quebrada)"""
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
     # ============ subscribers ============
     def upsert_subscriber(self, chat_id: int, first_name: str | None, username: str | None):
         with self.conn.cursor() as cur:
@@ -50,18 +302,25 @@ class PGStore:
             cur.execute("DELETE FROM subscribers WHERE chat_id=%s", (chat_id,))
         self.conn.commit()
 
+    def remove_subscribers(self, chat_ids: list[int]) -> int:
+        """Remove vários inscritos de uma vez; retorna quantos foram removidos"""
+        if not chat_ids:
+            return 0
+        with self.conn.cursor() as cur:
+            cur.execute("DELETE FROM subscribers WHERE chat_id = ANY(%s)", (list(chat_ids),))
+            removed = cur.rowcount
+        self.conn.commit()
+        return removed
+
     def get_subscriber_count(self) -> int:
         """Retorna o número total de inscritos"""
-        with self.conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) FROM subscribers")
-            count = cur.fetchone()[0]
-        return count
+        return self.get_stats()['subscribers']
     
     def get_subscriber_info(self, chat_id: int) -> dict | None:
         """Retorna informações de um inscrito específico"""
         with self.conn.cursor() as cur:
             cur.execute(
-                "SELECT chat_id, first_name, username, joined_at FROM subscribers WHERE chat_id = %s",
+                "SELECT chat_id, first_name, username, joined_at, temas FROM subscribers WHERE chat_id = %s",
                 (chat_id,)
             )
             row = cur.fetchone()
@@ -70,32 +329,78 @@ class PGStore:
                     'chat_id': row[0],
                     'first_name': row[1],
                     'username': row[2],
-                    'joined_at': row[3]
+                    'joined_at': row[3],
+                    'temas': row[4]
                 }
         return None
+
+    def set_subscriber_temas(self, chat_id: int, temas: list[str] | None) -> bool:
+        """Define o filtro de temas do inscrito (None = todos); False se não está inscrito"""
+        with self.conn.cursor() as cur:
+            cur.execute("UPDATE subscribers SET temas = %s WHERE chat_id = %s", (temas, chat_id))
+            updated = cur.rowcount == 1
+        self.conn.commit()
+        return updated
+
+    def list_theme_subscribers(self) -> dict[int, list[str]]:
+        """Inscritos com filtro de temas: {chat_id: temas}"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT chat_id, temas FROM subscribers WHERE temas IS NOT NULL")
+            rows = cur.fetchall()
+        self.conn.commit()
+        return dict(rows)
     
+    # ============ estatísticas ============
+    def ping(self) -> bool:
+        """Teste de vida barato da conexão"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+        self.conn.commit()
+        return True
+
+    def get_stats(self, max_age: float = STATS_CACHE_TTL) -> dict:
+        """Contadores de inscritos/itens vistos em O(1), com cache curto no processo"""
+        now = time.monotonic()
+        if self._stats_cache is None or now - self._stats_cached_at > max_age:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT name, value FROM bacen_stats")
+                stats = dict(cur.fetchall())
+            self.conn.commit()
+            self._stats_cache = {table: stats.get(table, 0) for table in COUNTED_TABLES}
+            self._stats_cached_at = now
+        return self._stats_cache
+
+    def recount_stats(self) -> dict:
+        """Recalcula os contadores com COUNT(*) (reconciliação eventual, não usar por request)"""
+        with self.conn.cursor() as cur:
+            for table in COUNTED_TABLES:
+                cur.execute(
+                    f"""
+                    INSERT INTO bacen_stats (name, value) SELECT %s, COUNT(*) FROM {table}
+                    ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value
+                    """,
+                    (table,),
+                )
+        self.conn.commit()
+        return self.get_stats(max_age=0)
+
     def health_check(self) -> dict:
         """Verifica a saúde do banco de dados"""
         try:
-            with self.conn.cursor() as cur:
-                # Testa conexão
-                cur.execute("SELECT 1")
-                
-                # Conta inscritos
-                cur.execute("SELECT COUNT(*) FROM subscribers")
-                subscriber_count = cur.fetchone()[0]
-                
-                # Conta itens vistos
-                cur.execute("SELECT COUNT(*) FROM seen_items")
-                seen_items_count = cur.fetchone()[0]
-                
-                return {
-                    'status': 'healthy',
-                    'subscriber_count': subscriber_count,
-                    'seen_items_count': seen_items_count,
-                    'connection': 'ok'
-                }
+            # Testa conexão
+            self.ping()
+            stats = self.get_stats()
+            
+            return {
+                'status': 'healthy',
+                'subscriber_count': stats['subscribers'],
+                'seen_items_count': stats['seen_items'],
+                'connection': 'ok'
+            }
         except Exception as e:
+            if self.conn is not None and not self.conn.closed:
+                self.conn.rollback()
             return {
                 'status': 'unhealthy',
                 'error': str(e),
@@ -113,13 +418,516 @@ class PGStore:
     def mark_new_and_return_is_new(self, source: str, item_id: str) -> bool:
         with self.conn.cursor() as cur:
             cur.execute(
-                "INSERT INTO seen_items (source, item_id) VALUES (%s,%s) ON CONFLICT DO NOTHING",
-                (source, item_id),
+                "INSERT INTO seen_items (source, item_key) VALUES (%s,%s) ON CONFLICT DO NOTHING",
+                (source, seen_item_key(item_id)),
+            )
+            inserted = cur.rowcount == 1
+        self.conn.commit()
+        return inserted
+
+    def mark_new_batch(self, source: str, item_ids: list[str]) -> list[str]:
+        """Marca vários itens de uma vez; retorna, na ordem recebida, os que ainda não tinham sido vistos"""
+        keys = {seen_item_key(item_id): item_id for item_id in item_ids}
+        if not keys:
+            return []
+        with self.conn.cursor() as cur:
+            inserted = execute_values(
+                cur,
+                "INSERT INTO seen_items (source, item_key) VALUES %s ON CONFLICT DO NOTHING RETURNING item_key",
+                [(source, key) for key in keys],
+                fetch=True,
+            )
+        self.conn.commit()
+        novos = {row[0] for row in inserted}
+        return [item_id for key, item_id in keys.items() if key in novos]
+
+    def load_seen_keys(self, source: str) -> list[int]:
+        """Todas as chaves já vistas de uma fonte (para o filtro em memória do cron)"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT item_key FROM seen_items WHERE source = %s", (source,))
+            rows = cur.fetchall()
+        self.conn.commit()
+        return [r[0] for r in rows]
+
+    def prune_seen_items(self, retention_days: int = SEEN_ITEMS_RETENTION_DAYS, batch_size: int = 5000) -> int:
+        """
+        Remove itens vistos há mais de retention_days (nunca menos que o horizonte do feed),
+        em lotes para não segurar locks longos. Retorna quantos foram removidos.
+        """
+        retention_days = max(retention_days, FEED_HORIZON_DAYS)
+        removed = 0
+        while True:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """
+                    DELETE FROM seen_items WHERE ctid IN (
+                        SELECT ctid FROM seen_items
+                        WHERE seen_at < NOW() - %s * INTERVAL '1 day'
+                        LIMIT %s
+                    )
+                    """,
+                    (retention_days, batch_size),
+                )
+                deleted = cur.rowcount
+            self.conn.commit()
+            removed += deleted
+            if deleted < batch_size:
+                return removed
+
+    # ============ normativos (tipo/número/ano) ============
+    def save_normativos(self, normativos: list) -> int:
+        """
+        Guarda os normativos ainda desconhecidos (BACENNormativo) e, na mesma transação,
+        as referências (altera/revoga) dos que eram novos; retorna quantos eram novos
+        """
+        rows, by_key = [], {}
+        for n in normativos:
+            ident = n.identificador
+            key = seen_item_key(n.link or n.title)
+            by_key[key] = n
+            rows.append((
+                key,
+                ident.tipo if ident else None, ident.numero if ident else None, ident.ano if ident else None,
+                n.title, n.link, n.published, n.tema, n.mini_resumo, n.summary,
+            ))
+        if not rows:
+            return 0
+        try:
+            with self.conn.cursor() as cur:
+                inserted = execute_values(
+                    cur,
+                    """
+                    INSERT INTO normativos (item_key, tipo, numero, ano, title, link, published, tema, mini_resumo, summary)
+                    VALUES %s ON CONFLICT (item_key) DO NOTHING RETURNING item_key
+                    """,
+                    rows,
+                    fetch=True,
+                )
+                # Só os novos: as arestas dos já conhecidos foram gravadas quando chegaram
+                edges = [
+                    (key, ref.alvo.tipo, ref.alvo.numero, ref.relacao, ref.alvo.ano)
+                    for (key,) in inserted for ref in by_key[key].referencias
+                ]
+                if edges:
+                    execute_values(
+                        cur,
+                        """
+                        INSERT INTO normativo_referencias (origem_key, alvo_tipo, alvo_numero, relacao, alvo_ano)
+                        VALUES %s ON CONFLICT DO NOTHING
+                        """,
+                        edges,
+                    )
+            self.conn.commit()
+        except Exception:
+            # Não deixa a transação abortada para as próximas operações da execução
+            self.conn.rollback()
+            raise
+        return len(inserted)
+
+    def find_normativos(self, numero: int, tipos: list[str] | None = None, ano: int | None = None,
+                        limit: int = 10) -> list[dict]:
+        """Normativos com esse número (e tipo/ano, se informados), mais recente primeiro"""
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT tipo, numero, ano, title, link, published, tema, mini_resumo FROM normativos
+                WHERE numero = %s
+                  AND (%s::text[] IS NULL OR tipo = ANY(%s::text[]))
+                  AND (%s::smallint IS NULL OR ano = %s::smallint)
+                ORDER BY published DESC LIMIT %s
+                """,
+                (numero, tipos, tipos, ano, ano, limit),
+            )
+            rows = cur.fetchall()
+        self.conn.commit()
+        columns = ("tipo", "numero", "ano", "title", "link", "published", "tema", "mini_resumo")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def list_normativo_texts(self) -> list[tuple]:
+        """
+        (item_key, title, summary, tema) de todos os normativos indexados, para treino e retag.
+        O resumo é o do feed (None nos indexados antes da coluna): o mini_resumo cita o próprio tema.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT item_key, title, summary, tema FROM normativos ORDER BY published")
+            rows = cur.fetchall()
+        self.conn.commit()
+        return rows
+
+    def update_normativo_temas(self, updates: list[tuple[int, str]], page_size: int = 1000) -> int:
+        """Grava novos temas [(item_key, tema)] em lote; retorna quantos foram enviados"""
+        if not updates:
+            return 0
+        try:
+            with self.conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    UPDATE normativos AS n SET tema = v.tema
+                    FROM (VALUES %s) AS v(item_key, tema)
+                    WHERE n.item_key = v.item_key
+                    """,
+                    updates,
+                    page_size=page_size,
+                )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return len(updates)
+
+    def find_references_to(self, numero: int, tipos: list[str] | None = None, ano: int | None = None,
+                           limit: int = 20) -> list[dict]:
+        """Normativos que alteram/revogam o informado ('o que alterou a Resolução X'), mais recente primeiro"""
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT r.relacao, n.tipo, n.numero, n.ano, n.title, n.link, n.published
+                FROM normativo_referencias r JOIN normativos n ON n.item_key = r.origem_key
+                WHERE r.alvo_numero = %s
+                  AND (%s::text[] IS NULL OR r.alvo_tipo = ANY(%s::text[]))
+                  AND (%s::smallint IS NULL OR r.alvo_ano IS NULL OR r.alvo_ano = %s::smallint)
+                ORDER BY n.published DESC LIMIT %s
+                """,
+                (numero, tipos, tipos, ano, ano, limit),
+            )
+            rows = cur.fetchall()
+        self.conn.commit()
+        columns = ("relacao", "tipo", "numero", "ano", "title", "link", "published")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def find_references_from(self, numero: int, tipos: list[str] | None = None, ano: int | None = None,
+                             limit: int = 20) -> list[dict]:
+        """Normativos que o informado altera/revoga"""
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT r.relacao, r.alvo_tipo, r.alvo_numero, r.alvo_ano, n.title
+                FROM normativos n JOIN normativo_referencias r ON r.origem_key = n.item_key
+                WHERE n.numero = %s
+                  AND (%s::text[] IS NULL OR n.tipo = ANY(%s::text[]))
+                  AND (%s::smallint IS NULL OR n.ano = %s::smallint)
+                ORDER BY n.published DESC, r.alvo_tipo, r.alvo_numero LIMIT %s
+                """,
+                (numero, tipos, tipos, ano, ano, limit),
+            )
+            rows = cur.fetchall()
+        self.conn.commit()
+        columns = ("relacao", "tipo", "numero", "ano", "title")
+        return [dict(zip(columns, row)) for row in rows]
+
+    # ============ envios adiados ============
+    def save_pending_deliveries(self, deliveries: list[tuple[int, str]]) -> int:
+        """Guarda envios (chat_id, mensagem) que não saíram antes de um encerramento"""
+        if not deliveries:
+            return 0
+        with self.conn.cursor() as cur:
+            execute_values(cur, "INSERT INTO pending_deliveries (chat_id, message) VALUES %s", deliveries)
+        self.conn.commit()
+        return len(deliveries)
+
+    def list_pending_deliveries(self) -> list[tuple[int, int, str]]:
+        """Envios adiados (id, chat_id, mensagem) na ordem em que foram guardados"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT id, chat_id, message FROM pending_deliveries ORDER BY id")
+            rows = cur.fetchall()
+        self.conn.commit()
+        return rows
+
+    def remove_pending_deliveries(self, ids: list[int]):
+        if not ids:
+            return
+        with self.conn.cursor() as cur:
+            cur.execute("DELETE FROM pending_deliveries WHERE id = ANY(%s)", (list(ids),))
+        self.conn.commit()
+
+    # ============ orçamento de envio (outbound.py) ============
+    def sync_outbound_lane(self, process: str, priority: int | None, backlog: int,
+                           ttl_seconds: float) -> list[tuple[str, int | None]]:
+        """
+        Publica a demanda de envio do processo (priority None = ocioso) e devolve as
+        filas atualizadas nos últimos ttl_seconds, incluindo a própria
+        """
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO outbound_lanes (process, priority, backlog, updated_at)
+                VALUES (%s, %s, %s, NOW())
+                ON CONFLICT (process) DO UPDATE
+                    SET priority = EXCLUDED.priority, backlog = EXCLUDED.backlog, updated_at = NOW()
+                """,
+                (process, priority, backlog),
+            )
+            cur.execute(
+                "SELECT process, priority FROM outbound_lanes WHERE updated_at > NOW() - make_interval(secs => %s)",
+                (ttl_seconds,),
+            )
+            lanes = cur.fetchall()
+        self.conn.commit()
+        return lanes
+
+    # ============ webhooks de saída (webhooks.py) ============
+    def add_webhook_endpoint(self, url: str, secret: str) -> int:
+        """Cadastra um endpoint (ou troca o segredo de um já cadastrado); retorna o id"""
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO webhook_endpoints (url, secret) VALUES (%s, %s)
+                ON CONFLICT (url) DO UPDATE SET secret = EXCLUDED.secret
+                RETURNING id
+                """,
+                (url, secret),
+            )
+            endpoint_id = cur.fetchone()[0]
+        self.conn.commit()
+        return endpoint_id
+
+    def remove_webhook_endpoint(self, url: str) -> bool:
+        """Remove o endpoint (e seus lotes na fila de mortos)"""
+        with self.conn.cursor() as cur:
+            cur.execute("DELETE FROM webhook_endpoints WHERE url = %s", (url,))
+            removed = cur.rowcount == 1
+        self.conn.commit()
+        return removed
+
+    def list_webhook_endpoints(self) -> list[dict]:
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT id, url, secret FROM webhook_endpoints ORDER BY id")
+            rows = cur.fetchall()
+        self.conn.commit()
+        return [{"id": r[0], "url": r[1], "secret": r[2]} for r in rows]
+
+    def save_webhook_dead_letter(self, endpoint_id: int, payload: str, error: str, attempts: int):
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO webhook_dead_letters (endpoint_id, payload, error, attempts) VALUES (%s, %s, %s, %s)",
+                (endpoint_id, payload, error, attempts),
+            )
+        self.conn.commit()
+
+    def list_webhook_dead_letters(self, limit: int = 100) -> list[dict]:
+        """Lotes mortos mais antigos primeiro, com o endpoint de destino"""
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT d.id, d.payload, d.error, d.attempts, d.created_at, e.id, e.url, e.secret
+                FROM webhook_dead_letters d JOIN webhook_endpoints e ON e.id = d.endpoint_id
+                ORDER BY d.id LIMIT %s
+                """,
+                (limit,),
+            )
+            rows = cur.fetchall()
+        self.conn.commit()
+        return [
+            {"id": r[0], "payload": r[1], "error": r[2], "attempts": r[3], "created_at": r[4],
+             "endpoint": {"id": r[5], "url": r[6], "secret": r[7]}}
+            for r in rows
+        ]
+
+    def remove_webhook_dead_letters(self, ids: list[int]):
+        if not ids:
+            return
+        with self.conn.cursor() as cur:
+            cur.execute("DELETE FROM webhook_dead_letters WHERE id = ANY(%s)", (list(ids),))
+        self.conn.commit()
+
+    # ============ pedidos de verificação (forcar) ============
+    def enqueue_force_request(self, chat_id: int, cooldown_seconds: int) -> bool:
+        """
+        Registra um pedido de verificação forçada para o cron.
+        Retorna False se o chat já tem um pedido pendente ou pediu há menos de cooldown_seconds.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO force_requests (chat_id)
+                SELECT %s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM force_requests
+                    WHERE chat_id = %s
+                      AND (processed_at IS NULL OR requested_at > NOW() - %s * INTERVAL '1 second')
+                )
+                """,
+                (chat_id, chat_id, cooldown_seconds),
             )
             inserted = cur.rowcount == 1
         self.conn.commit()
         return inserted
 
+    def has_pending_force_requests(self) -> bool:
+        """Verifica (via índice parcial) se há pedidos de verificação pendentes"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM force_requests WHERE processed_at IS NULL)")
+            pending = cur.fetchone()[0]
+        self.conn.commit()
+        return pending
+
+    def claim_force_requests(self) -> list[int]:
+        """Marca todos os pedidos pendentes como atendidos e retorna os chat_ids solicitantes"""
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "UPDATE force_requests SET processed_at = NOW() WHERE processed_at IS NULL RETURNING chat_id"
+            )
+            rows = cur.fetchall()
+        self.conn.commit()
+        return sorted({r[0] for r in rows})
+
+    def release_force_requests(self, chat_ids: list[int]):
+        """Reabre o pedido mais recente de cada chat (execução interrompida antes do resultado)"""
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE force_requests f SET processed_at = NULL
+                FROM (
+                    SELECT DISTINCT ON (chat_id) id FROM force_requests
+                    WHERE chat_id = ANY(%s)
+                    ORDER BY chat_id, requested_at DESC
+                ) ultimo
+                WHERE f.id = ultimo.id
+                """,
+                (list(chat_ids),),
+            )
+        self.conn.commit()
+
+    def prune_force_requests(self, retention_days: int = FORCE_REQUESTS_RETENTION_DAYS) -> int:
+        """Remove pedidos 'forcar' atendidos há mais de retention_days; retorna quantos"""
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM force_requests WHERE processed_at < NOW() - %s * INTERVAL '1 day'",
+                (retention_days,),
+            )
+            removed = cur.rowcount
+        self.conn.commit()
+        return removed
+
+class SeenItemsFilter:
+    """
+    Chaves de seen_items de uma fonte mantidas em memória pelo cron, para que um
+    tick sem novidades não consulte o banco. O conjunto é exato: um item presente
+    foi visto com certeza; só os ausentes vão ao PGStore, que segue como fonte da verdade.
+    """
+    def __init__(self, source: str):
+        self.source = source
+        self.keys: set[int] = set()
+        self.loaded = False
+        self.db_checks = 0
+
+    def load(self, store: PGStore):
+        """(Re)carrega as chaves do banco — na partida e após a retenção"""
+        self.keys = set(store.load_seen_keys(self.source))
+        self.loaded = True
+
+    def mark_new(self, store: PGStore, item_ids: list[str]) -> list[str]:
+        """Retorna os itens novos, consultando o banco só para os que não estão no conjunto"""
+        if not self.loaded:
+            self.load(store)
+        candidatos = [item_id for item_id in dict.fromkeys(item_ids) if seen_item_key(item_id) not in self.keys]
+        if not candidatos:
+            return []
+        self.db_checks += 1
+        novos = store.mark_new_batch(self.source, candidatos)
+        # Vistos por outro processo ou recém-inseridos: em ambos os casos já estão no banco
+        self.keys.update(seen_item_key(item_id) for item_id in candidatos)
+        return novos
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+class SubscriberRoster:
+    """
+    chat_ids dos inscritos mantidos em memória pelo cron (array('q') ordenado),
+    atualizados pelo NOTIFY dos triggers de subscribers e relidos por completo a
+    cada ROSTER_RECONCILE_SECONDS. Se a conexão de escuta cair, get() volta a ler
+    a tabela até conseguir reconectar.
+    """
+    def __init__(self, url: str, reconcile_interval: float = ROSTER_RECONCILE_SECONDS):
+        self.url = url
+        self.reconcile_interval = reconcile_interval
+        self.conn = None
+        self.chat_ids = array('q')
+        self.reconciled_at = 0.0
+        self.notifications = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._reader_fd: int | None = None
+
+    def start(self, store: PGStore):
+        """Abre a conexão de escuta (LISTEN) e carrega a lista completa"""
+        self.close()
+        self.conn = psycopg2.connect(self.url, connect_timeout=DB_CONNECT_TIMEOUT)
+        self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with self.conn.cursor() as cur:
+            cur.execute(f"LISTEN {ROSTER_CHANNEL}")
+        self.reconcile(store)
+        self._add_reader()
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Aplica as notificações assim que chegam, pelo event loop"""
+        self._loop = loop
+        self._add_reader()
+
+    def _add_reader(self):
+        if self._loop is not None and self.conn is not None and self._reader_fd is None:
+            self._reader_fd = self.conn.fileno()
+            self._loop.add_reader(self._reader_fd, self.poll)
+
+    def reconcile(self, store: PGStore):
+        """Relê todos os inscritos; notificações anteriores à leitura são descartadas"""
+        self.conn.poll()
+        self.conn.notifies.clear()
+        self.chat_ids = array('q', sorted(store.list_subscribers()))
+        self.reconciled_at = time.monotonic()
+
+    def poll(self):
+        """Aplica as notificações pendentes (operações idempotentes)"""
+        if self.conn is None:
+            return
+        try:
+            self.conn.poll()
+        except psycopg2.Error as e:
+            print(f"⚠️ Conexão de escuta de inscritos perdida: {e}")
+            self.close()
+            return
+        while self.conn.notifies:
+            payload = self.conn.notifies.pop(0).payload
+            self.notifications += 1
+            chat_id = int(payload[1:])
+            pos = bisect.bisect_left(self.chat_ids, chat_id)
+            present = pos < len(self.chat_ids) and self.chat_ids[pos] == chat_id
+            if payload[0] == '+' and not present:
+                self.chat_ids.insert(pos, chat_id)
+            elif payload[0] == '-' and present:
+                del self.chat_ids[pos]
+
+    def get(self, store: PGStore) -> array:
+        """Cópia da lista atual (o array segue mudando durante o envio)"""
+        try:
+            if self.conn is None or self.conn.closed:
+                self.start(store)
+            elif time.monotonic() - self.reconciled_at > self.reconcile_interval:
+                self.reconcile(store)
+            else:
+                self.poll()
+        except psycopg2.Error as e:
+            print(f"⚠️ Lista de inscritos em memória indisponível, lendo do banco: {e}")
+            self.close()
+            return array('q', store.list_subscribers())
+        return self.chat_ids[:]
+
+    def close(self):
+        """Fecha a conexão de escuta (o próximo get() reconecta)"""
+        if self._reader_fd is not None:
+            self._loop.remove_reader(self._reader_fd)
+            self._reader_fd = None
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    def __len__(self) -> int:
+        return len(self.chat_ids)
+
 def get_store() -> PGStore:
     db_url = os.environ["DATABASE_URL"]
     store = PGStore(db_url)
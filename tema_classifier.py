@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Classificador de temas por TF-IDF (opcional, requer NumPy) para lotes de normativos
+
+O modelo de palavras-chave (NormativoAnalyzer.temas_bacen) é a semente: as próprias
+palavras-chave e os normativos do arquivo que ele reconhece viram exemplos de treino,
+e cada tema vira um centroide TF-IDF. Um lote inteiro é pontuado de uma vez (produto
+esparso x centroides em NumPy); itens com similaridade baixa e instalações sem
+NumPy ficam com o tema do modelo de palavras-chave.
+
+Serve para reprocessar o arquivo (backfill ou retag depois de mudar os temas):
+    python tema_classifier.py retag --dry-run
+    python tema_classifier.py retag
+"""
+import os
+import re
+import math
+import time
+import argparse
+from collections import Counter
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from normativo_analyzer import NormativoAnalyzer
+
+# Similaridade (cosseno) mínima com o centroide para aceitar o tema do classificador
+TEMA_MIN_SCORE = float(os.getenv("TEMA_MIN_SCORE", "0.12"))
+
+TOKEN_RE = re.compile(r"[^\W\d_]{3,}")
+STOPWORDS = frozenset("""
+    que para por com sem sobre nos nas dos das aos pelo pela pelos pelas uma uns umas
+    ser são está estão como mais bem seu sua seus suas este esta estes estas esse essa
+    nº art outras outros providências dispõe relativas relativos
+""".split())
+
+def tokenizar(texto: str) -> List[str]:
+    """Unigramas e bigramas (sem stopwords) do texto, em minúsculas"""
+    palavras = [p for p in TOKEN_RE.findall((texto or "").lower()) if p not in STOPWORDS]
+    return palavras + [f"{a} {b}" for a, b in zip(palavras, palavras[1:])]
+
+class TemaClassifier:
+    """
+    Centroides TF-IDF por tema. fit() aprende vocabulário, IDF e centroides;
+    classify() devolve um tema por item (no mesmo formato de analisar_normativo).
+    """
+    def __init__(self, min_score: float = TEMA_MIN_SCORE):
+        if not HAS_NUMPY:
+            raise RuntimeError("NumPy não está instalado (pip install numpy)")
+        self.min_score = min_score
+        self.analyzer = NormativoAnalyzer()
+        self.temas: List[str] = []
+        self.vocab: dict = {}
+        self.idf = None
+        self.centroids = None
+
+    def _features(self, textos: List[str], aprender: bool = False):
+        """
+        Matriz TF-IDF esparsa (linhas, colunas, valores) com as linhas normalizadas (L2).
+        Com aprender=True, termos novos entram no vocabulário (o IDF é calculado depois).
+        """
+        rows, cols, tfs = [], [], []
+        for i, texto in enumerate(textos):
+            for termo, tf in Counter(tokenizar(texto)).items():
+                col = self.vocab.get(termo)
+                if col is None:
+                    if not aprender:
+                        continue
+                    col = self.vocab[termo] = len(self.vocab)
+                rows.append(i)
+                cols.append(col)
+                tfs.append(1.0 + math.log(tf))
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        vals = np.asarray(tfs, dtype=np.float64)
+        if self.idf is not None:
+            vals *= self.idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=vals * vals, minlength=len(textos)))
+        vals /= np.maximum(norms, 1e-12)[rows]
+        return rows, cols, vals
+
+    def fit(self, textos: List[str], labels: List[str]) -> "TemaClassifier":
+        """Treina com textos rotulados (labels: chaves de temas_bacen)"""
+        self.temas = sorted(set(labels))
+        indice = {tema: k for k, tema in enumerate(self.temas)}
+        self.vocab, self.idf = {}, None
+
+        rows, cols, _ = self._features(textos, aprender=True)
+        df = np.bincount(cols, minlength=len(self.vocab))
+        self.idf = np.log((1 + len(textos)) / (1 + df)) + 1.0
+
+        rows, cols, vals = self._features(textos)
+        y = np.asarray([indice[label] for label in labels], dtype=np.int64)
+        centroids = np.zeros((len(self.temas), len(self.vocab)))
+        np.add.at(centroids, (y[rows], cols), vals)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        self.centroids = centroids
+        return self
+
+    def seed_examples(self) -> Tuple[List[str], List[str]]:
+        """Exemplos de semente: cada palavra-chave de temas_bacen rotulada com o seu tema"""
+        textos, labels = [], []
+        for tema, palavras in self.analyzer.temas_bacen.items():
+            textos.append(tema)
+            labels.append(tema)
+            for palavra in palavras:
+                textos.append(palavra)
+                labels.append(tema)
+        return textos, labels
+
+    def fit_archive(self, itens: List[Tuple[str, str]]) -> "TemaClassifier":
+        """Treina com as sementes e os itens (título, resumo) do arquivo que o modelo de palavras-chave reconhece"""
+        textos, labels = self.seed_examples()
+        for titulo, resumo in itens:
+            tema = self.analyzer.tema_por_palavras_chave(titulo, resumo or "")
+            if tema:
+                textos.append(f"{titulo} {resumo or ''}")
+                labels.append(tema)
+        return self.fit(textos, labels)
+
+    def scores(self, textos: List[str]):
+        """Similaridade de cada texto com cada centroide (len(textos) x len(temas))"""
+        rows, cols, vals = self._features(textos)
+        scores = np.empty((len(textos), len(self.temas)))
+        # Produto esparso x denso: uma passada por tema sobre os termos presentes no lote
+        for k in range(len(self.temas)):
+            scores[:, k] = np.bincount(rows, weights=vals * self.centroids[k, cols], minlength=len(textos))
+        return scores
+
+    def predict(self, textos: List[str]) -> List[Optional[str]]:
+        """Chave do tema mais próximo de cada texto (None abaixo de min_score)"""
+        if not textos:
+            return []
+        scores = self.scores(textos)
+        melhores = scores.argmax(axis=1)
+        confiantes = scores[np.arange(len(textos)), melhores] >= self.min_score
+        return [self.temas[k] if ok else None for k, ok in zip(melhores.tolist(), confiantes.tolist())]
+
+    def classify(self, itens: List[Tuple[str, str]]) -> List[str]:
+        """Tema de cada (título, resumo), como analisar_normativo devolve ('Crédito Rural')"""
+        previstos = self.predict([f"{titulo} {resumo or ''}" for titulo, resumo in itens])
+        return [
+            tema.title() if tema else self.analyzer.extrair_tema_principal(titulo, resumo or "")
+            for tema, (titulo, resumo) in zip(previstos, itens)
+        ]
+
+def classificar_lote(itens: List[Tuple[str, str]], treino: Optional[List[Tuple[str, str]]] = None) -> List[str]:
+    """
+    Temas de um lote (título, resumo). Com NumPy, pelo classificador treinado em
+    `treino` (padrão: o próprio lote); sem NumPy, pelo modelo de palavras-chave.
+    """
+    if not HAS_NUMPY:
+        analyzer = NormativoAnalyzer()
+        return [analyzer.extrair_tema_principal(titulo, resumo or "") for titulo, resumo in itens]
+    return TemaClassifier().fit_archive(itens if treino is None else treino).classify(itens)
+
+def retag(dry_run: bool = False) -> dict:
+    """Reclassifica todos os normativos indexados e grava os temas que mudaram"""
+    from storage import get_store
+    store = get_store()
+    try:
+        rows = store.list_normativo_texts()
+        itens = [(title, summary) for _, title, summary, _ in rows]
+        start = time.perf_counter()
+        temas = classificar_lote(itens)
+        elapsed = time.perf_counter() - start
+        mudancas = [(key, tema) for (key, _, _, antigo), tema in zip(rows, temas) if tema != antigo]
+        if not dry_run:
+            store.update_normativo_temas(mudancas)
+    finally:
+        store.close()
+    return {
+        "items": len(rows),
+        "changed": len(mudancas),
+        "numpy": HAS_NUMPY,
+        "items_per_second": round(len(rows) / elapsed, 1) if elapsed else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Classificador de temas em lote do BACEN Bot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("retag", help="reclassifica os normativos indexados")
+    cmd.add_argument("--dry-run", action="store_true", help="só mostra quantos temas mudariam")
+    args = parser.parse_args()
+
+    if not HAS_NUMPY:
+        print("⚠️ NumPy não disponível, usando o modelo de palavras-chave")
+    resultado = retag(args.dry_run)
+    verbo = "mudariam" if args.dry_run else "atualizados"
+    print(f"✅ {resultado['items']} normativos classificados ({resultado['items_per_second']} itens/s), "
+          f"{resultado['changed']} temas {verbo}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Teste do anti-flood por chat (token bucket com custo por comando) — roda offline
+"""
+import sys
+import os
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from antiflood import ThrottlingMiddleware, command_cost, DEFAULT_COST
+
+def test_command_cost():
+    """Comandos pesados custam mais; desconhecidos custam o padrão"""
+    assert command_cost("semanal") > command_cost("hoje") > command_cost("ultimo")
+    assert command_cost("  FORCAR ") == command_cost("forcar")
+    assert command_cost("de 01/09 até 15/09") == command_cost("semanal")
+    assert command_cost("qualquer coisa") == DEFAULT_COST
+    assert command_cost(None) == DEFAULT_COST
+    print("✅ Custos por comando")
+
+def test_token_bucket():
+    """Rajada até o limite, descarte depois, reposição com o tempo"""
+    flood = ThrottlingMiddleware(rate=1.0, burst=6, max_chats=100, notice_interval=30)
+    assert all(flood.check(1, 3, now=0.0) for _ in range(2))
+    assert not flood.check(1, 3, now=0.0)
+    assert flood.check(2, 3, now=0.0)  # outro chat não é afetado
+
+    assert flood.should_notify(1, now=0.0)
+    assert not flood.should_notify(1, now=10.0)  # um aviso por intervalo
+
+    assert not flood.check(1, 3, now=2.0)
+    assert flood.check(1, 3, now=3.0)
+    assert flood.check(1, 1, now=100.0) and flood.buckets[1][0] == 5  # não passa do burst
+    assert flood.metrics()["throttled"] == 2
+    print(f"✅ Token bucket: {flood.metrics()}")
+
+def test_eviction():
+    """O estado fica limitado a max_chats, descartando os menos recentes"""
+    flood = ThrottlingMiddleware(rate=1.0, burst=6, max_chats=3)
+    for chat_id in range(1, 4):
+        flood.check(chat_id, 1, now=0.0)
+    flood.check(1, 1, now=1.0)
+    flood.check(4, 1, now=1.0)
+    assert list(flood.buckets) == [3, 1, 4]
+    assert flood.metrics()["evicted"] == 1
+    print("✅ LRU limitado")
+
+if __name__ == "__main__":
+    test_command_cost()
+    test_token_bucket()
+    test_eviction()
+    print("\n✅ Testes concluídos!")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Teste da escolha de destinatários (modo canal e filtros de temas) e do fallback do canal — roda offline
+"""
+import sys
+import os
+import asyncio
+import tempfile
+import contextlib
+from datetime import datetime, timezone
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:TEST")
+
+import sender
+from bacen_feed import BACENNormativo
+from sender import recipients_for
+from bot_session import BotManager
+from http_client import close_http_session
+from benchmarks.fakes import FakeTelegramServer, MemoryStore, build_feed, make_fake_api
+
+def build_normativo(titulo: str) -> BACENNormativo:
+    return BACENNormativo(title=titulo, link="https://www.bcb.gov.br/x", published=datetime.now(timezone.utc))
+
+def test_recipients_dm():
+    """Mensagem direta: todos sem filtro, mais quem filtra o tema do normativo"""
+    normativo = build_normativo("Resolução CMN n° 1 - crédito rural para produtor rural")
+    assert normativo.tema.lower() == "crédito rural"
+    filtros = {2: ["crédito rural"], 3: ["câmbio"]}
+    assert recipients_for(normativo, [1, 2, 3, 4], filtros) == [1, 4, 2]
+    assert recipients_for(normativo, [1, 2, 3, 4], {}) == [1, 2, 3, 4]
+    print("✅ Destinatários por mensagem direta")
+
+def test_recipients_channel():
+    """Modo canal: uma publicação no canal e mensagem direta só para os filtros que batem"""
+    normativo = build_normativo("Resolução BCB n° 2 - operações cambiais e câmbio")
+    filtros = {2: ["crédito rural"], 3: ["câmbio", "pix"]}
+    assert recipients_for(normativo, range(1, 1000), filtros, channel_id=-100123) == [-100123, 3]
+    assert recipients_for(normativo, [], {}, channel_id=-100123) == [-100123]
+    print("✅ Destinatários no modo canal")
+
+async def _run_channel_blocked() -> tuple[dict, dict, MemoryStore]:
+    server = FakeTelegramServer().start()
+    server.feed = build_feed(10)
+    server.blocked.add(-100555)
+    store = MemoryStore(subscribers=5)
+    store.set_subscriber_temas(2, ["câmbio"])
+    manager = BotManager(token="123456:TEST", api=make_fake_api(server))
+    os.environ["BACEN_FEED_URL"] = server.feed_url
+    try:
+        # Só os 2 mais recentes são novos
+        for normativo in (await sender.parse_bacen_feed_async())[2:]:
+            store.mark_new_and_return_is_new("bacen_feed", normativo.link)
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            result = await sender.run_once(bot=manager.get_bot(), store=store)
+    finally:
+        os.environ.pop("BACEN_FEED_URL", None)
+        await manager.close()
+        await close_http_session()
+        server.stop()
+    return result, dict(server.calls), store
+
+def test_channel_fallback():
+    """Canal inacessível: quem não tem filtro de temas recebe por mensagem direta"""
+    anterior = (sender.DELIVERY_MODE, sender.TELEGRAM_CHANNEL_ID, sender.is_business_hours, sender.EXECUTION_LOG_FILE)
+    sender.DELIVERY_MODE, sender.TELEGRAM_CHANNEL_ID = "channel", "-100555"
+    sender.is_business_hours = lambda: True
+    sender.EXECUTION_LOG_FILE = os.path.join(tempfile.gettempdir(), "bacen_test_executions.json")
+    try:
+        result, calls, store = asyncio.run(_run_channel_blocked())
+    finally:
+        sender.DELIVERY_MODE, sender.TELEGRAM_CHANNEL_ID, sender.is_business_hours, sender.EXECUTION_LOG_FILE = anterior
+        sender.reset_channel()
+    assert result["status"] == "success" and result["normativos_enviados"] == 2
+    # 1 tentativa no canal + 2 normativos x 4 inscritos sem filtro (o 2 filtra câmbio)
+    assert calls.get("sendMessage") == 1 + 2 * 4
+    # Sem index_feed, só os novos entram no índice
+    assert len(store.normativos) == 2
+    print("✅ Canal inacessível redirecionado para mensagem direta")
+
+if __name__ == "__main__":
+    test_recipients_dm()
+    test_recipients_channel()
+    test_channel_fallback()
+    print("\n✅ Testes concluídos!")
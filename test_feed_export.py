@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Teste do feed próprio (/feed.json e /feed.xml): cursor, ETag/304 e gzip — roda offline
+"""
+import sys
+import os
+import json
+import asyncio
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import bacen_feed
+from bacen_feed import BACENNormativo, BR_TZ
+from feed_export import FeedExport, BACEN_NS
+
+def build_normativos(total: int = 30) -> list:
+    agora = datetime.now(BR_TZ).replace(microsecond=0)
+    return [
+        BACENNormativo(
+            title=f"Resolução BCB n° {100 + k} sobre pix e meios de pagamento",
+            link=f"https://www.bcb.gov.br/normativo?n={100 + k}",
+            published=agora - timedelta(hours=total - k),
+        )
+        for k in range(total)
+    ]
+
+async def with_client(check):
+    bacen_feed._store_snapshot(build_normativos())
+    export = FeedExport()
+
+    async def handler(request):
+        return await export.handle(request, request.match_info["fmt"])
+
+    app = web.Application()
+    app.router.add_get("/feed.{fmt:json|xml}", handler)
+    async with TestClient(TestServer(app)) as client:
+        await check(client)
+    return export
+
+def test_feed_json_cursor():
+    """Sem since vêm os mais recentes; com since, a sequência completa sem repetir"""
+    async def check(client):
+        resp = await client.get("/feed.json", params={"limit": 5})
+        body = await resp.json()
+        assert resp.status == 200 and body["count"] == 5 and not body["has_more"]
+        assert body["items"][-1]["title"].endswith("129 sobre pix e meios de pagamento")
+        assert body["items"][0]["tema"] == "Pagamentos" and body["items"][0]["mini_resumo"]
+
+        vistos, since = [], "0-0"
+        while True:
+            body = await (await client.get("/feed.json", params={"since": since, "limit": 7})).json()
+            vistos += [item["id"] for item in body["items"]]
+            since = body["next_since"]
+            if not body["has_more"]:
+                break
+        assert len(vistos) == 30 and len(set(vistos)) == 30 and vistos == sorted(vistos)
+        body = await (await client.get("/feed.json", params={"since": since})).json()
+        assert body["count"] == 0 and body["next_since"] == since
+
+        assert (await client.get("/feed.json", params={"since": "abc"})).status == 400
+    asyncio.run(with_client(check))
+    print("✅ Paginação por cursor")
+
+def test_feed_etag_gzip():
+    """304 com o mesmo ETag, gzip quando pedido e respostas do cache"""
+    async def check(client):
+        resp = await client.get("/feed.xml", headers={"Accept-Encoding": "gzip"})
+        assert resp.status == 200 and resp.headers["Content-Encoding"] == "gzip"
+        root = ET.fromstring(await resp.read())  # aiohttp já descomprime
+        itens = root.findall("channel/item")
+        assert len(itens) == 30 and itens[0].findtext(f"{{{BACEN_NS}}}tema") == "Pagamentos"
+
+        etag = resp.headers["ETag"]
+        resp = await client.get("/feed.xml", headers={"If-None-Match": etag})
+        assert resp.status == 304
+
+        resp = await client.get("/feed.json", headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in resp.headers
+        json.loads(await resp.read())
+    export = asyncio.run(with_client(check))
+    assert export.metrics()["hits"] == 1 and export.metrics()["not_modified"] == 1
+    print(f"✅ ETag/304 e gzip: {export.metrics()}")
+
+if __name__ == "__main__":
+    test_feed_json_cursor()
+    test_feed_etag_gzip()
+    print("\n✅ Testes concluídos!")
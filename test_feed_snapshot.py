@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Teste do snapshot ordenado do feed (períodos por bisect) — roda offline
+"""
+import sys
+import os
+from datetime import date, datetime, timedelta
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bacen_feed import (
+    FeedSnapshot, BACENNormativo, BR_TZ, parse_periodo, today_sp,
+    paginate_normativos_message, telegram_len, TELEGRAM_MESSAGE_LIMIT
+)
+
+def build_normativos(dias: int = 20) -> list:
+    """Dois normativos por dia, do mais antigo ao de hoje, fora de ordem"""
+    hoje = datetime.now(BR_TZ).replace(hour=12, minute=0, second=0, microsecond=0)
+    normativos = []
+    for d in range(dias):
+        for h in (9, 17):
+            publicado = (hoje - timedelta(days=d)).replace(hour=h)
+            normativos.append(BACENNormativo(
+                title=f"Resolução BCB n° {1000 + d * 2 + (h == 17)}",
+                link=f"https://www.bcb.gov.br/normativo?d={d}&h={h}",
+                published=publicado,
+            ))
+    return normativos[::3] + normativos[1::3] + normativos[2::3]
+
+def test_snapshot_periodos():
+    """Testa hoje/ontem/semanal/intervalos e o mais recente"""
+    print("🔍 Testando snapshot ordenado do feed...")
+    snapshot = FeedSnapshot(build_normativos())
+    hoje = today_sp()
+
+    assert len(snapshot) == 40
+    assert snapshot.latest().published.date() == hoje
+    assert snapshot.latest().published.hour == 17
+    assert len(snapshot.hoje()) == 2
+    assert len(snapshot.ontem()) == 2
+    assert len(snapshot.semanal()) == 2 * (hoje.weekday() + 1)
+
+    periodo = snapshot.between(hoje - timedelta(days=6), hoje - timedelta(days=2))
+    assert len(periodo) == 10
+    assert all(a.published >= b.published for a, b in zip(periodo, periodo[1:]))
+    assert snapshot.between(hoje + timedelta(days=1), hoje + timedelta(days=5)) == []
+    print(f"✅ {len(snapshot)} normativos, versão {snapshot.version}")
+
+def test_snapshot_version():
+    """A versão só muda quando o conteúdo muda"""
+    normativos = build_normativos()
+    assert FeedSnapshot(normativos).version == FeedSnapshot(list(reversed(normativos))).version
+    assert FeedSnapshot(normativos).version != FeedSnapshot(normativos[1:]).version
+    print("✅ Versão estável para o mesmo conteúdo")
+
+def test_parse_periodo():
+    """Testa o comando 'de DD/MM até DD/MM'"""
+    ano = today_sp().year
+    assert parse_periodo("de 01/09 até 15/09") == (date(ano, 9, 1), date(ano, 9, 15))
+    assert parse_periodo("De 1/9/2025 ate 3/9") == (date(2025, 9, 1), date(2025, 9, 3))
+    assert parse_periodo("de 15/09 até 01/09") is None
+    assert parse_periodo("de 31/02 até 01/03") is None
+    assert parse_periodo("hoje") is None
+    print("✅ Períodos interpretados corretamente")
+
+def test_paginacao():
+    """Páginas de até 5 normativos, dentro do limite do Telegram, sem perder nenhum"""
+    normativos = build_normativos()
+    pages = paginate_normativos_message(normativos, "Teste")
+    assert len(pages) == 8
+    assert all(telegram_len(p) <= TELEGRAM_MESSAGE_LIMIT for p in pages)
+    assert sum(p.count("📄 <b>") for p in pages) == len(normativos)
+    assert "página 1/8" in pages[0]
+
+    # Resumos longos: o limite de tamanho manda antes do limite de itens
+    for n in normativos:
+        n.mini_resumo = "Lorem ipsum 📄 " * 120
+    pages = paginate_normativos_message(normativos, "Teste")
+    assert all(telegram_len(p) <= TELEGRAM_MESSAGE_LIMIT for p in pages)
+    assert sum(p.count("📄 <b>") for p in pages) == len(normativos)
+    assert paginate_normativos_message([], "Teste") == ["❌ Nenhum normativo encontrado para Teste."]
+    print(f"✅ {len(pages)} páginas dentro do limite de {TELEGRAM_MESSAGE_LIMIT}")
+
+if __name__ == "__main__":
+    test_snapshot_periodos()
+    test_snapshot_version()
+    test_parse_periodo()
+    test_paginacao()
+    print("\n✅ Testes concluídos!")
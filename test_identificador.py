@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Teste da extração de tipo/número/ano, das referências (altera/revoga) e da consulta 'res 4966' — roda offline
+"""
+import sys
+import os
+import xml.etree.ElementTree as ET
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from normativo_analyzer import Identificador, Referencia, extrair_identificador, extrair_referencias, parse_consulta
+from bacen_feed import _normativo_from_element
+from benchmarks.fakes import FIXTURE_FEED
+
+def test_extrair_identificador():
+    """Títulos no padrão do feed do BACEN e variações comuns"""
+    casos = {
+        "Resolução CMN n° 5.251 de 14/10/2025": Identificador("Resolução CMN", 5251, 2025),
+        "Resolução BCB n° 494 de 15/10/2025": Identificador("Resolução BCB", 494, 2025),
+        "Instrução Normativa BCB n° 677 de 14/10/2025": Identificador("Instrução Normativa BCB", 677, 2025),
+        "Circular n° 3.998 de 01/10/2025": Identificador("Circular", 3998, 2025),
+        "Comunicado n° 43.812 de 13/10/2025": Identificador("Comunicado", 43812, 2025),
+        "Carta Circular nº 4.123": Identificador("Carta Circular", 4123, 2024),
+        "Resolução nº 4.966, de 25 de novembro de 2021": Identificador("Resolução CMN", 4966, 2021),
+        # Grafias com acentuação incompleta, comuns no feed
+        "Resoluçao BCB n° 494 de 15/10/2025": Identificador("Resolução BCB", 494, 2025),
+        "Resolucão CMN n° 5.251 de 14/10/2025": Identificador("Resolução CMN", 5251, 2025),
+        "Instruçao Normativa BCB n° 677 de 14/10/2025": Identificador("Instrução Normativa BCB", 677, 2025),
+        "Resolucao nº 4.966": Identificador("Resolução CMN", 4966, 2024),
+    }
+    for titulo, esperado in casos.items():
+        assert extrair_identificador(titulo, 2024) == esperado, titulo
+    assert extrair_identificador("Normativos - Banco Central do Brasil") is None
+    assert str(Identificador("Resolução CMN", 4966, 2021)) == "Resolução CMN nº 4.966/2021"
+    assert str(Identificador("Circular", 3998, None)) == "Circular nº 3.998"
+    print(f"✅ {len(casos)} títulos identificados")
+
+def test_parse_consulta():
+    """Apelidos do comando de busca por número"""
+    assert parse_consulta("res 4966") == (["Resolução CMN", "Resolução BCB"], 4966, None)
+    assert parse_consulta("Res CMN 4.966/2021") == (["Resolução CMN"], 4966, 2021)
+    assert parse_consulta("resolução bcb 494") == (["Resolução BCB"], 494, None)
+    assert parse_consulta("circular 3978") == (["Circular"], 3978, None)
+    assert parse_consulta("in 677") == (["Instrução Normativa BCB"], 677, None)
+    assert parse_consulta("carta circular 4123") == (["Carta Circular"], 4123, None)
+    assert parse_consulta("comunicado 43812") == (["Comunicado"], 43812, None)
+    assert parse_consulta("resoluçao cmn 4966") == (["Resolução CMN"], 4966, None)
+    assert parse_consulta("res") is None
+    assert parse_consulta("hoje") is None
+    assert parse_consulta("resumo 12") is None
+    print("✅ Consultas interpretadas corretamente")
+
+def test_extrair_referencias():
+    """Só citações depois de altera/revoga, na mesma frase, e nunca o próprio normativo"""
+    texto = ("<p>Dispõe sobre o Pronaf e altera a Resolução CMN nº 5.234, de 26 de junho de 2025, "
+             "e a Resolução nº 4.966. Revoga a Circular nº 3.909, de 16 de agosto de 2018.</p>")
+    assert extrair_referencias(texto) == [
+        Referencia("altera", Identificador("Resolução CMN", 5234, 2025)),
+        Referencia("altera", Identificador("Resolução CMN", 4966, None)),
+        Referencia("revoga", Identificador("Circular", 3909, 2018)),
+    ]
+    assert extrair_referencias("Nos termos da Resolução BCB nº 80, estabelece regras do Pix.") == []
+    assert extrair_referencias("Dispõe sobre tarifas; ficam revogadas a Resolução CMN nº 3.919 e a Circular nº 3.000.") == [
+        Referencia("revoga", Identificador("Resolução CMN", 3919, None)),
+        Referencia("revoga", Identificador("Circular", 3000, None)),
+    ]
+    # Acentuação incompleta na citação não derruba a extração
+    assert extrair_referencias("Altera a Resoluçao CMN nº 4.966. Revoga a Instruçao Normativa BCB nº 10.") == [
+        Referencia("altera", Identificador("Resolução CMN", 4966, None)),
+        Referencia("revoga", Identificador("Instrução Normativa BCB", 10, None)),
+    ]
+    proprio = Identificador("Resolução BCB", 494, 2025)
+    assert extrair_referencias("Altera a Resolução BCB nº 494 e a Resolução BCB nº 80.", proprio) == [
+        Referencia("altera", Identificador("Resolução BCB", 80, None)),
+    ]
+
+    # Fixture do feed: as referências do fim do resumo sobrevivem ao corte de 200 caracteres
+    root = ET.parse(FIXTURE_FEED).getroot()
+    normativos = [_normativo_from_element(item) for item in root.iter("item")]
+    arestas = {(str(n.identificador), r.relacao, str(r.alvo)) for n in normativos for r in n.referencias}
+    assert ("Resolução CMN nº 5.250/2025", "altera", "Resolução CMN nº 4.966/2021") in arestas
+    assert any(relacao == "revoga" and alvo == "Circular nº 3.909/2018" for _, relacao, alvo in arestas)
+    print(f"✅ {len(arestas)} referências extraídas do feed de exemplo")
+
+if __name__ == "__main__":
+    test_extrair_identificador()
+    test_parse_consulta()
+    test_extrair_referencias()
+    print("\n✅ Testes concluídos!")
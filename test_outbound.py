@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Teste do agendador de saída (prioridades e divisão do orçamento) — roda offline
+"""
+import sys
+import os
+import asyncio
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from outbound import (
+    OutboundScheduler, lane_rate, priority, outbound_priority,
+    PRIORITY_INTERACTIVE, PRIORITY_BROADCAST, PRIORITY_DIGEST
+)
+
+def test_lane_rate():
+    """Divisão do orçamento global entre os processos com demanda"""
+    assert lane_rate([("cron", PRIORITY_BROADCAST)], "cron", 25) == 25
+    assert lane_rate([("cron", PRIORITY_BROADCAST), ("reply_bot", None)], "cron", 25) == 25
+    assert lane_rate([("cron", None), ("reply_bot", PRIORITY_INTERACTIVE)], "cron", 25) == 25  # ocioso
+    lanes = [("cron", PRIORITY_BROADCAST), ("reply_bot", PRIORITY_INTERACTIVE)]
+    assert lane_rate(lanes, "reply_bot", 20, low_share=0.25) == 15
+    assert lane_rate(lanes, "cron", 20, low_share=0.25) == 5
+    assert lane_rate([("a", PRIORITY_DIGEST), ("b", PRIORITY_DIGEST)], "a", 20) == 10
+    print("✅ Fatias do orçamento")
+
+def test_priority_order():
+    """Com a fila cheia de broadcasts, as respostas saem primeiro"""
+    async def run():
+        scheduler = OutboundScheduler("teste", PRIORITY_BROADCAST, total_rate=50)
+        ordem = []
+
+        async def enviar(tipo: str, level: int):
+            await scheduler.acquire(level)
+            ordem.append(tipo)
+
+        tasks = [asyncio.create_task(enviar("b", PRIORITY_BROADCAST)) for _ in range(5)]
+        tasks += [asyncio.create_task(enviar("d", PRIORITY_DIGEST))]
+        tasks += [asyncio.create_task(enviar("i", PRIORITY_INTERACTIVE)) for _ in range(2)]
+        await asyncio.gather(*tasks)
+        return ordem
+
+    ordem = asyncio.run(run())
+    # O primeiro broadcast já tinha ficha; depois passam as respostas e o digest fica por último
+    assert ordem == ["b", "i", "i", "b", "b", "b", "b", "d"], ordem
+    print(f"✅ Ordem de saída: {''.join(ordem)}")
+
+def test_priority_context():
+    """A prioridade do contexto vale dentro do bloco e volta ao padrão depois"""
+    assert outbound_priority.get(PRIORITY_BROADCAST) == PRIORITY_BROADCAST
+    with priority(PRIORITY_INTERACTIVE):
+        assert outbound_priority.get(PRIORITY_BROADCAST) == PRIORITY_INTERACTIVE
+    assert outbound_priority.get(PRIORITY_BROADCAST) == PRIORITY_BROADCAST
+    print("✅ Prioridade por contexto")
+
+if __name__ == "__main__":
+    test_lane_rate()
+    test_priority_order()
+    test_priority_context()
+    print("\n✅ Testes concluídos!")
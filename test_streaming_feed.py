@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Teste do parser incremental (streaming) do feed do BACEN — roda offline
+"""
+import sys
+import os
+import asyncio
+from aiohttp import web
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bacen_feed import FeedStreamParser, iter_bacen_feed
+from http_client import close_http_session
+
+def build_sample_feed(total: int = 30) -> bytes:
+    """Monta um feed RSS de exemplo no formato do BACEN"""
+    items = []
+    for i in range(total, 0, -1):
+        items.append(f"""
+    <item>
+      <title>Resolução BCB n° {400 + i}</title>
+      <link>https://www.bcb.gov.br/estabilidadefinanceira/exibenormativo?tipo=Resolução BCB&amp;numero={400 + i}</link>
+      <pubDate>Mon, {i % 28 + 1:02d} Sep 2025 1{i % 10}:30:00 GMT</pubDate>
+      <description><![CDATA[<p>Altera a Resolução BCB nº {300 + i}, que dispõe sobre o crédito rural e a cédula de produto rural.</p>]]></description>
+    </item>""")
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0">
+  <channel>
+    <title>Normativos BCB</title>{''.join(items)}
+  </channel>
+</rss>""".encode("utf-8")
+
+def test_stream_parser_chunks():
+    """Testa o parser recebendo o feed em pedaços pequenos"""
+    print("🔍 Testando parser incremental em pedaços de 97 bytes...")
+    data = build_sample_feed(30)
+    parser = FeedStreamParser()
+
+    normativos = []
+    first_item_at = None
+    for offset in range(0, len(data), 97):
+        novos = parser.feed(data[offset:offset + 97])
+        if novos and first_item_at is None:
+            first_item_at = offset
+        normativos.extend(novos)
+    normativos.extend(parser.close())
+
+    print(f"✅ {len(normativos)} normativos decodificados")
+    print(f"✅ Primeiro item disponível após {first_item_at} de {len(data)} bytes")
+    if normativos:
+        print(f"   Primeiro: {normativos[0].title} — {normativos[0].published}")
+        print(f"   Tema: {normativos[0].tema}")
+    assert len(normativos) == 30
+    assert first_item_at < len(data) // 10
+
+def test_stream_early_stop():
+    """Testa a interrupção da leitura ao chegar em itens antigos"""
+    print("\n🔍 Testando parada antecipada via servidor local...")
+    data = build_sample_feed(30)
+
+    async def run():
+        async def feed_handler(request):
+            return web.Response(body=data, content_type="application/rss+xml")
+
+        app = web.Application()
+        app.router.add_get("/feed", feed_handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}/feed"
+
+        try:
+            primeiros = []
+            async for normativo in iter_bacen_feed(url, stop_when=lambda n: n.title.endswith("n° 425")):
+                primeiros.append(normativo)
+            return primeiros
+        finally:
+            await close_http_session()
+            await runner.cleanup()
+
+    primeiros = asyncio.run(run())
+    print(f"✅ Leitura interrompida após {len(primeiros)} normativos")
+    assert len(primeiros) == 5
+
+if __name__ == "__main__":
+    test_stream_parser_chunks()
+    test_stream_early_stop()
+    print("\n✅ Testes concluídos!")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Teste do classificador de temas em lote (TF-IDF) — roda offline; sem NumPy, só o fallback
+"""
+import sys
+import os
+import xml.etree.ElementTree as ET
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from normativo_analyzer import NormativoAnalyzer
+from tema_classifier import HAS_NUMPY, TemaClassifier, classificar_lote, tokenizar
+from benchmarks.fakes import FIXTURE_FEED
+
+def load_itens() -> list:
+    root = ET.parse(FIXTURE_FEED).getroot()
+    return [(item.findtext("title"), item.findtext("description")) for item in root.iter("item")]
+
+def test_tokenizar():
+    """Unigramas e bigramas, sem números nem stopwords"""
+    assert tokenizar("Dispõe sobre o Crédito Rural 2025") == ["crédito", "rural", "crédito rural"]
+    assert tokenizar("") == []
+    print("✅ Tokenização")
+
+def test_classificar_lote():
+    """Concorda com as palavras-chave onde elas acham um tema e cobre os itens que caíam no fallback do título"""
+    itens = load_itens()
+    analyzer = NormativoAnalyzer()
+    temas = classificar_lote(itens)
+    assert len(temas) == len(itens)
+
+    for (titulo, resumo), tema in zip(itens, temas):
+        chave = analyzer.tema_por_palavras_chave(titulo, resumo)
+        if chave or not HAS_NUMPY:
+            assert tema == analyzer.extrair_tema_principal(titulo, resumo), titulo
+        else:
+            assert tema.lower() in analyzer.temas_bacen or tema == analyzer.extrair_tema_principal(titulo, resumo), titulo
+    print(f"✅ {len(itens)} itens classificados (NumPy: {HAS_NUMPY})")
+
+def test_min_score():
+    """Texto sem termos conhecidos fica com o modelo de palavras-chave"""
+    if not HAS_NUMPY:
+        print("⚠️ NumPy não disponível, pulando")
+        return
+    classifier = TemaClassifier().fit_archive(load_itens())
+    assert classifier.predict(["xyzzy plugh"]) == [None]
+    assert classifier.predict(["operações de crédito rural do Pronaf"]) == ["crédito rural"]
+    assert classifier.classify([("Comunicado n° 1", "xyzzy plugh")]) == ["Comunicação Oficial"]
+    print("✅ Limite de similaridade respeitado")
+
+if __name__ == "__main__":
+    test_tokenizar()
+    test_classificar_lote()
+    test_min_score()
+    print("\n✅ Testes concluídos!")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Teste dos webhooks de saída contra um receptor aiohttp local — roda offline
+"""
+import sys
+import os
+import json
+import time
+import asyncio
+from datetime import datetime, timezone
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import webhooks
+from bacen_feed import BACENNormativo
+from http_client import close_http_session
+from webhooks import WebhookDispatcher, verify
+
+class WebhookStore:
+    """Só a parte do PGStore usada pelo WebhookDispatcher"""
+    def __init__(self, endpoints: list[dict]):
+        self.endpoints = endpoints
+        self.dead: list[dict] = []
+
+    def list_webhook_endpoints(self) -> list[dict]:
+        return self.endpoints
+
+    def save_webhook_dead_letter(self, endpoint_id: int, payload: str, error: str, attempts: int):
+        self.dead.append({"id": len(self.dead) + 1, "endpoint_id": endpoint_id, "payload": payload,
+                          "error": error, "attempts": attempts})
+
+    def list_webhook_dead_letters(self, limit: int = 100) -> list[dict]:
+        por_id = {e["id"]: e for e in self.endpoints}
+        return [{**d, "endpoint": por_id[d["endpoint_id"]]} for d in self.dead[:limit]]
+
+    def remove_webhook_dead_letters(self, ids: list[int]):
+        self.dead = [d for d in self.dead if d["id"] not in ids]
+
+def build_normativos() -> list:
+    agora = datetime.now(timezone.utc)
+    return [
+        BACENNormativo(title=f"Resolução BCB n° {n} sobre pix", link=f"https://www.bcb.gov.br/n={n}", published=agora)
+        for n in (1, 2, 3)
+    ]
+
+class Receiver:
+    """Receptor local: /ok, /flaky (503 na primeira vez), /bad (400) e /slow"""
+    def __init__(self):
+        self.received: dict[str, list] = {}
+        self.flaky_calls = 0
+        self.up = True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        route = request.match_info["route"]
+        body = await request.read()
+        ok = verify("segredo-" + route, request.headers["X-Bacen-Timestamp"], body, request.headers["X-Bacen-Signature"])
+        if not ok:
+            return web.Response(status=401)
+        if route == "bad" or not self.up:
+            return web.Response(status=400 if route == "bad" else 503)
+        if route == "flaky":
+            self.flaky_calls += 1
+            if self.flaky_calls == 1:
+                return web.Response(status=503)
+        if route == "slow":
+            await asyncio.sleep(0.5)
+        self.received.setdefault(route, []).append(json.loads(body))
+        return web.Response(status=204)
+
+async def with_receiver(check):
+    receiver = Receiver()
+    app = web.Application()
+    app.router.add_post("/{route}", receiver.handle)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        endpoints = [
+            {"id": i, "url": str(server.make_url(f"/{route}")), "secret": "segredo-" + route}
+            for i, route in enumerate(("ok", "flaky", "bad", "slow"), 1)
+        ]
+        await check(receiver, WebhookStore(endpoints))
+    finally:
+        await server.close()
+        await close_http_session()
+
+def test_webhook_delivery():
+    """Lote assinado entregue a todos, com retentativa no 503 e dead letter no 400"""
+    async def check(receiver, store):
+        webhooks.backoff_delay = lambda attempt: 0.01
+        dispatcher = WebhookDispatcher(store, max_attempts=3)
+
+        inicio = time.perf_counter()
+        assert dispatcher.dispatch(build_normativos()) == 4
+        assert time.perf_counter() - inicio < 0.1  # não espera as entregas
+        await dispatcher.close(timeout=5)
+
+        for route in ("ok", "flaky", "slow"):
+            lote = receiver.received[route][0]
+            assert lote["count"] == 3 and lote["items"][0]["tema"] == "Pagamentos"
+        assert receiver.flaky_calls == 2
+        assert [d["endpoint_id"] for d in store.dead] == [3] and store.dead[0]["attempts"] == 1
+        assert dispatcher.metrics() == {"in_flight": 0, "delivered": 3, "retries": 1, "dead_letters": 1}
+    asyncio.run(with_receiver(check))
+    print("✅ Entrega, retentativa e dead letter")
+
+def test_webhook_dead_letter_replay():
+    """Endpoint fora do ar vira dead letter; replay reenvia quando ele volta"""
+    async def check(receiver, store):
+        webhooks.backoff_delay = lambda attempt: 0.01
+        store.endpoints = store.endpoints[:1]
+        dispatcher = WebhookDispatcher(store, max_attempts=2)
+        receiver.up = False
+        dispatcher.dispatch(build_normativos())
+        await dispatcher.close(timeout=5)
+        assert len(store.dead) == 1 and store.dead[0]["error"] == "HTTP 503"
+
+        receiver.up = True
+        assert await dispatcher.replay_dead_letters() == 1
+        assert store.dead == [] and len(receiver.received["ok"]) == 1
+    asyncio.run(with_receiver(check))
+    print("✅ Replay de dead letters")
+
+if __name__ == "__main__":
+    test_webhook_delivery()
+    test_webhook_dead_letter_replay()
+    print("\n✅ Testes concluídos!")
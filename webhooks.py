@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Webhooks de saída: avisa sistemas internos dos normativos novos de cada execução
+
+- Endpoints cadastrados na tabela webhook_endpoints (ver o CLI no fim do arquivo)
+- Um lote JSON por execução do cron com todos os normativos novos
+- Assinatura HMAC-SHA256 de "<timestamp>.<corpo>" com o segredo do endpoint,
+  nos cabeçalhos X-Bacen-Timestamp e X-Bacen-Signature ("sha256=<hex>")
+- Entrega em background, concorrente entre endpoints, com retentativas e backoff
+  por endpoint; lotes que esgotam as tentativas vão para webhook_dead_letters
+
+Uso:
+    python webhooks.py add https://interno.exemplo/bacen [--secret S]
+    python webhooks.py list
+    python webhooks.py remove https://interno.exemplo/bacen
+    python webhooks.py replay               # reenvia os lotes mortos
+"""
+import os
+import hmac
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import secrets
+import argparse
+from datetime import datetime, timezone
+from typing import Optional
+
+import aiohttp
+
+from http_client import get_http_session, close_http_session, backoff_delay, USER_AGENT
+
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "4"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+EVENT_NEW_NORMATIVOS = "normativos.new"
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    """Assinatura enviada em X-Bacen-Signature (o receptor recalcula e compara)"""
+    digest = hmac.new(secret.encode("utf-8"), timestamp.encode("ascii") + b"." + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+def verify(secret: str, timestamp: str, body: bytes, signature: str) -> bool:
+    return hmac.compare_digest(sign(secret, timestamp, body), signature)
+
+def build_payload(normativos: list) -> str:
+    """Lote de normativos novos no mesmo formato dos itens de /feed.json"""
+    from feed_export import normativo_dict, item_cursor
+    return json.dumps({
+        "event": EVENT_NEW_NORMATIVOS,
+        "batch_id": uuid.uuid4().hex,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "count": len(normativos),
+        "items": [normativo_dict(n, item_cursor(n)) for n in normativos],
+    }, ensure_ascii=False)
+
+class WebhookDispatcher:
+    """
+    Dono das entregas de webhook de um processo. dispatch() retorna na hora (a
+    entrega roda em tasks próprias, sem atrasar o fan-out do Telegram); close()
+    aguarda as entregas em andamento no encerramento.
+    """
+    def __init__(self, store, max_attempts: int = WEBHOOK_MAX_ATTEMPTS, timeout: float = WEBHOOK_TIMEOUT):
+        self.store = store
+        self.max_attempts = max_attempts
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.tasks: set[asyncio.Task] = set()
+        self.delivered = 0
+        self.retries = 0
+        self.dead_letters = 0
+
+    def dispatch(self, normativos: list) -> int:
+        """Agenda o lote para todos os endpoints; retorna quantos endpoints"""
+        if not normativos:
+            return 0
+        try:
+            endpoints = self.store.list_webhook_endpoints()
+        except Exception as ex:
+            print(f"⚠️ Erro ao carregar endpoints de webhook: {ex}")
+            return 0
+        if not endpoints:
+            return 0
+        payload = build_payload(normativos)
+        for endpoint in endpoints:
+            self._spawn(self.deliver(endpoint, payload))
+        print(f"🪝 Lote de {len(normativos)} normativo(s) agendado para {len(endpoints)} webhook(s)")
+        return len(endpoints)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def post(self, endpoint: dict, payload: str) -> Optional[str]:
+        """Uma tentativa; retorna None se entregue, senão o erro (prefixo 'fatal:' se não vale retentar)"""
+        body = payload.encode("utf-8")
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": USER_AGENT,
+            "X-Bacen-Event": EVENT_NEW_NORMATIVOS,
+            "X-Bacen-Timestamp": timestamp,
+            "X-Bacen-Signature": sign(endpoint["secret"], timestamp, body),
+        }
+        session = await get_http_session()
+        try:
+            async with session.post(endpoint["url"], data=body, headers=headers, timeout=self.timeout) as resp:
+                if resp.status < 300:
+                    return None
+                erro = f"HTTP {resp.status}"
+                return erro if resp.status in RETRY_STATUSES else f"fatal: {erro}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return f"{type(e).__name__}: {e}"
+
+    async def deliver(self, endpoint: dict, payload: str) -> bool:
+        """Entrega o lote a um endpoint, com retentativas; no fim, sucesso ou dead letter"""
+        attempt, erro = 0, None
+        try:
+            while attempt < self.max_attempts:
+                attempt += 1
+                erro = await self.post(endpoint, payload)
+                if erro is None:
+                    self.delivered += 1
+                    print(f"🪝 Webhook entregue: {endpoint['url']}")
+                    return True
+                if erro.startswith("fatal:"):
+                    break
+                if attempt < self.max_attempts:
+                    self.retries += 1
+                    await asyncio.sleep(backoff_delay(attempt))
+        except asyncio.CancelledError:
+            # Encerramento no meio das tentativas: o lote não se perde
+            self._dead_letter(endpoint, payload, "cancelado no encerramento", attempt)
+            raise
+        self._dead_letter(endpoint, payload, erro, attempt)
+        return False
+
+    def _dead_letter(self, endpoint: dict, payload: str, erro: str, attempts: int):
+        self.dead_letters += 1
+        print(f"💀 Webhook {endpoint['url']} falhou após {attempts} tentativa(s): {erro}")
+        try:
+            self.store.save_webhook_dead_letter(endpoint["id"], payload, erro, attempts)
+        except Exception as ex:
+            print(f"⚠️ Erro ao guardar lote morto de {endpoint['url']}: {ex}")
+
+    async def replay_dead_letters(self, limit: int = 100) -> int:
+        """Reenvia os lotes mortos (uma rodada de tentativas); retorna quantos saíram"""
+        mortos = self.store.list_webhook_dead_letters(limit)
+        resultados = await asyncio.gather(*(self.post(d["endpoint"], d["payload"]) for d in mortos))
+        entregues = [d["id"] for d, erro in zip(mortos, resultados) if erro is None]
+        self.store.remove_webhook_dead_letters(entregues)
+        self.delivered += len(entregues)
+        return len(entregues)
+
+    async def close(self, timeout: float = WEBHOOK_TIMEOUT):
+        """Aguarda as entregas em andamento (até timeout); as que sobrarem viram dead letters"""
+        if not self.tasks:
+            return
+        print(f"⏳ Aguardando {len(self.tasks)} entrega(s) de webhook...")
+        done, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def metrics(self) -> dict:
+        return {
+            "in_flight": len(self.tasks),
+            "delivered": self.delivered,
+            "retries": self.retries,
+            "dead_letters": self.dead_letters,
+        }
+
+async def _cli(args):
+    from storage import get_store
+    store = get_store()
+    try:
+        if args.command == "add":
+            secret = args.secret or secrets.token_hex(32)
+            endpoint_id = store.add_webhook_endpoint(args.url, secret)
+            print(f"✅ Endpoint {endpoint_id} cadastrado: {args.url}\n🔑 Segredo HMAC: {secret}")
+        elif args.command == "remove":
+            print("✅ Removido" if store.remove_webhook_endpoint(args.url) else "❌ Endpoint não encontrado")
+        elif args.command == "list":
+            for e in store.list_webhook_endpoints():
+                print(f"{e['id']:>4}  {e['url']}")
+            print(f"💀 Lotes mortos: {len(store.list_webhook_dead_letters(limit=10000))}")
+        elif args.command == "replay":
+            entregues = await WebhookDispatcher(store).replay_dead_letters(args.limit)
+            print(f"✅ {entregues} lote(s) reenviado(s)")
+    finally:
+        await close_http_session()
+        store.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhooks de saída do BACEN Bot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="cadastra um endpoint")
+    add.add_argument("url")
+    add.add_argument("--secret", help="segredo HMAC (padrão: gerado)")
+    sub.add_parser("remove", help="remove um endpoint").add_argument("url")
+    sub.add_parser("list", help="lista os endpoints")
+    replay = sub.add_parser("replay", help="reenvia os lotes mortos")
+    replay.add_argument("--limit", type=int, default=100)
+    asyncio.run(_cli(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()